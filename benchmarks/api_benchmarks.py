@@ -0,0 +1,236 @@
+"""
+Benchmarks of API and storage hot paths against a local FireCloud/rawls
+stand-in (mock_server.py) and a fake gsutil (fake_gsutil.py); no network
+access or credentials are required:
+
+  python benchmarks/api_benchmarks.py [--sizes 1000 10000 100000] [--latency 0.02]
+
+For each workspace size, reports wall time, throughput, peak memory (Python
+allocations, via tracemalloc) and the number of API/storage calls. Results
+can be saved (--output) and compared against a baseline (--compare); the exit
+status is 1 if any benchmark regressed by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dalmatian
+from dalmatian import core, instrumentation
+import mock_server
+import fake_gsutil
+
+
+def start_server(args, n_entities):
+    """Start mock server in a separate process; returns (process, url)"""
+    cmd = [sys.executable, mock_server.__file__, '--entities', str(n_entities),
+        '--attributes', str(args.attributes), '--submissions', str(max(n_entities//args.workflows_per_submission, 1)),
+        '--latency', str(args.latency)]
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    line = p.stdout.readline().decode().strip()
+    assert line.startswith('Serving on '), line
+    return p, line.split()[-1]
+
+
+def populate_storage(storage_root, n_files, file_size):
+    """Create n_files objects in the mock workspace bucket; returns paths"""
+    bucket = os.path.join(storage_root, mock_server.BUCKET_ID)
+    data = b'x'*file_size
+    paths = []
+    for i in range(n_files):
+        d = os.path.join(bucket, mock_server._uuid(i//1000, 0), 'mock_workflow',
+            mock_server._uuid(i//1000, i%1000+1), 'call-task_{}'.format(i%3+1))
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, 'output_{}.txt'.format(i)), 'wb') as f:
+            f.write(data)
+        paths.append(fake_gsutil.gs_url(os.path.join(d, 'output_{}.txt'.format(i))))
+    return paths
+
+
+def benchmarks(args, n_entities, tmp_dir):
+    """
+    Benchmarks as (name, function) pairs; functions return the number of items processed
+    """
+    state = {}
+
+    def wm():  # new instance for each benchmark (cold caches)
+        return dalmatian.WorkspaceManager('mock', 'workspace')
+
+    def get_entities():
+        df = wm().get_entities('sample', num_threads=args.workers)
+        assert df.shape[0]==n_entities
+        return df.shape[0]
+
+    def export_entities():
+        return wm().export_entities('sample', os.path.join(tmp_dir, 'samples.jsonl'), num_threads=args.workers)
+
+    def get_entity_status():
+        state['status_df'] = wm().get_entity_status('sample', 'mock_config')
+        return state['status_df'].shape[0]
+
+    def get_stats():
+        status_df = state['status_df'].iloc[:args.max_workflows]
+        wm().get_stats(status_df, num_threads=args.workers)
+        return status_df.shape[0]
+
+    def get_call_analytics():
+        status_df = state['status_df'].iloc[:args.max_workflows]
+        report = wm().get_call_analytics(status_df, num_threads=args.workers)
+        return report['attempts'].shape[0]
+
+    def update_entity_attributes():
+        import pandas as pd
+        ix = ['sample_{:07d}'.format(i) for i in range(n_entities)]
+        df = pd.DataFrame({'new_attribute_1':['value_{}'.format(i) for i in range(n_entities)],
+                           'new_attribute_2':list(range(n_entities))}, index=ix)
+        wm().update_entity_attributes('sample', df, num_threads=args.workers)
+        return n_entities
+
+    def storage_setup():
+        n_files = min(n_entities, args.max_files)
+        state['paths'] = populate_storage(state['storage_root'], n_files, args.file_size)
+
+    def gs_list_objects():
+        df = core.gs_list_objects('gs://'+mock_server.BUCKET_ID+'/', num_threads=args.workers)
+        return df.shape[0]
+
+    def gs_size():
+        import pandas as pd
+        s = core.gs_size(pd.Series(state['paths']), num_threads=args.workers)
+        assert s.notnull().all()
+        return s.shape[0]
+
+    def gs_md5hashes():
+        return core.gs_md5hashes(state['paths'], num_threads=args.workers).shape[0]
+
+    def gs_cat():
+        paths = state['paths'][:args.max_cat]
+        core._thread_map(lambda x: core.gs_cat(x, max_bytes=1024), paths, num_threads=args.workers)
+        return len(paths)
+
+    def gs_delete():
+        core.gs_delete(state['paths'], num_threads=args.workers)
+        return len(state['paths'])
+
+    api = [
+        ('get_entities', get_entities),
+        ('export_entities', export_entities),
+        ('get_entity_status', get_entity_status),
+        ('get_stats', get_stats),
+        ('get_call_analytics', get_call_analytics),
+        ('update_entity_attributes', update_entity_attributes),
+    ]
+    storage = [
+        ('gs_list_objects', gs_list_objects),
+        ('gs_size', gs_size),
+        ('gs_md5hashes', gs_md5hashes),
+        ('gs_cat', gs_cat),
+        ('gs_delete', gs_delete),
+    ]
+    return api, storage, storage_setup, state
+
+
+def run(name, func, memory=True):
+    instrumentation.stats.reset()
+    if memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        n = func()
+    elapsed = time.perf_counter()-t0
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]/1024**2
+        tracemalloc.stop()
+    calls = sum(s['calls'] for s in instrumentation.stats.endpoints.values())
+    return {'benchmark':name, 'items':n, 'seconds':elapsed, 'items_per_s':n/elapsed if elapsed>0 else None,
+            'peak_mb':peak, 'calls':calls}
+
+
+def compare(results, baseline, tolerance):
+    """Report benchmarks that are slower or use more memory than the baseline"""
+    baseline = {(r['size'], r['benchmark']):r for r in baseline}
+    regressions = []
+    for r in results:
+        b = baseline.get((r['size'], r['benchmark']))
+        if b is None:
+            continue
+        for k in ['seconds', 'peak_mb']:
+            if r[k] is not None and b.get(k) is not None and r[k]>b[k]*(1+tolerance):
+                regressions.append('{} ({} entities): {} {:.3f} -> {:.3f}'.format(
+                    r['benchmark'], r['size'], k, b[k], r[k]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark API and storage calls against a local mock server.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Workspace sizes (number of samples)')
+    parser.add_argument('--latency', type=float, default=0.02, help='Mock server latency per request (seconds)')
+    parser.add_argument('--attributes', type=int, default=10, help='Attributes per sample')
+    parser.add_argument('--workflows-per-submission', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=10, help='Number of concurrent requests')
+    parser.add_argument('--max-workflows', type=int, default=1000, help='Workflows for get_stats and get_call_analytics')
+    parser.add_argument('--max-files', type=int, default=10000, help='Files in the fake bucket')
+    parser.add_argument('--max-cat', type=int, default=200, help='Files read with gs_cat')
+    parser.add_argument('--file-size', type=int, default=1024, help='Size of files in the fake bucket (bytes)')
+    parser.add_argument('--only', nargs='+', default=None, help='Run only these benchmarks')
+    parser.add_argument('--no-memory', action='store_true', help='Do not trace memory (tracemalloc adds overhead)')
+    parser.add_argument('--output', default=None, help='Save results to JSON')
+    parser.add_argument('--compare', default=None, help='Baseline results (JSON) to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative increase over the baseline')
+    args = parser.parse_args(argv)
+    if args.only is not None and ('get_stats' in args.only or 'get_call_analytics' in args.only):
+        args.only.append('get_entity_status')  # provides the workflows for get_stats/get_call_analytics
+
+    results = []
+    print('{:>8} {:<26} {:>8} {:>10} {:>12} {:>10} {:>8}'.format(
+        'size', 'benchmark', 'items', 'seconds', 'items/s', 'peak MB', 'calls'))
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            server, url = start_server(args, n)
+            env = dict(os.environ)
+            try:
+                mock_server.connect(url)
+                storage_root = os.path.join(tmp_dir, 'storage')
+                os.environ.update(fake_gsutil.install(os.path.join(tmp_dir, 'bin'), storage_root))
+                api, storage, storage_setup, state = benchmarks(args, n, tmp_dir)
+                state['storage_root'] = storage_root
+                if args.only is None or any(name in args.only for name,_ in storage):
+                    storage_setup()
+                for name, func in api+storage:
+                    if args.only is not None and name not in args.only:
+                        continue
+                    r = run(name, func, memory=not args.no_memory)
+                    r['size'] = n
+                    results.append(r)
+                    print('{:>8} {:<26} {:>8} {:>10.3f} {:>12.1f} {:>10} {:>8}'.format(n, name, r['items'], r['seconds'],
+                        r['items_per_s'] or 0, '' if r['peak_mb'] is None else '{:.1f}'.format(r['peak_mb']), r['calls']))
+            finally:
+                server.terminate()
+                server.wait()
+                os.environ.clear()
+                os.environ.update(env)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('Regressions (>{:.0%}):'.format(args.tolerance))
+            for r in regressions:
+                print('  '+r)
+            return 1
+        print('No regressions.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Fake gsutil for benchmarks: gs://bucket/path is mapped to $FAKE_GSUTIL_ROOT/bucket/path
+
+Implements the subset used by dalmatian: ls [-l|-L], cat [-r], stat, hash,
+cp, mv and rm (including -I to read paths from stdin). Wildcards '*' (within
+a directory) and '**' (recursive) are supported in ls.
+
+To use, place an executable 'gsutil' that runs this script first on PATH
+(see install()).
+"""
+import base64
+import glob
+import hashlib
+import os
+import shutil
+import stat
+import sys
+import time
+
+
+def root():
+    return os.environ['FAKE_GSUTIL_ROOT']
+
+
+def local_path(url):
+    assert url.startswith('gs://'), url
+    return os.path.join(root(), url[5:])
+
+
+def gs_url(path):
+    return 'gs://'+os.path.relpath(path, root()).replace(os.sep, '/')
+
+
+def _expand(url):
+    """Expand wildcards; returns (files, prefixes)"""
+    path = local_path(url)
+    if '*' not in url:
+        if os.path.isfile(path):
+            return [path], []
+        elif os.path.isdir(path):  # list directory contents
+            entries = sorted(os.listdir(path))
+            return ([os.path.join(path, i) for i in entries if os.path.isfile(os.path.join(path, i))],
+                    [os.path.join(path, i) for i in entries if os.path.isdir(os.path.join(path, i))])
+        return [], []
+    matches = sorted(glob.glob(path, recursive=True))
+    return [i for i in matches if os.path.isfile(i)], []
+
+
+def _md5(path):
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1<<20), b''):
+            h.update(chunk)
+    return h
+
+
+def _updated(path):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(os.stat(path).st_mtime))
+
+
+def ls(args):
+    long = '-l' in args
+    full = '-L' in args
+    urls = [i for i in args if not i.startswith('-')]
+    n = 0
+    size = 0
+    missing = False
+    for url in urls:
+        files, prefixes = _expand(url)
+        if len(files)==0 and len(prefixes)==0:
+            sys.stderr.write('CommandException: One or more URLs matched no objects.\n')
+            missing = True
+            continue
+        for f in files:
+            s = os.stat(f).st_size
+            n += 1
+            size += s
+            if full:
+                print('{}:'.format(gs_url(f)))
+                print('    Creation time:          {}'.format(_updated(f)))
+                print('    Content-Length:         {}'.format(s))
+                print('    Hash (md5):             {}'.format(base64.b64encode(_md5(f).digest()).decode()))
+            elif long:
+                print('{:>10}  {}  {}'.format(s, _updated(f), gs_url(f)))
+            else:
+                print(gs_url(f))
+        for p in prefixes:
+            if long:
+                print('{:>10}  {}/'.format('', gs_url(p)))
+            else:
+                print(gs_url(p)+'/')
+    if long:
+        print('TOTAL: {} objects, {} bytes'.format(n, size))
+    return 1 if missing else 0
+
+
+def cat(args):
+    start = None
+    if '-r' in args:
+        k = args.index('-r')
+        r = args[k+1]
+        args = args[:k]+args[k+2:]
+        start = r
+    for url in args:
+        path = local_path(url)
+        if not os.path.isfile(path):
+            sys.stderr.write('CommandException: No URLs matched: {}\n'.format(url))
+            return 1
+        with open(path, 'rb') as f:
+            data = f.read()
+        if start is not None:
+            if start.startswith('-'):  # last N bytes
+                data = data[-int(start[1:]):]
+            else:
+                a, _, b = start.partition('-')
+                data = data[int(a):int(b)+1 if b else None]
+        sys.stdout.buffer.write(data)
+    return 0
+
+
+def stat_(args):
+    status = 0
+    for url in [i for i in args if not i.startswith('-')]:
+        if not os.path.isfile(local_path(url)):
+            status = 1
+        else:
+            print('{}:'.format(url))
+    return status
+
+
+def hash_(args):
+    for url in [i for i in args if not i.startswith('-')]:
+        print('Hashes [hex] for {}:'.format(os.path.basename(url)))
+        print('\tHash (md5):\t\t{}'.format(_md5(local_path(url)).hexdigest()))
+    return 0
+
+
+def _sources(args):
+    """Sources and destination for cp/mv/rm ('-I': sources from stdin)"""
+    args = [i for i in args if i not in ['-r', '-R']]
+    if '-I' in args:
+        args.remove('-I')
+        # 'echo -e' is not supported by all shells
+        sources = [i.strip() for i in sys.stdin.read().split('\n') if i.strip()]
+        sources = [i[3:] if i.startswith('-e ') else i for i in sources]
+        return sources, args
+    return args[:-1], args[-1:]
+
+
+def copy(args, move=False):
+    sources, dest = _sources(args)
+    dest = dest[0]
+    status = 0
+    for src in sources:
+        src_path = local_path(src)
+        if not os.path.isfile(src_path):
+            sys.stderr.write('CommandException: No URLs matched: {}\n'.format(src))
+            status = 1
+            continue
+        if dest.endswith('/') or len(sources)>1:
+            dest_path = os.path.join(local_path(dest), os.path.basename(src_path))
+        else:
+            dest_path = local_path(dest)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        if move:
+            shutil.move(src_path, dest_path)
+        else:
+            shutil.copyfile(src_path, dest_path)
+    return status
+
+
+def rm(args):
+    sources, other = _sources(args)
+    sources += other
+    status = 0
+    for url in sources:
+        path = local_path(url)
+        if os.path.isfile(path):
+            os.remove(path)
+        else:
+            sys.stderr.write('CommandException: No URLs matched: {}\n'.format(url))
+            status = 1
+    return status
+
+
+COMMANDS = {
+    'ls': ls,
+    'cat': cat,
+    'stat': stat_,
+    'hash': hash_,
+    'cp': copy,
+    'mv': lambda args: copy(args, move=True),
+    'rm': rm,
+}
+
+
+def install(bin_dir, storage_root):
+    """
+    Create a 'gsutil' executable in bin_dir; returns environment variables
+    (PATH, FAKE_GSUTIL_ROOT) to apply, e.g. os.environ.update(install(...))
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    exe = os.path.join(bin_dir, 'gsutil')
+    with open(exe, 'w') as f:
+        f.write('#!/bin/sh\nexec "{}" "{}" "$@"\n'.format(sys.executable, os.path.abspath(__file__)))
+    os.chmod(exe, os.stat(exe).st_mode | stat.S_IEXEC)
+    return {'PATH': bin_dir+os.pathsep+os.environ.get('PATH', ''), 'FAKE_GSUTIL_ROOT': os.path.abspath(storage_root)}
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    # drop top-level options (-m, -q, -h <header>)
+    while argv and argv[0].startswith('-'):
+        argv = argv[2:] if argv[0]=='-h' else argv[1:]
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write('fake gsutil: unsupported command: {}\n'.format(' '.join(argv)))
+        return 1
+    return COMMANDS[argv[0]](argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
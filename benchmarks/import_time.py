@@ -0,0 +1,70 @@
+"""
+Import-time benchmark for dalmatian
+
+Each statement is timed in a fresh interpreter (median of --repeat runs):
+
+  python benchmarks/import_time.py [--repeat 10]
+"""
+import argparse
+import subprocess
+import sys
+import os
+
+_TIMER = '''
+import time
+t0 = time.perf_counter()
+{setup}
+t1 = time.perf_counter()
+{stmt}
+t2 = time.perf_counter()
+print((t1-t0)*1000, (t2-t1)*1000)
+'''
+
+# console entry point (dalmatian.cli:main); the version is not printed, since stdout returns the timings
+_CLI_VERSION = '''
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        from dalmatian.cli import main
+        main(['--version'])
+    except SystemExit:
+        pass
+'''
+
+BENCHMARKS = [
+    ('import dalmatian', '', 'import dalmatian'),
+    ('dalmatian --version (CLI entry point)', 'import io, contextlib',
+        _CLI_VERSION),
+    ('first WorkspaceManager construction', 'import dalmatian',
+        'dalmatian.WorkspaceManager("namespace", "workspace")'),
+    ('first use of pandas/firecloud (deferred cost)', 'import dalmatian; wm = dalmatian.WorkspaceManager("namespace", "workspace")',
+        'import dalmatian.wmanager as w; w.pd.DataFrame; w.np.nan; w.firecloud.api'),
+]
+
+
+def run(setup, stmt, repeat):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(repeat):
+        s = subprocess.check_output([sys.executable, '-c', _TIMER.format(setup=setup, stmt=stmt)],
+            cwd=root, stderr=subprocess.DEVNULL)
+        times.append([float(i) for i in s.decode().split()])
+    times.sort(key=lambda x: x[1])
+    return times[len(times)//2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time import of dalmatian and first WorkspaceManager construction.')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of runs per statement')
+    args = parser.parse_args(argv)
+
+    print('{:<50} {:>10}'.format('benchmark', 'median ms'))
+    for name, setup, stmt in BENCHMARKS:
+        try:
+            t = run(setup, stmt, args.repeat)
+            print('{:<50} {:>10.1f}'.format(name, t[1]))
+        except subprocess.CalledProcessError:
+            print('{:<50} {:>10}'.format(name, 'failed'))
+
+
+if __name__ == '__main__':
+    main()
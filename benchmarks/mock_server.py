@@ -0,0 +1,584 @@
+"""
+Local stand-in for the FireCloud/rawls API, for benchmarks
+
+Serves a synthetic workspace (samples, participants, sample sets, submissions
+and workflow metadata) with configurable latency and data size:
+
+  python benchmarks/mock_server.py --entities 10000 --latency 0.05
+
+Emulated endpoints (relative to /api/):
+  workspaces/{namespace}/{workspace}
+  workspaces/{namespace}/{workspace}/entities
+  workspaces/{namespace}/{workspace}/entities/{etype}
+  workspaces/{namespace}/{workspace}/entityQuery/{etype}
+  workspaces/{namespace}/{workspace}/entities/batchUpdate (POST)
+  workspaces/{namespace}/{workspace}/entities/delete (POST)
+  workspaces/{namespace}/{workspace}/importEntities (POST, TSV)
+  workspaces/{namespace}/{workspace}/method_configs/{cnamespace}/{config}
+  workspaces/{namespace}/{workspace}/submissions
+  workspaces/{namespace}/{workspace}/submissions/{submission_id}
+  workspaces/{namespace}/{workspace}/submissions/{submission_id}/workflows/{workflow_id}
+
+Only the standard library is used, so that the server can run in a
+separate process from the benchmarked client. Imports and deletions check
+references like rawls (referenced entities must exist; referenced entities
+cannot be deleted), so that the server can also be used in tests.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BUCKET_ID = 'fc-00000000-0000-4000-8000-000000000000'
+START_TIME = datetime(2018, 1, 1, tzinfo=timezone.utc)
+MACHINE_TYPES = ['n1-standard-1', 'n1-standard-2', 'n1-standard-4', 'n1-highmem-2']
+
+
+def _uuid(a, b):
+    return '{:08x}-0000-4000-8000-{:012x}'.format(a, b)
+
+
+def _timestamp(t):
+    return t.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]+'Z'
+
+
+class MockWorkspace(object):
+    """
+    Synthetic workspace contents
+
+    n_entities:      number of samples (participants: n_entities/2)
+    n_attributes:    number of (path) attributes per sample
+    n_sample_sets:   number of sample sets (set k: samples i with i%n_sample_sets==k)
+    participant_samples: add the samples of each participant as participant.samples_
+    n_submissions:   samples are split evenly across submissions
+    n_tasks:         tasks per workflow; the second task is scattered over n_shards
+    preemption_rate: probability that an attempt is preempted
+    cache_hit_rate:  probability that a task is a call cache hit
+    failure_rate:    probability that a workflow fails
+
+    Entities, submissions and metadata are generated on request (deterministically),
+    so that large workspaces do not use memory in the server. Imported entities
+    are listed after the generated entities of the same type.
+    """
+    def __init__(self, n_entities=1000, n_attributes=10, n_submissions=10, n_tasks=3, n_shards=4,
+                 preemption_rate=0.2, cache_hit_rate=0.1, failure_rate=0.05, config='mock_config',
+                 n_sample_sets=0, participant_samples=False):
+        self.n_entities = n_entities
+        self.n_attributes = n_attributes
+        self.n_sample_sets = min(n_sample_sets, n_entities)
+        self.participant_samples = participant_samples
+        self.n_submissions = max(min(n_submissions, n_entities), 1)
+        self.n_tasks = n_tasks
+        self.n_shards = n_shards
+        self.preemption_rate = preemption_rate
+        self.cache_hit_rate = cache_hit_rate
+        self.failure_rate = failure_rate
+        self.config = config
+        self.workflow_name = 'mock_workflow'
+        self.updates = {}  # attributes set with batchUpdate
+        self.imported = {}  # entities created with importEntities: {etype: {name: attributes}}
+        self.deleted = set()  # (etype, name)
+        self.imports = []  # entity types of importEntities calls, in order
+        self.attribute_names = {
+            'sample': ['participant']+['attribute_{}'.format(i+1) for i in range(n_attributes)] if n_entities>0 else [],
+            'participant': ['samples_'] if participant_samples and n_entities>0 else [],
+            'sample_set': ['samples'],
+        }
+        self.batch_operations = 0
+        self._lock = threading.Lock()
+
+    #--------------------------------------------------------------------------
+    #  Entities
+    #--------------------------------------------------------------------------
+    def _generated_count(self, etype):
+        return {'sample':self.n_entities, 'participant':int(math.ceil(self.n_entities/2)),
+                'sample_set':self.n_sample_sets}.get(etype, 0)
+
+    def _name(self, etype, i):
+        return '{}_{:07d}'.format(etype, i)
+
+    def _generated(self, etype, i):
+        """Attributes of generated entity i"""
+        attributes = {}
+        if etype=='sample':
+            attributes['participant'] = {'entityType':'participant', 'entityName':self._name('participant', i//2)}
+            attributes.update(self.outputs(i))
+        elif etype=='participant' and self.participant_samples:
+            attributes['samples_'] = {'itemsType':'EntityReference', 'items':[
+                {'entityType':'sample', 'entityName':self._name('sample', j)} for j in range(2*i, min(2*i+2, self.n_entities))]}
+        elif etype=='sample_set':
+            attributes['samples'] = {'itemsType':'EntityReference', 'items':[
+                {'entityType':'sample', 'entityName':self._name('sample', j)} for j in range(i, self.n_entities, self.n_sample_sets)]}
+        return attributes
+
+    def names(self, etype, start=0, stop=None):
+        """Names of entities (generated, then imported; excluding deleted entities)"""
+        n = self._generated_count(etype)
+        if etype not in self.imported and not any(e[0]==etype for e in self.deleted):
+            return [self._name(etype, i) for i in range(start, n if stop is None else min(stop, n))]
+        with self._lock:
+            names = [self._name(etype, i) for i in range(n)]+list(self.imported.get(etype, {}))
+            return [i for i in names if (etype, i) not in self.deleted][start:stop]
+
+    def count(self, etype):
+        return len(self.names(etype))
+
+    def exists(self, etype, name):
+        if (etype, name) in self.deleted:
+            return False
+        elif name in self.imported.get(etype, {}):
+            return True
+        i = name.rsplit('_', 1)[-1]
+        return name==self._name(etype, int(i)) and int(i)<self._generated_count(etype) if i.isdigit() else False
+
+    def entity(self, etype, name):
+        if name in self.imported.get(etype, {}):
+            attributes = dict(self.imported[etype][name])
+        else:
+            attributes = self._generated(etype, int(name.rsplit('_', 1)[-1]))
+        attributes.update(self.updates.get((etype, name), {}))
+        return {'name':name, 'entityType':etype, 'attributes':{k:v for k,v in attributes.items() if v is not None}}
+
+    def entity_types(self):
+        return {etype:{'count':self.count(etype), 'attributeNames':self.attribute_names.get(etype, []),
+                       'idName':etype+'_id'} for etype in ['participant', 'sample', 'sample_set']+sorted(self.imported)
+                if self.count(etype)>0}
+
+    def entity_query(self, etype, page, page_size):
+        n = self.count(etype)
+        results = [self.entity(etype, i) for i in self.names(etype, (page-1)*page_size, page*page_size)]
+        return {
+            'parameters': {'page':page, 'pageSize':page_size, 'sortField':'name', 'sortDirection':'asc'},
+            'resultMetadata': {'unfilteredCount':n, 'filteredCount':n,
+                               'filteredPageCount':int(math.ceil(n/page_size))},
+            'results': results,
+        }
+
+    def import_entities(self, tsv):
+        """
+        Import entities or set memberships from a TSV (FireCloud data model):
+        'entity:{etype}_id' (references: '{ref_type}_id' columns) or
+        'membership:{set_type}_id' with a '{member_type}_id' column
+
+        Returns an error message if a referenced entity does not exist
+        """
+        lines = [l.split('\t') for l in tsv.strip('\n').split('\n')]
+        kind, etype = lines[0][0].split(':', 1)
+        etype = etype[:-3]  # '_id'
+        header = lines[0][1:]
+        refs = {h:h[:-3] for h in header if h.endswith('_id')}
+        if kind=='membership':
+            refs = {header[0]:header[0][:-3]}
+        missing = sorted(set('{} {}'.format(refs[h], v) for row in lines[1:] for h,v in zip(header, row[1:])
+            if h in refs and v!='' and not self.exists(refs[h], v)))
+        if missing:
+            return 'Entities not found: {}'.format(', '.join(missing))
+        with self._lock:
+            self.imports.append(etype)
+            entities = self.imported.setdefault(etype, {})
+            names = self.attribute_names.setdefault(etype, [])
+            for row in lines[1:]:
+                name = row[0]
+                self.deleted.discard((etype, name))
+                attributes = entities.setdefault(name, {})
+                if kind=='membership':
+                    members = etype[:-4]+'s'
+                    attributes.setdefault(members, {'itemsType':'EntityReference', 'items':[]})['items'].append(
+                        {'entityType':refs[header[0]], 'entityName':row[1]})
+                    if members not in names:
+                        names.append(members)
+                    continue
+                for h,v in zip(header, row[1:]):
+                    if v=='':
+                        continue
+                    attr = refs[h] if h in refs else h
+                    attributes[attr] = {'entityType':refs[h], 'entityName':v} if h in refs else v
+                    if attr not in names:
+                        names.append(attr)
+
+    def delete_entities(self, body):
+        """
+        Delete entities (all in one request); returns the entities that are
+        still referenced by other entities, in which case nothing is deleted
+        """
+        deleted = set((e['entityType'], e['entityName']) for e in body)
+        referencing = []
+        for etype in list(self.entity_types()):
+            for name in self.names(etype):
+                if (etype, name) in deleted:
+                    continue
+                for v in self.entity(etype, name)['attributes'].values():
+                    items = v.get('items', [v]) if isinstance(v, dict) else []
+                    if any((i.get('entityType'), i.get('entityName')) in deleted for i in items if isinstance(i, dict)):
+                        referencing.append({'entityType':etype, 'entityName':name})
+                        break
+        if not referencing:
+            with self._lock:
+                self.deleted.update(deleted)
+        return referencing
+
+    def batch_update(self, body):
+        with self._lock:
+            for e in body:
+                updates = self.updates.setdefault((e['entityType'], e['name']), {})
+                for op in e['operations']:
+                    self.batch_operations += 1
+                    if op['op']=='AddUpdateAttribute':
+                        updates[op['attributeName']] = op['addUpdateAttribute']
+                        names = self.attribute_names.setdefault(e['entityType'], [])
+                        if op['attributeName'] not in names:
+                            names.append(op['attributeName'])
+                    elif op['op']=='RemoveAttribute':  # also hides generated attributes
+                        updates[op['attributeName']] = None
+
+    #--------------------------------------------------------------------------
+    #  Submissions and workflows
+    #--------------------------------------------------------------------------
+    def workflow_index(self, i):
+        """Submission and workflow index for sample i"""
+        per_submission = int(math.ceil(self.n_entities/self.n_submissions))
+        return i//per_submission, i%per_submission
+
+    def submission_samples(self, s):
+        per_submission = int(math.ceil(self.n_entities/self.n_submissions))
+        return range(s*per_submission, min((s+1)*per_submission, self.n_entities))
+
+    def outputs(self, i):
+        """Outputs of the workflow of sample i (written to the sample attributes)"""
+        s, w = self.workflow_index(i)
+        return {'attribute_{}'.format(k+1):'gs://{}/{}/{}/{}/call-task_{}/{}.attribute_{}.txt'.format(
+            BUCKET_ID, _uuid(s, 0), self.workflow_name, _uuid(s, w+1), self.n_tasks, self._name('sample', i), k+1)
+            for k in range(self.n_attributes)}
+
+    def method_config(self, namespace, name):
+        return {
+            'namespace': namespace,
+            'name': name,
+            'rootEntityType': 'sample',
+            'methodRepoMethod': {'methodNamespace':'mock', 'methodName':self.workflow_name, 'methodVersion':1},
+            'inputs': {},
+            'outputs': {'{}.attribute_{}'.format(self.workflow_name, k+1):'this.attribute_{}'.format(k+1)
+                        for k in range(self.n_attributes)},
+        }
+
+    def workflow_status(self, s, w):
+        return 'Failed' if random.Random('{}-{}'.format(s, w)).random()<self.failure_rate else 'Succeeded'
+
+    def submission_summary(self, s):
+        statuses = {}
+        for w,_ in enumerate(self.submission_samples(s)):
+            status = self.workflow_status(s, w)
+            statuses[status] = statuses.get(status, 0) + 1
+        return {
+            'submissionId': _uuid(s, 0),
+            'submissionDate': _timestamp(START_TIME+timedelta(days=s)),
+            'status': 'Done',
+            'submitter': 'user@mock.org',
+            'methodConfigurationNamespace': 'mock',
+            'methodConfigurationName': self.config,
+            'submissionEntity': {'entityType':'sample', 'entityName':'sample_{:07d}'.format(self.submission_samples(s)[0])},
+            'workflowStatuses': statuses,
+            'useCallCache': True,
+        }
+
+    def submissions(self):
+        return [self.submission_summary(s) for s in range(self.n_submissions)]
+
+    def submission(self, submission_id):
+        s = int(submission_id.split('-')[0], 16)
+        if s>=self.n_submissions:
+            return None
+        r = self.submission_summary(s)
+        r['workflows'] = [{
+            'workflowId': _uuid(s, w+1),
+            'status': self.workflow_status(s, w),
+            'statusLastChangedDate': _timestamp(START_TIME+timedelta(days=s, hours=12)),
+            'workflowEntity': {'entityType':'sample', 'entityName':'sample_{:07d}'.format(i)},
+            'inputResolutions': [],
+            'messages': [],
+        } for w,i in enumerate(self.submission_samples(s))]
+        return r
+
+    def workflow_metadata(self, submission_id, workflow_id):
+        s = int(submission_id.split('-')[0], 16)
+        w = int(workflow_id.split('-')[-1], 16)-1
+        if s>=self.n_submissions or w<0 or w>=len(self.submission_samples(s)):
+            return None
+        rng = random.Random(workflow_id)
+        status = self.workflow_status(s, w)
+        workflow_root = 'gs://{}/{}/{}/{}'.format(BUCKET_ID, submission_id, self.workflow_name, workflow_id)
+        start = START_TIME+timedelta(days=s, minutes=rng.randint(0, 60))
+        t = start
+        calls = {}
+        for k in range(self.n_tasks):
+            task = 'task_{}'.format(k+1)
+            shards = range(self.n_shards) if k==1 else [-1]
+            machine_type = MACHINE_TYPES[k%len(MACHINE_TYPES)]
+            hit = rng.random()<self.cache_hit_rate
+            attempts = []
+            task_end = t
+            for shard in shards:
+                n_attempts = 1
+                while not hit and n_attempts<3 and rng.random()<self.preemption_rate:
+                    n_attempts += 1
+                a_start = t
+                for a in range(n_attempts):
+                    preempted = a<n_attempts-1
+                    failed = status=='Failed' and k==self.n_tasks-1 and not preempted
+                    duration = timedelta(seconds=5) if hit else timedelta(minutes=rng.uniform(5, 120))
+                    quota = timedelta(minutes=rng.uniform(0, 5)) if not hit else timedelta(0)
+                    a_end = a_start+quota+duration
+                    call_root = '{}/call-{}{}{}'.format(workflow_root, task,
+                        '/shard-{}'.format(shard) if shard>=0 else '', '/attempt-{}'.format(a+1) if a>0 else '')
+                    call = {
+                        'attempt': a+1,
+                        'shardIndex': shard,
+                        'executionStatus': 'RetryableFailure' if preempted else ('Failed' if failed else 'Done'),
+                        'backendStatus': 'Preempted' if preempted else ('Failed' if failed else 'Success'),
+                        'start': _timestamp(a_start),
+                        'end': _timestamp(a_end),
+                        'callRoot': call_root,
+                        'stdout': call_root+'/stdout',
+                        'stderr': call_root+'/stderr',
+                        'backendLogs': {'log': call_root+'/'+task+'.log'},
+                        'returnCode': 1 if failed else 0,
+                        'preemptible': True,
+                        'callCaching': {'allowResultReuse':True, 'hit':hit,
+                                        'result':'Cache Hit: {}'.format(_uuid(0, 0)) if hit else 'Cache Miss'},
+                        'runtimeAttributes': {'preemptible':'2', 'maxRetries':'0', 'cpu':machine_type.rsplit('-', 1)[-1],
+                                              'memory':'7.5 GB', 'disks':'local-disk 100 HDD', 'docker':'mock/image:1'},
+                        'executionEvents': [
+                            {'description':'waiting for quota', 'startTime':_timestamp(a_start), 'endTime':_timestamp(a_start+quota)},
+                            {'description':'RunningJob', 'startTime':_timestamp(a_start+quota), 'endTime':_timestamp(a_end)},
+                        ],
+                        'inputs': {'input_file':'gs://{}/inputs/{}.bam'.format(BUCKET_ID, w)},
+                        'outputs': {} if (preempted or failed) else {'output_file':call_root+'/output.txt'},
+                    }
+                    if not hit:
+                        call['jobId'] = 'projects/mock/operations/{}'.format(rng.getrandbits(63))
+                        call['jes'] = {'machineType':'us-central1-b/'+machine_type, 'zone':'us-central1-b',
+                                       'executionBucket':'gs://'+BUCKET_ID}
+                    attempts.append(call)
+                    a_start = a_end
+                task_end = max(task_end, a_start)
+            calls['{}.{}'.format(self.workflow_name, task)] = attempts
+            t = task_end
+        return {
+            'id': workflow_id,
+            'workflowName': self.workflow_name,
+            'status': status,
+            'submission': _timestamp(start),
+            'start': _timestamp(start),
+            'end': _timestamp(t),
+            'workflowRoot': workflow_root,
+            'calls': calls,
+            'inputs': {},
+            'outputs': {} if status=='Failed' else {'{}.{}'.format(self.workflow_name, k):v
+                for k,v in self.outputs(self.submission_samples(s)[w]).items()},
+            'labels': {'cromwell-workflow-id':'cromwell-'+workflow_id},
+        }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Request handler; the server holds 'workspace(s)' and 'latency'"""
+    protocol_version = 'HTTP/1.1'
+    _prefix = r'^/api/workspaces/(?P<namespace>[^/]+)/(?P<workspace>[^/]+)'
+    routes = [
+        ('GET', re.compile(_prefix+r'/?$'), 'get_workspace'),
+        ('GET', re.compile(_prefix+r'/entities/?$'), 'list_entity_types'),
+        ('POST', re.compile(_prefix+r'/entities/batchUpdate$'), 'batch_update'),
+        ('POST', re.compile(_prefix+r'/entities/delete$'), 'delete_entities'),
+        ('POST', re.compile(_prefix+r'/importEntities$'), 'import_entities'),
+        ('GET', re.compile(_prefix+r'/entities/(?P<etype>[^/]+)$'), 'get_entities'),
+        ('GET', re.compile(_prefix+r'/entityQuery/(?P<etype>[^/]+)$'), 'entity_query'),
+        ('GET', re.compile(_prefix+r'/method_configs/(?P<cnamespace>[^/]+)/(?P<config>[^/]+)$'), 'get_method_config'),
+        ('GET', re.compile(_prefix+r'/submissions/?$'), 'list_submissions'),
+        ('GET', re.compile(_prefix+r'/submissions/(?P<submission_id>[^/]+)$'), 'get_submission'),
+        ('GET', re.compile(_prefix+r'/submissions/(?P<submission_id>[^/]+)/workflows/(?P<workflow_id>[^/]+)$'),
+            'get_workflow_metadata'),
+    ]
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write(format % args + '\n')
+
+    def _respond(self, status, body=None):
+        data = b'' if body is None else json.dumps(body).encode()
+        delay = self.server.latency
+        if self.server.bandwidth is not None:
+            delay += len(data)/self.server.bandwidth
+        if delay>0:
+            time.sleep(delay)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        for m, regex, name in self.routes:
+            match = regex.match(url.path)
+            if m==method and match:
+                query = {k:v[0] for k,v in parse_qs(url.query).items()}
+                try:
+                    return getattr(self, name)(query=query, **match.groupdict())
+                except Exception as e:
+                    return self._respond(500, {'message':'{}: {}'.format(type(e).__name__, e)})
+        self._respond(404, {'message':'Not found: {} {}'.format(method, url.path)})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _workspace(self, name):
+        return self.server.workspaces.get(name, self.server.workspace)
+
+    # endpoints
+    def get_workspace(self, namespace, workspace, query):
+        self._respond(200, {
+            'accessLevel': 'OWNER',
+            'workspace': {'namespace':namespace, 'name':workspace, 'bucketName':BUCKET_ID,
+                          'attributes':{'reference':'gs://{}/reference.fasta'.format(BUCKET_ID)}},
+        })
+
+    def list_entity_types(self, namespace, workspace, query):
+        self._respond(200, self._workspace(workspace).entity_types())
+
+    def get_entities(self, namespace, workspace, etype, query):
+        ws = self._workspace(workspace)
+        self._respond(200, [ws.entity(etype, i) for i in ws.names(etype)])
+
+    def entity_query(self, namespace, workspace, etype, query):
+        page = int(query.get('page', 1))
+        page_size = int(query.get('pageSize', 100))
+        self._respond(200, self._workspace(workspace).entity_query(etype, page, page_size))
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length).decode()
+
+    def batch_update(self, namespace, workspace, query):
+        self._workspace(workspace).batch_update(json.loads(self._body()))
+        self._respond(204)
+
+    def delete_entities(self, namespace, workspace, query):
+        referencing = self._workspace(workspace).delete_entities(json.loads(self._body()))
+        if referencing:
+            self._respond(409, referencing)
+        else:
+            self._respond(204)
+
+    def import_entities(self, namespace, workspace, query):
+        error = self._workspace(workspace).import_entities(parse_qs(self._body())['entities'][0])
+        if error is not None:
+            self._respond(400, {'message':error})
+        else:
+            self._respond(200)
+
+    def get_method_config(self, namespace, workspace, cnamespace, config, query):
+        self._respond(200, self._workspace(workspace).method_config(cnamespace, config))
+
+    def list_submissions(self, namespace, workspace, query):
+        self._respond(200, self._workspace(workspace).submissions())
+
+    def get_submission(self, namespace, workspace, submission_id, query):
+        r = self._workspace(workspace).submission(submission_id)
+        if r is None:
+            self._respond(404, {'message':'Submission {} not found'.format(submission_id)})
+        else:
+            self._respond(200, r)
+
+    def get_workflow_metadata(self, namespace, workspace, submission_id, workflow_id, query):
+        r = self._workspace(workspace).workflow_metadata(submission_id, workflow_id)
+        if r is None:
+            self._respond(404, {'message':'Workflow {} not found'.format(workflow_id)})
+        else:
+            self._respond(200, r)
+
+
+class MockServer(ThreadingHTTPServer):
+    """
+    workspace:  MockWorkspace served for all workspace names
+    workspaces: additional MockWorkspaces, by workspace name (e.g., copy destinations)
+    """
+    daemon_threads = True
+
+    def __init__(self, workspace, host='127.0.0.1', port=0, latency=0, bandwidth=None, verbose=False, workspaces=None):
+        super().__init__((host, port), MockHandler)
+        self.workspace = workspace
+        self.workspaces = {} if workspaces is None else workspaces
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.verbose = verbose
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def start(self):
+        """Serve from a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def connect(url):
+    """
+    Point FISS (firecloud.api) and dalmatian at a mock server, without authentication
+    """
+    import requests
+    import firecloud.api
+    from dalmatian import wmanager
+    firecloud.api.fcconfig.root_url = url+'/api/'
+    setattr(firecloud.api, '__SESSION', requests.Session())  # skip Google authentication
+    wmanager.RAWLS_API_URL = url+'/api/'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local FireCloud/rawls stand-in for benchmarks.')
+    parser.add_argument('--port', type=int, default=0, help='Port (default: any free port)')
+    parser.add_argument('--entities', type=int, default=1000, help='Number of samples')
+    parser.add_argument('--attributes', type=int, default=10, help='Attributes per sample')
+    parser.add_argument('--sample-sets', type=int, default=0, help='Number of sample sets')
+    parser.add_argument('--participant-samples', action='store_true', help='Add participant.samples_ lists')
+    parser.add_argument('--submissions', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=3, help='Tasks per workflow')
+    parser.add_argument('--shards', type=int, default=4, help='Shards of the scattered task')
+    parser.add_argument('--preemption-rate', type=float, default=0.2)
+    parser.add_argument('--cache-hit-rate', type=float, default=0.1)
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0, help='Latency per request (seconds)')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Response bandwidth (bytes/s)')
+    parser.add_argument('--verbose', action='store_true', help='Log requests')
+    args = parser.parse_args(argv)
+
+    workspace = MockWorkspace(n_entities=args.entities, n_attributes=args.attributes, n_submissions=args.submissions,
+        n_tasks=args.tasks, n_shards=args.shards, preemption_rate=args.preemption_rate,
+        cache_hit_rate=args.cache_hit_rate, failure_rate=args.failure_rate,
+        n_sample_sets=args.sample_sets, participant_samples=args.participant_samples)
+    server = MockServer(workspace, port=args.port, latency=args.latency, bandwidth=args.bandwidth, verbose=args.verbose)
+    print('Serving on {}'.format(server.url), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
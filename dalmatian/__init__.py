@@ -1,2 +1,33 @@
-from .wmanager import *
-from .core import *
+import importlib
+import pkgutil
+
+from .__about__ import __version__
+
+# Submodules (and their dependencies: pandas, firecloud, ...) are loaded on
+# first access to one of their functions or classes, e.g. dalmatian.WorkspaceManager
+_submodules = ['wmanager', 'core', 'analytics', 'snapshots']
+
+
+def _exported(module, name):
+    """Public function or class defined in module (not imported from elsewhere)"""
+    return not name.startswith('_') and getattr(getattr(module, name, None), '__module__', None)==module.__name__
+
+
+def __getattr__(name):
+    if name=='__all__':  # from dalmatian import *
+        return sorted(set([i for m in _submodules for i in dir(importlib.import_module('.'+m, __name__))
+            if _exported(importlib.import_module('.'+m, __name__), i)]))
+    # submodules are not resolved here: 'from . import x' must fall back to importing
+    # the submodule, without importing other submodules (which may be partially initialized)
+    if name.startswith('_') or name in [m.name for m in pkgutil.iter_modules(__path__)]:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+    for m in _submodules:
+        module = importlib.import_module('.'+m, __name__)
+        if _exported(module, name):
+            globals()[name] = getattr(module, name)
+            return globals()[name]
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(list(globals())+__getattr__('__all__')))
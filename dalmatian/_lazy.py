@@ -0,0 +1,36 @@
+import importlib
+
+
+class LazyModule(object):
+    """
+    Placeholder for a module that is imported on first attribute access
+
+    Used for heavy dependencies (pandas, firecloud, ...) so that importing
+    dalmatian (e.g., for the command line interface) stays fast.
+
+    name:       module name, e.g. 'pandas'
+    submodules: submodules that must be imported as well, e.g. ['firecloud.api']
+    """
+    def __init__(self, name, submodules=()):
+        self.__name = name
+        self.__submodules = submodules
+        self.__module = None
+
+    def __load(self):
+        if self.__module is None:
+            module = importlib.import_module(self.__name)
+            for i in self.__submodules:
+                importlib.import_module(i)
+            self.__module = module
+        return self.__module
+
+    def __getattr__(self, attr):
+        return getattr(self.__load(), attr)
+
+    def __dir__(self):
+        return dir(self.__load())
+
+    def __repr__(self):
+        if self.__module is None:
+            return "<lazy module '{}' (not loaded)>".format(self.__name)
+        return repr(self.__module)
@@ -0,0 +1,180 @@
+from ._lazy import LazyModule
+from .core import get_vm_cost
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
+# Call-caching, preemption and retry analytics over call attempts, i.e. the
+# flattened workflow metadata (see WorkspaceManager.get_call_analytics). All
+# statistics are computed with grouped aggregations over the attempts table.
+
+
+def _vm_rates(machine_types, preemptible):
+    """Cost per hour of each attempt (NaN for missing or unknown machine types)"""
+    machine_types = machine_types.astype('category')
+    rates = {}
+    for p in [True, False]:
+        r = []
+        for m in machine_types.cat.categories:
+            try:
+                r.append(get_vm_cost(m, p))
+            except KeyError:
+                r.append(np.nan)
+        rates[p] = np.array(r+[np.nan])  # code -1: missing
+    codes = machine_types.cat.codes.values
+    return np.where(preemptible, rates[True][codes], rates[False][codes])
+
+
+def classify_attempts(attempts_df):
+    """
+    Annotate call attempts (one row per attempt, in attempt order)
+
+    Adds columns 'final' (last attempt of the shard), 'preempted', 'failed_retry'
+    (attempt that failed and was retried, e.g. with maxRetries) and 'cost'
+    """
+    df = attempts_df.copy()
+    g = df.groupby(['key', 'task', 'shard'], sort=False, observed=True)
+    df['final'] = (g.cumcount(ascending=False)==0).values
+    status = df['execution_status'].astype(object)
+    # preempted attempts are reported as 'Preempted' or, by newer Cromwell versions, 'RetryableFailure'
+    df['preempted'] = (status=='Preempted') | (~df['final'] & df['preemptible']
+        & ((status=='RetryableFailure') | status.isnull()))
+    df['failed_retry'] = ~df['final'] & ~df['preempted']
+    df['cost'] = _vm_rates(df['machine_type'], df['preemptible'].values) * df['time_h']
+    return df
+
+
+def call_cache_stats(attempts_df):
+    """
+    Call cache hit rates for each task
+
+    Returns pd.DataFrame indexed by task, with columns 'calls' (shards), 'hits',
+    'hit_rate', and 'est_saved_h'/'est_saved_cost' (hits times the mean time/cost
+    of calls that were run)
+    """
+    df = attempts_df if 'final' in attempts_df else classify_attempts(attempts_df)
+    df = df[df['final']]
+    run = ~df['hit'] & (df['execution_status']=='Done')
+    df = df.assign(run_h=df['time_h'].where(run), run_cost=df['cost'].where(run))
+    stats_df = df.groupby('task', observed=True).agg(
+        calls=('hit', 'size'), hits=('hit', 'sum'), run_h=('run_h', 'mean'), run_cost=('run_cost', 'mean'))
+    stats_df['hit_rate'] = stats_df['hits']/stats_df['calls']
+    stats_df['est_saved_h'] = stats_df['hits']*stats_df['run_h']
+    stats_df['est_saved_cost'] = stats_df['hits']*stats_df['run_cost']
+    return stats_df[['calls', 'hits', 'hit_rate', 'est_saved_h', 'est_saved_cost']]
+
+
+def preemption_stats(attempts_df):
+    """
+    Preemptions and time/cost wasted by preempted attempts, for each task
+
+    Returns pd.DataFrame indexed by task, with columns 'attempts',
+    'preemptible_attempts', 'preempted', 'preemption_rate' (per preemptible
+    attempt), 'preemptible_h', 'preemptions_per_h' (per hour on preemptible
+    VMs), 'wasted_h', 'wasted_cost', 'total_cost' and 'wasted_fraction'.
+    Costs only include attempts with known machine types.
+    """
+    df = attempts_df if 'final' in attempts_df else classify_attempts(attempts_df)
+    preemptible = df['preemptible'] & ~df['hit']
+    df = df.assign(
+        preemptible_run=preemptible,
+        preemptible_h=df['time_h'].where(preemptible, 0),
+        wasted_h=df['time_h'].where(df['preempted'], 0),
+        wasted_cost=df['cost'].where(df['preempted'], 0),
+    )
+    stats_df = df.groupby('task', observed=True).agg(
+        attempts=('pos', 'size'),
+        preemptible_attempts=('preemptible_run', 'sum'),
+        preempted=('preempted', 'sum'),
+        preemptible_h=('preemptible_h', 'sum'),
+        wasted_h=('wasted_h', 'sum'),
+        wasted_cost=('wasted_cost', 'sum'),
+        total_cost=('cost', 'sum'),
+    )
+    stats_df['preemption_rate'] = stats_df['preempted']/stats_df['preemptible_attempts'].replace(0, np.nan)
+    stats_df['preemptions_per_h'] = stats_df['preempted']/stats_df['preemptible_h'].replace(0, np.nan)
+    stats_df['wasted_fraction'] = stats_df['wasted_cost']/stats_df['total_cost'].replace(0, np.nan)
+    return stats_df[['attempts', 'preemptible_attempts', 'preempted', 'preemption_rate', 'preemptible_h',
+                     'preemptions_per_h', 'wasted_h', 'wasted_cost', 'total_cost', 'wasted_fraction']]
+
+
+def retry_distribution(attempts_df):
+    """Number of shards (values) for each task (rows) by number of attempts (columns)"""
+    n = attempts_df.groupby(['task', 'key', 'shard'], observed=True).size()
+    df = n.rename('attempts').reset_index().groupby(['task', 'attempts'], observed=True).size()
+    return df.unstack('attempts', fill_value=0)
+
+
+def suggest_settings(attempts_df, max_preemptible=5, max_retries=3):
+    """
+    Suggest 'preemptible' and 'maxRetries' runtime attributes for each task
+
+    preemptible: number of preemptible attempts that minimizes the expected
+        cost of a call, given the task's runtime, the preemption rate per hour
+        (pooled across tasks if the task never ran on preemptible VMs) and the
+        time lost per preemption
+    maxRetries: the most failure retries needed by a call that eventually
+        succeeded (capped at max_retries)
+
+    Returns pd.DataFrame indexed by task, with columns 'runtime_h',
+    'preemption_prob', 'suggested_preemptible', 'est_cost',
+    'est_cost_standard' (no preemptible attempts), 'suggested_max_retries'
+    """
+    df = attempts_df if 'final' in attempts_df else classify_attempts(attempts_df)
+    p_df = preemption_stats(df)
+
+    # runtime and VM rates of successful calls
+    done = df[df['final'] & ~df['hit'] & (df['execution_status']=='Done')]
+    done = done.assign(
+        rate_preemptible=_vm_rates(done['machine_type'], True),
+        rate_standard=_vm_rates(done['machine_type'], False),
+    )
+    s_df = done.groupby('task', observed=True)[['time_h', 'rate_preemptible', 'rate_standard']].mean().reindex(p_df.index)
+    t = s_df['time_h'].values
+    hours = p_df['preemptible_h'].sum()
+    rate = p_df['preemptions_per_h'].fillna(p_df['preempted'].sum()/hours if hours>0 else 0).values
+    q = 1-np.exp(-rate*t)  # probability that an attempt is preempted
+    lost = (p_df['wasted_h']/p_df['preempted'].replace(0, np.nan)).fillna(pd.Series(t/2, index=p_df.index)).values
+
+    # expected cost for 0..max_preemptible preemptible attempts (then a standard VM)
+    attempt_cost = s_df['rate_preemptible'].values * ((1-q)*t + q*lost)
+    costs = np.empty((len(t), max_preemptible+1))
+    reach = np.zeros(len(t))  # expected number of preemptible attempts
+    for n in range(max_preemptible+1):
+        costs[:,n] = reach*attempt_cost + q**n * s_df['rate_standard'].values*t
+        reach += q**n
+    valid = ~np.isnan(costs).any(axis=1)
+    best = np.where(valid, np.argmin(np.where(np.isnan(costs), np.inf, costs), axis=1), 0)
+
+    # failure retries of calls that eventually succeeded
+    keys = ['task', 'key', 'shard']
+    failures = df.groupby(keys, observed=True)['failed_retry'].sum()
+    status = df[df['final']].set_index(keys)['execution_status'].reindex(failures.index)
+    recovered = failures[(status.values=='Done') & (failures.values>0)]
+
+    return pd.DataFrame({
+        'runtime_h': t,
+        'preemption_prob': q,
+        'suggested_preemptible': pd.Series(best, index=p_df.index).where(valid),
+        'est_cost': pd.Series(costs[np.arange(len(t)), best], index=p_df.index).where(valid),
+        'est_cost_standard': costs[:,0],
+        'suggested_max_retries': recovered.groupby(level='task', observed=True).max().clip(upper=max_retries)
+            .reindex(p_df.index, fill_value=0),
+    }, index=p_df.index)
+
+
+def call_report(attempts_df, max_preemptible=5, max_retries=3):
+    """
+    All call analytics for a table of attempts
+
+    Returns dict of pd.DataFrames: 'attempts' (see classify_attempts), 'cache',
+    'preemption', 'retries' and 'suggestions'
+    """
+    df = classify_attempts(attempts_df)
+    return {
+        'attempts': df,
+        'cache': call_cache_stats(df),
+        'preemption': preemption_stats(df),
+        'retries': retry_distribution(df),
+        'suggestions': suggest_settings(df, max_preemptible=max_preemptible, max_retries=max_retries),
+    }
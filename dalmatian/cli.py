@@ -0,0 +1,267 @@
+import os, sys, json
+import argparse
+import logging
+import time
+from contextlib import redirect_stdout
+
+from .__about__ import __version__
+
+# Command line interface. Output is streamed row by row (TSV or JSON lines),
+# so that results can be piped into other tools with constant memory.
+
+
+#------------------------------------------------------------------------------
+#  Output formatting
+#------------------------------------------------------------------------------
+def _tsv_value(v):
+    """Format a value for TSV output"""
+    if v is None or (isinstance(v, float) and v!=v):
+        return ''
+    elif isinstance(v, dict):
+        if 'entityName' in v:
+            return v['entityName']
+        elif 'items' in v:
+            return json.dumps([_json_value(i) for i in v['items']])
+        return json.dumps(v)
+    elif isinstance(v, (list, tuple)):
+        return json.dumps([_json_value(i) for i in v])
+    return str(v).replace('\t', ' ').replace('\n', ' ')
+
+
+def _json_value(v):
+    """Format a value for JSON output"""
+    if isinstance(v, float) and v!=v:
+        return None
+    elif isinstance(v, dict):
+        if 'entityName' in v:
+            return v['entityName']
+        elif 'items' in v:
+            return [_json_value(i) for i in v['items']]
+    elif hasattr(v, 'item'):  # numpy scalars
+        return v.item()
+    elif hasattr(v, 'isoformat'):
+        return v.isoformat()
+    return v
+
+
+class RowWriter(object):
+    """Write rows to a stream as TSV (with header) or JSON lines"""
+    def __init__(self, columns, fmt='tsv', out=None):
+        self.columns = list(columns)
+        self.fmt = fmt
+        self.out = sys.stdout if out is None else out
+        if fmt=='tsv':
+            self.out.write('\t'.join(self.columns)+'\n')
+
+    def write(self, row):
+        if self.fmt=='tsv':
+            self.out.write('\t'.join([_tsv_value(v) for v in row])+'\n')
+        else:
+            self.out.write(json.dumps({c:_json_value(v) for c,v in zip(self.columns, row)}, default=str)+'\n')
+
+    def write_df(self, df):
+        """Write DataFrame rows (index first)"""
+        for row in df.itertuples(name=None):
+            self.write(row)
+
+
+def _workspace_manager(args):
+    from .wmanager import WorkspaceManager
+    namespace, workspace = args.workspace.split('/', 1)
+    return WorkspaceManager(namespace, workspace, cache_dir=args.cache_dir)
+
+
+def _index_columns(df):
+    return [i if i is not None else 'index' for i in df.index.names]+df.columns.tolist()
+
+
+def _chunks(df, chunk_size):
+    """Split a DataFrame into chunks of rows (at least one chunk)"""
+    for i in range(0, max(df.shape[0], 1), chunk_size):
+        yield df.iloc[i:i+chunk_size]
+
+
+#------------------------------------------------------------------------------
+#  Commands
+#------------------------------------------------------------------------------
+def export(args):
+    """Export entities (page by page)"""
+    wm = _workspace_manager(args)
+    if args.output is not None:
+        wm.export_entities(args.etype, args.output, page_size=args.page_size, num_threads=args.workers)
+        return
+    attributes = wm.get_entity_types()[args.etype]['attributeNames']
+    writer = RowWriter([args.etype+'_id']+attributes, fmt=args.format, out=args.out)
+    for df in wm.iter_entities(args.etype, page_size=args.page_size, num_threads=args.workers):
+        writer.write_df(df.reindex(columns=attributes))
+
+
+def status(args):
+    """Status of submissions"""
+    wm = _workspace_manager(args)
+    statuses = ['Succeeded', 'Running', 'Failed', 'Aborted', 'Submitted', 'Queued']
+    writer = RowWriter(['entity_id', 'configuration', 'status']+statuses+['date', 'submission_id'], fmt=args.format, out=args.out)
+    for s in wm.list_submissions(config=args.config):
+        if args.active and s['workflowStatuses'].get('Running',0)==0 and s['workflowStatuses'].get('Submitted',0)==0:
+            continue
+        writer.write([s['submissionEntity']['entityName'],
+            s['methodConfigurationNamespace']+'/'+s['methodConfigurationName'], s['status']]
+            +[s['workflowStatuses'].get(i,0) for i in statuses]+[s['submissionDate'], s['submissionId']])
+
+
+def stats(args):
+    """Runtime and cost statistics of the latest successful workflows"""
+    wm = _workspace_manager(args)
+    status_df = wm.get_entity_status(args.etype, args.config)
+    status_df = status_df[status_df['status']=='Succeeded']
+    if status_df.shape[0]==0:
+        print('No successful workflows.')
+        return
+    # statistics are computed and written for chunks of entities
+    writer = None
+    for chunk_df in _chunks(status_df, args.chunk_size):
+        workflow_df, task_dfs = wm.get_stats(chunk_df, num_threads=args.workers)
+        if args.task is not None and args.task not in task_dfs:
+            args.parser.error("argument --task: invalid choice: '{}' (choose from {})".format(
+                args.task, ', '.join(["'{}'".format(i) for i in sorted(task_dfs)])))
+        df = workflow_df if args.task is None else task_dfs[args.task]
+        if writer is None:
+            writer = RowWriter(_index_columns(df), fmt=args.format, out=args.out)
+        writer.write_df(df)
+        args.out.flush()
+
+
+def purge(args):
+    """List (and optionally delete) workflow outputs not referenced by any attribute"""
+    from .core import gs_delete
+    wm = _workspace_manager(args)
+    orphan_df, _ = wm.find_orphaned_outputs(exclude_logs=args.exclude_logs, num_threads=args.workers)
+    writer = RowWriter(['path', 'size_bytes', 'submission_id', 'workflow_id', 'task'], fmt=args.format, out=args.out)
+    for row in orphan_df[['path', 'size_bytes', 'submission_id', 'workflow_id', 'task']].itertuples(index=False, name=None):
+        writer.write(row)
+    if args.delete and orphan_df.shape[0]>0:
+        args.out.flush()
+        bucket_id = wm.get_bucket_id()
+        assert orphan_df['path'].str.startswith('gs://'+bucket_id+'/').all()
+        gs_delete(orphan_df['path'].tolist(), num_threads=args.workers)
+
+
+def monitor(args):
+    """Stream workflow status changes of a submission"""
+    wm = _workspace_manager(args)
+    writer = RowWriter(['time', 'entity_id', 'workflow_id', 'status'], fmt=args.format, out=args.out)
+    last = {}
+    while True:
+        s = wm.get_submission(args.submission_id)
+        now = time.strftime('%Y-%m-%dT%H:%M:%S')
+        for w in s['workflows']:
+            key = w.get('workflowId', w['workflowEntity']['entityName'])
+            if last.get(key)!=w['status']:
+                writer.write([now, w['workflowEntity']['entityName'], w.get('workflowId'), w['status']])
+                last[key] = w['status']
+        args.out.flush()
+        if not args.follow or s['status']=='Done':
+            break
+        time.sleep(args.interval)
+
+
+def logs(args):
+    """Fetch logs of failed tasks for the latest workflows"""
+    wm = _workspace_manager(args)
+    status_df = wm.get_entity_status(args.etype, args.config)
+    # logs are fetched and written for chunks of entities
+    writer = None
+    for chunk_df in _chunks(status_df, args.chunk_size):
+        log_df = wm.get_logs(chunk_df, tasks=args.task, log=args.log, failed_only=not args.all,
+            max_bytes=args.max_bytes, pattern=args.pattern, num_threads=args.workers)
+        if writer is None:
+            writer = RowWriter(_index_columns(log_df), fmt=args.format, out=args.out)
+        writer.write_df(log_df)
+        args.out.flush()
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Initialize core parser
+    parser = argparse.ArgumentParser(prog='dalmatian', description='dalmatian: the loyal companion to FISS.')
+    parser.add_argument("-v", "--version", action='version', version=__version__)
+    subparsers = parser.add_subparsers(title='commands', dest='command')
+
+    # options shared by all commands
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('workspace', help='Workspace (namespace/workspace)')
+    common.add_argument('--workers', type=int, default=10, help='Number of concurrent requests')
+    common.add_argument('--cache-dir', default=None, help='Directory for caching metadata and logs')
+    common.add_argument('--format', choices=['tsv', 'jsonl'], default='tsv', help='Output format')
+    common.add_argument('--metrics', default=None, help='Write API/storage call statistics (Prometheus text format) to this file')
+
+    p = subparsers.add_parser('export', parents=[common], help=export.__doc__)
+    p.add_argument('etype', help='Entity type')
+    p.add_argument('--page-size', type=int, default=1000)
+    p.add_argument('--output', default=None, help='Write to a Parquet (.parquet) or JSON lines file instead of stdout')
+    p.set_defaults(func=export)
+
+    p = subparsers.add_parser('status', parents=[common], help=status.__doc__)
+    p.add_argument('--config', default=None, help='Filter by configuration')
+    p.add_argument('--active', action='store_true', help='Only list active submissions')
+    p.set_defaults(func=status)
+
+    p = subparsers.add_parser('stats', parents=[common], help=stats.__doc__)
+    p.add_argument('etype', help='Entity type')
+    p.add_argument('config', help='Configuration')
+    p.add_argument('--task', default=None, help='Report statistics for this task')
+    p.add_argument('--chunk-size', type=int, default=1000, help='Number of entities processed (and written) at a time')
+    p.set_defaults(func=stats, parser=p)
+
+    p = subparsers.add_parser('purge', parents=[common], help=purge.__doc__)
+    p.add_argument('--exclude-logs', action='store_true', help='Do not list logs and scripts')
+    p.add_argument('--delete', action='store_true', help='Delete the listed files')
+    p.set_defaults(func=purge)
+
+    p = subparsers.add_parser('monitor', parents=[common], help=monitor.__doc__)
+    p.add_argument('submission_id')
+    p.add_argument('--follow', action='store_true', help='Poll until the submission is done')
+    p.add_argument('--interval', type=int, default=60, help='Polling interval (seconds)')
+    p.set_defaults(func=monitor)
+
+    p = subparsers.add_parser('logs', parents=[common], help=logs.__doc__)
+    p.add_argument('etype', help='Entity type')
+    p.add_argument('config', help='Configuration')
+    p.add_argument('--task', action='append', default=None, help='Task name (can be repeated)')
+    p.add_argument('--log', choices=['stderr', 'stdout', 'log'], default='stderr')
+    p.add_argument('--all', action='store_true', help='Fetch logs of all tasks, not only failed tasks')
+    p.add_argument('--max-bytes', type=int, default=65536, help='Only fetch the last MAX_BYTES of each log')
+    p.add_argument('--pattern', default=None, help='Only output lines matching this regular expression')
+    p.add_argument('--chunk-size', type=int, default=1000, help='Number of entities processed (and written) at a time')
+    p.set_defaults(func=logs)
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    # progress messages are written to stderr, results to stdout
+    args.out = sys.stdout
+    if not sys.stderr.isatty():  # e.g., batch jobs: log progress periodically
+        from . import progress
+        logging.basicConfig(format='%(asctime)s %(message)s', level=logging.INFO, stream=sys.stderr)
+        progress.set_reporter(progress.LoggingReporter())
+    try:
+        with redirect_stdout(sys.stderr):
+            args.func(args)
+    except BrokenPipeError:  # output closed, e.g. piped into head
+        # redirect stdout to devnull, since flushing it at exit would fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if args.metrics is not None:
+            from . import instrumentation
+            with open(args.metrics, 'w') as f:
+                f.write(instrumentation.stats.to_prometheus())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,63 @@
 # Author: Francois Aguet
 
-import os, sys, json
+import sys, json, re
+import difflib
 import subprocess
-from datetime import datetime
-from collections import Iterable
-import pandas as pd
-import numpy as np
-import firecloud.api
-import iso8601
-import argparse
-import multiprocessing as mp
+from types import SimpleNamespace
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 
 from .__about__ import __version__
+from ._lazy import LazyModule
+from .instrumentation import InstrumentedModule, timed
+from .progress import Tracker, track
+from .timestamps import to_seconds, elapsed
+
+# heavy dependencies are imported on first use
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+# calls to firecloud.api are recorded (see instrumentation.py)
+firecloud = SimpleNamespace(api=InstrumentedModule(LazyModule('firecloud.api'), 'firecloud'))
 
 # Collection of high-level wrapper functions for FireCloud API
 
 
 
+#------------------------------------------------------------------------------
+#  Helper function for concurrent API/storage calls
+#------------------------------------------------------------------------------
+
+def _thread_map(func, items, num_threads=10, desc=None, unit='items'):
+    """
+    Apply func to all items using a thread pool (results are ordered)
+
+    desc: if set, progress is reported (see progress.py)
+    """
+    items = list(items)
+    if desc is not None:
+        tracker = Tracker(desc, total=len(items), unit=unit)
+        f = func
+        def func(x):
+            r = f(x)
+            tracker.update()
+            return r
+    try:
+        if num_threads<=1 or len(items)<=1:
+            return [func(i) for i in items]
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            return list(executor.map(func, items))
+    finally:
+        if desc is not None:
+            tracker.close()
+
+
 #------------------------------------------------------------------------------
 #  Helper functions for processing timestamps
 #------------------------------------------------------------------------------
 
 def convert_time(x):
-    return datetime.timestamp(iso8601.parse_date(x))
+    """Convert timestamp(s) to seconds since the epoch (see timestamps.to_seconds)"""
+    return to_seconds(x)
 
 
 def workflow_time(workflow):
@@ -30,9 +65,9 @@ def workflow_time(workflow):
     Convert API output to timestamp difference
     """
     if 'end' in workflow:
-        return convert_time(workflow['end']) - convert_time(workflow['start'])
+        return elapsed(workflow['start'], workflow['end'])
     else:
-        return np.NaN
+        return np.nan
 
 
 #------------------------------------------------------------------------------
@@ -41,36 +76,64 @@ def workflow_time(workflow):
 
 def gs_list_bucket_files(bucket_id):
     """Get list of all files stored in bucket"""
-    s = subprocess.check_output('gsutil ls gs://{}/**'.format(bucket_id), shell=True)
+    with timed('gsutil.ls') as t:
+        s = subprocess.check_output('gsutil ls gs://{}/**'.format(bucket_id), shell=True)
+        t.bytes_received = len(s)
     return s.decode().strip().split('\n')
 
 
-def gs_delete(file_list, chunk_size=500):
+def gs_delete(file_list, chunk_size=500, num_threads=1):
     """Delete list of files (paths starting with gs://)"""
     # number of calls is limited by command line size limit
-    n = int(np.ceil(len(file_list)/chunk_size))
-    for i in range(n):
-        x = file_list[chunk_size*i:chunk_size*(i+1)]
+    file_list = list(file_list)
+    def delete(x):
         cmd = 'echo -e "{}" | gsutil -m rm -I'.format('\n'.join(x))
-        subprocess.call(cmd, shell=True)
+        with timed('gsutil.rm') as t:
+            t.status = subprocess.call(cmd, shell=True)
+            if t.status!=0:
+                t.error = 'exit status {}'.format(t.status)
+    _thread_map(delete, [file_list[i:i+chunk_size] for i in range(0, len(file_list), chunk_size)],
+        num_threads=num_threads, desc='Deleting files', unit='chunks')
 
 
-def gs_copy(file_list, dest_dir, chunk_size=500):
+def gs_copy(file_list, dest_dir, chunk_size=500, num_threads=1):
     """Copy list of files (paths starting with gs://)"""
-    n = int(np.ceil(len(file_list)/chunk_size))
-    for i in range(n):
-        x = file_list[chunk_size*i:chunk_size*(i+1)]
+    file_list = list(file_list)
+    def copy(x):
         cmd = 'echo -e "{}" | gsutil -m cp -I {}'.format('\n'.join(x), dest_dir)
-        subprocess.check_call(cmd, shell=True)
+        with timed('gsutil.cp'):
+            subprocess.check_call(cmd, shell=True)
+    _thread_map(copy, [file_list[i:i+chunk_size] for i in range(0, len(file_list), chunk_size)],
+        num_threads=num_threads)
 
 
-def gs_move(file_list, dest_dir, chunk_size=500):
+def gs_move(file_list, dest_dir, chunk_size=500, num_threads=1):
     """Move list of files (paths starting with gs://)"""
-    n = int(np.ceil(len(file_list)/chunk_size))
-    for i in range(n):
-        x = file_list[chunk_size*i:chunk_size*(i+1)]
+    file_list = list(file_list)
+    def move(x):
         cmd = 'echo -e "{}" | gsutil -m mv -I {}'.format('\n'.join(x), dest_dir)
-        subprocess.check_call(cmd, shell=True)
+        with timed('gsutil.mv'):
+            subprocess.check_call(cmd, shell=True)
+    _thread_map(move, [file_list[i:i+chunk_size] for i in range(0, len(file_list), chunk_size)],
+        num_threads=num_threads)
+
+
+def gs_copy_paths(src_paths, dest_paths, num_threads=10, desc='Copying files'):
+    """
+    Copy files to individual destination paths (paths starting with gs://), concurrently
+
+    desc: progress description (None: no progress reporting)
+
+    Returns list of error messages (None for successful copies)
+    """
+    def copy(x):
+        with timed('gsutil.cp') as t:
+            s = subprocess.run('gsutil cp {} {}'.format(*x), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            t.status = s.returncode
+            if s.returncode!=0:
+                t.error = 'exit status {}'.format(s.returncode)
+        return None if s.returncode==0 else s.stderr.decode().strip()
+    return _thread_map(copy, zip(src_paths, dest_paths), num_threads=num_threads, desc=desc, unit='files')
 
 
 def gs_exists(file_list_s):
@@ -80,10 +143,10 @@ def gs_exists(file_list_s):
     file_list_s: pd.Series
     """
     status_s = pd.Series(False, index=file_list_s.index, name='file_exists')
-    for k,(i,p) in enumerate(zip(file_list_s.index, file_list_s)):
-        print('\rChecking {}/{} files'.format(k+1, len(file_list_s)), end='')
+    for i,p in track(list(zip(file_list_s.index, file_list_s)), 'Checking files', unit='files'):
         try:
-            s = subprocess.check_output('gsutil -q stat {}'.format(p), shell=True)
+            with timed('gsutil.stat'):
+                s = subprocess.check_output('gsutil -q stat {}'.format(p), shell=True)
             status_s[i] = True
         except subprocess.CalledProcessError as e:
             s = e.stdout.decode()
@@ -91,25 +154,97 @@ def gs_exists(file_list_s):
     return status_s
 
 
-def gs_size(file_list_s):
+def _gs_ls_l(urls):
+    """
+    Parse output of 'gsutil ls -l' into (path, size_bytes, updated) tuples
+
+    URLs that match no objects are skipped; other gsutil errors raise CalledProcessError
+    """
+    with timed('gsutil.ls') as t:
+        s = subprocess.run('gsutil ls -l '+urls, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        t.status = s.returncode
+        t.bytes_received = len(s.stdout)
+        if s.returncode!=0 and 'matched no objects' not in s.stderr.decode():
+            raise subprocess.CalledProcessError(s.returncode, s.args, output=s.stdout, stderr=s.stderr)
+    rows = []
+    for line in s.stdout.decode().strip().split('\n'):
+        x = line.split(None, 2)
+        if len(x)==3 and x[0].isdigit():
+            rows.append((x[2], int(x[0]), x[1]))
+    return rows
+
+
+def gs_list_objects(prefix, num_threads=10):
+    """
+    List all objects under prefix (e.g., gs://bucket_id/), with sizes
+
+    Top-level prefixes ("directories") are listed concurrently.
+    Returns pd.DataFrame with columns 'path', 'size_bytes', 'updated'
+    """
+    if not prefix.endswith('/'):
+        prefix += '/'
+    with timed('gsutil.ls') as t:
+        s = subprocess.check_output('gsutil ls '+prefix, shell=True)
+        t.bytes_received = len(s)
+    prefixes = [i for i in s.decode().strip().split('\n') if i.endswith('/')]
+    # objects at the top level, and everything under each prefix
+    rows = _thread_map(_gs_ls_l, [prefix+'*']+[i+'**' for i in prefixes], num_threads=num_threads)
+    df = pd.DataFrame([r for i in rows for r in i], columns=['path', 'size_bytes', 'updated'])
+    df.drop_duplicates('path', inplace=True)
+    df['updated'] = pd.to_datetime(df['updated'])
+    return df.reset_index(drop=True)
+
+
+def gs_size(file_list_s, chunk_size=500, num_threads=10):
     """
     Get file sizes (in bytes)
 
     file_list_s: pd.Series
+
+    Files are listed in chunks of chunk_size paths (concurrently); missing files are NaN
     """
-    prefix = os.path.commonprefix(file_list_s.tolist())
-    s = subprocess.check_output('gsutil ls -l {}**'.format(prefix), shell=True)
-    gs_sizes = s.decode().strip().split('\n')[:-1]
-    gs_sizes = pd.Series([np.int64(i.split()[0]) for i in gs_sizes],
-        index=[i.split()[-1] for i in gs_sizes])
+    paths = file_list_s.tolist()
+    rows = _thread_map(_gs_ls_l, [' '.join(paths[i:i+chunk_size]) for i in range(0, len(paths), chunk_size)],
+        num_threads=num_threads)
+    gs_sizes = pd.Series({r[0]:r[1] for i in rows for r in i}, dtype=np.float64)
     gs_sizes.index.name = 'path'
-    return pd.Series(gs_sizes[file_list_s].values, index=file_list_s.index, name='size_bytes')
+    return pd.Series(gs_sizes.reindex(file_list_s).values, index=file_list_s.index, name='size_bytes')
+
+
+_output_path_re = (r'^gs://[^/]+/(?P<submission_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/'
+    r'(?:(?P<workflow_name>[^/]+)/(?P<workflow_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/'
+    r'(?:call-(?P<task>[^/]+)/(?:shard-(?P<shard>\d+)/)?)?)?')
+
+def parse_output_paths(paths):
+    """
+    Extract submission ID, workflow name, workflow ID, task and shard from
+    paths of workflow outputs (gs://bucket_id/submission_id/workflow_name/workflow_id/call-task/...)
+
+    Returns pd.DataFrame (missing values for paths outside of submission directories)
+    """
+    return pd.Series(paths).str.extract(_output_path_re, expand=True)
+
+
+def gs_cat(file_path, max_bytes=None):
+    """
+    Get contents of a file (path starting with gs://)
+
+    max_bytes: if set, only the last max_bytes of the file are read
+    """
+    cmd = 'gsutil cat '
+    if max_bytes is not None:
+        cmd += '-r -{} '.format(int(max_bytes))
+    with timed('gsutil.cat') as t:
+        s = subprocess.check_output(cmd+file_path, shell=True)
+        t.bytes_received = len(s)
+    return s.decode(errors='replace')
 
 
 def get_md5hash(file_path):
     """Calculate MD5 hash using gsutil or md5sum, depending on location"""
     if file_path.startswith('gs://'):
-        s = subprocess.check_output('gsutil hash -m -h '+file_path, shell=True).decode()
+        with timed('gsutil.hash'):
+            s = subprocess.check_output('gsutil hash -m -h '+file_path, shell=True).decode()
         s = s.strip().split('\n')
         s = [i for i in s if 'md5' in i][0]
         return s.split()[-1]
@@ -119,12 +254,63 @@ def get_md5hash(file_path):
 
 def get_md5hashes(file_list_s, num_threads=10):
     """Parallelized get_md5hash()"""
-    md5_hashes = []
-    with mp.Pool(processes=num_threads) as pool:
-        for k,r in enumerate(pool.imap(get_md5hash, [i for i in file_list_s])):
-            print('\rCalculating MD5 hash for file {}/{}'.format(k+1,len(file_list_s)), end='')
-            md5_hashes.append(r)
-    return md5_hashes
+    return _thread_map(get_md5hash, file_list_s, num_threads=num_threads,
+        desc='Calculating MD5 hashes', unit='files')
+
+
+def grep_logs(log_df, pattern, flags=0):
+    """
+    Search logs for a regular expression (grep-style)
+
+    log_df: pd.DataFrame with log contents in column 'text' (e.g., from
+            WorkspaceManager.get_logs)
+
+    Returns pd.DataFrame with one row per matching line (columns: 'line_number',
+    'line'), indexed like log_df
+    """
+    regex = re.compile(pattern, flags)
+    ix = []
+    line_numbers = []
+    lines = []
+    for k,t in enumerate(log_df['text']):
+        if isinstance(t, str):
+            for n,line in enumerate(t.split('\n')):
+                if regex.search(line):
+                    ix.append(k)
+                    line_numbers.append(n+1)
+                    lines.append(line)
+    df = log_df.drop('text', axis=1).iloc[ix].copy()
+    df['line_number'] = line_numbers
+    df['line'] = lines
+    return df
+
+
+def gs_md5hashes(file_list, chunk_size=500, num_threads=10):
+    """
+    Get MD5 hashes of files (paths starting with gs://) from object metadata,
+    listing files in chunks of chunk_size paths (concurrently)
+
+    Returns pd.Series indexed by path; missing files are omitted
+    """
+    file_list = list(file_list)
+    def get_hashes(x):
+        with timed('gsutil.ls') as t:
+            s = subprocess.run('gsutil ls -L '+' '.join(x), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            t.status = s.returncode
+            t.bytes_received = len(s.stdout)
+        hashes = {}
+        path = None
+        for line in s.stdout.decode().split('\n'):
+            if line.startswith('gs://'):
+                path = line.rstrip().rstrip(':')
+            elif 'Hash (md5):' in line and path is not None:
+                hashes[path] = line.split()[-1]
+        return hashes
+    hashes = {}
+    for h in _thread_map(get_hashes, [file_list[i:i+chunk_size] for i in range(0, len(file_list), chunk_size)],
+                         num_threads=num_threads):
+        hashes.update(h)
+    return pd.Series(hashes, dtype=object)
 
 
 #------------------------------------------------------------------------------
@@ -135,13 +321,14 @@ def get_google_metadata(job_id):
     jobid: operations ID
     """
     if isinstance(job_id, str):
-        s = subprocess.check_output('gcloud alpha genomics operations describe '+job_id+' --format json', shell=True)
+        with timed('gcloud.operations.describe'):
+            s = subprocess.check_output('gcloud alpha genomics operations describe '+job_id+' --format json', shell=True)
         return json.loads(s.decode())
     elif isinstance(job_id, Iterable):
         json_list = []
-        for k,j in enumerate(job_id):
-            print('\rFetching metadata ({}/{})'.format(k+1,len(job_id)), end='')
-            s = subprocess.check_output('gcloud alpha genomics operations describe '+j+' --format json', shell=True)
+        for j in track(job_id, 'Fetching metadata', unit='jobs'):
+            with timed('gcloud.operations.describe'):
+                s = subprocess.check_output('gcloud alpha genomics operations describe '+j+' --format json', shell=True)
             json_list.append(json.loads(s.decode()))
         return json_list
 
@@ -152,8 +339,9 @@ def parse_google_stats(json_list):
     """
     df = pd.DataFrame(index=[j['name'] for j in json_list], columns=['time_h', 'machine_type', 'preemptible', 'preempted'])
     for j in json_list:
-        event_dict = {k['description']:convert_time(k['startTime']) for k in j['metadata']['events'] if 'copied' not in k}
-        event_times = [convert_time(k['startTime']) for k in j['metadata']['events'] if 'copied' not in k]
+        events = [k for k in j['metadata']['events'] if 'copied' not in k]
+        event_dict = {k['description']:k['startTime'] for k in events}
+        event_times = convert_time([k['startTime'] for k in events])
         time_delta = np.max(event_times) - np.min(event_times)
         # if 'ok' in event_dict:
         #     time_delta = convert_time(event_dict['ok']) - convert_time(event_dict['start'])
@@ -215,6 +403,25 @@ def get_method_version(namespace, name):
     return np.max([m['snapshotId'] for m in r])
 
 
+# index of latest method versions, shared by bulk version checks
+_method_versions = None
+
+def get_method_versions(refresh=False):
+    """
+    Get latest snapshot ID of all methods in the repository
+
+    The repository is downloaded once and cached; use refresh=True to reload.
+    Returns pd.Series indexed by (namespace, name).
+    """
+    global _method_versions
+    if _method_versions is None or refresh:
+        r = firecloud.api.list_repository_methods()
+        assert r.status_code==200
+        df = pd.DataFrame(r.json(), columns=['namespace', 'name', 'snapshotId'])
+        _method_versions = df.groupby(['namespace', 'name'])['snapshotId'].max()
+    return _method_versions
+
+
 def list_configs(namespace=None):
     """
     List all configurations in the repository
@@ -274,54 +481,230 @@ def print_configs(namespace):
         print('{}: {}'.format(k, np.max([m['snapshotId'] for m in r if m['name']==k])))
 
 
+# WDLs are immutable for a given snapshot, so payloads are cached by snapshot ID
+_wdl_cache = {}
+
 def get_wdl(method_namespace, method_name, snapshot_id=None):
     """
     Get WDL from repository
     """
     if snapshot_id is None:
-        snapshot_id = get_method_version(namespace, name)
+        snapshot_id = get_method_version(method_namespace, method_name)
 
-    r = firecloud.api.get_repository_method(method_namespace, method_name, snapshot_id)
-    assert r.status_code==200
-    return r.json()['payload']
+    key = (method_namespace, method_name, int(snapshot_id))
+    if key not in _wdl_cache:
+        r = firecloud.api.get_repository_method(method_namespace, method_name, snapshot_id)
+        assert r.status_code==200
+        _wdl_cache[key] = r.json()['payload']
+    return _wdl_cache[key]
 
 
-def compare_wdls(mnamespace1, mname1, mnamespace2, mname2):
+def get_wdls(methods, num_threads=10, refresh=False):
     """
-    Compare WDLs from two methods
+    Get WDLs for a list of (namespace, name) or (namespace, name, snapshot_id)
+    from the repository, fetching concurrently. Latest versions are resolved
+    using the cached repository index (refresh=True: reload the index).
+
+    Returns list of (snapshot_id, wdl)
     """
-    v1 = get_method_version(mnamespace1, mname1)
-    v2 = get_method_version(mnamespace2, mname2)
-    wdl1 = get_wdl(mnamespace1, mname1, v1)
-    wdl2 = get_wdl(mnamespace2, mname2, v2)
+    method_versions = get_method_versions(refresh=refresh)
+    methods = [m if len(m)==3 else (m[0], m[1], method_versions[(m[0], m[1])]) for m in methods]
+    wdls = _thread_map(lambda m: get_wdl(*m), methods, num_threads=num_threads)
+    return [(m[2], w) for m,w in zip(methods, wdls)]
+
+
+#------------------------------------------------------------------------------
+# Functions for parsing and comparing WDLs
+#------------------------------------------------------------------------------
+_wdl_block_re = re.compile(r'^[ \t]*(task|workflow)\s+(\w+)\s*\{', re.M)
+_wdl_decl_re = re.compile(r'^\s*([A-Z]\w*(?:\[.*\])?[?+]?)\s+(\w+)\s*(?:=\s*(.*?))?\s*$')
+
+
+def _match_brace(s, start):
+    """Return index of the brace closing the brace at s[start]"""
+    depth = 0
+    for i in range(start, len(s)):
+        if s[i]=='{':
+            depth += 1
+        elif s[i]=='}':
+            depth -= 1
+            if depth==0:
+                return i
+    raise ValueError('Unbalanced braces in WDL.')
+
+
+def _split_wdl_block(body):
+    """
+    Split the body of a task or workflow into top-level text and nested
+    sections (command, runtime, output, call, scatter, ...)
+    """
+    top = ''
+    sections = {}
+    i = 0
+    n = 0  # start of current top-level text
+    while i<len(body):
+        if body[i]=='{' and (i==0 or body[i-1] not in '$~'):
+            top, _, header = (top+body[n:i]).rpartition('\n')
+            j = _match_brace(body, i)
+            content = body[i+1:j]
+            n = i = j+1
+        elif body.startswith('<<<', i):
+            top, _, header = (top+body[n:i]).rpartition('\n')
+            j = body.find('>>>', i+3)
+            if j==-1:
+                raise ValueError('Unterminated command section in WDL.')
+            content = body[i+3:j]
+            n = i = j+3
+        elif body[i]=='{':  # placeholder
+            i = _match_brace(body, i)+1
+            continue
+        else:
+            i += 1
+            continue
+        header = ' '.join(header.split())
+        k = 2
+        key = header
+        while key in sections:
+            key = '{} ({})'.format(header, k)
+            k += 1
+        sections[key] = content
+    top += body[n:]
+    return top, sections
+
+
+def _parse_declarations(text):
+    """Parse WDL declarations ('Type name = expression') from text"""
+    decls = {}
+    for line in text.split('\n'):
+        line = line.split('#', 1)[0]
+        m = _wdl_decl_re.match(line)
+        if m:
+            decls[m.group(2)] = ' '.join(line.split())
+    return decls
+
+
+def parse_wdl(wdl):
+    """
+    Parse tasks and workflows from a WDL
+
+    Returns dict: name -> {'type': 'task'|'workflow',
+                           'inputs': {input_name: declaration},
+                           'sections': {section_header: normalized text}}
+    """
+    blocks = {}
+    for m in _wdl_block_re.finditer(wdl):
+        start = m.end()-1
+        body = wdl[start+1:_match_brace(wdl, start)]
+        top, sections = _split_wdl_block(body)
+        if 'input' in sections:  # WDL 1.0
+            inputs = _parse_declarations(sections.pop('input'))
+        else:  # draft-2: declarations at the top level of the block
+            inputs = _parse_declarations(top)
+        blocks[m.group(2)] = {
+            'type': m.group(1),
+            'inputs': inputs,
+            'sections': {k:'\n'.join(' '.join(l.split()) for l in v.strip().split('\n') if l.strip())
+                for k,v in sections.items()},
+        }
+    return blocks
+
+
+def diff_wdls(wdl1, wdl2):
+    """
+    Structured comparison of two WDLs at the task, input and section level
+
+    Returns pd.DataFrame with columns:
+      block:  task or workflow name
+      type:   'task', 'workflow', 'input' or 'section'
+      item:   input name or section header (e.g., 'command', 'runtime')
+      change: 'added', 'removed' or 'modified'
+      old, new: declarations (for inputs)
+    """
+    b1 = parse_wdl(wdl1)
+    b2 = parse_wdl(wdl2)
+    rows = []
+    for b in sorted(set(b1) | set(b2)):
+        if b not in b2:
+            rows.append([b, b1[b]['type'], '', 'removed', None, None])
+        elif b not in b1:
+            rows.append([b, b2[b]['type'], '', 'added', None, None])
+        else:
+            i1, i2 = b1[b]['inputs'], b2[b]['inputs']
+            for k in sorted(set(i1) | set(i2)):
+                if i1.get(k)!=i2.get(k):
+                    change = 'added' if k not in i1 else 'removed' if k not in i2 else 'modified'
+                    rows.append([b, 'input', k, change, i1.get(k), i2.get(k)])
+            s1, s2 = b1[b]['sections'], b2[b]['sections']
+            for k in sorted(set(s1) | set(s2)):
+                if s1.get(k)!=s2.get(k):
+                    change = 'added' if k not in s1 else 'removed' if k not in s2 else 'modified'
+                    rows.append([b, 'section', k, change, None, None])
+    return pd.DataFrame(rows, columns=['block', 'type', 'item', 'change', 'old', 'new'])
+
+
+def _print_wdl_diff(wdl1, wdl2, label1, label2):
+    """Print line-level diff of two WDLs"""
     print('Comparing:')
-    print('< {}:{}.v{}'.format(mnamespace1, mname1, v1))
-    print('> {}:{}.v{}'.format(mnamespace2, mname2, v2))
-    cmd = 'diff <(echo \''+wdl1+'\') <(echo \''+wdl2+'\')'
-    d = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE)
-    print(d.stdout.decode())
+    print('< {}'.format(label1))
+    print('> {}'.format(label2))
+    d = difflib.unified_diff(wdl1.splitlines(), wdl2.splitlines(), fromfile=label1, tofile=label2, lineterm='')
+    print('\n'.join(d))
+
+
+def compare_wdls(mnamespace1, mname1, mnamespace2, mname2, num_threads=2):
+    """
+    Compare WDLs from two methods (latest versions)
+
+    Prints the line-level diff and returns the structured diff (see diff_wdls)
+    """
+    (v1, wdl1), (v2, wdl2) = get_wdls([(mnamespace1, mname1), (mnamespace2, mname2)], num_threads=num_threads)
+    _print_wdl_diff(wdl1, wdl2,
+        '{}:{}.v{}'.format(mnamespace1, mname1, v1),
+        '{}:{}.v{}'.format(mnamespace2, mname2, v2))
+    return diff_wdls(wdl1, wdl2)
 
 
 def compare_wdl(mnamespace, mname, wdl_path):
     """
-    Compare method WDL to file
+    Compare method WDL (latest version) to file
+
+    Prints the line-level diff and returns the structured diff (see diff_wdls)
     """
-    v = get_method_version(mnamespace, mname)
-    wdl1 = get_wdl(mnamespace, mname, v)
+    v, wdl1 = get_wdls([(mnamespace, mname)])[0]
     with open(wdl_path) as f:
         wdl2 = f.read()
-    print('Comparing:')
-    print('< {}'.format(wdl_path))
-    print('> {}:{}.v{}'.format(mnamespace, mname, v))
-    cmd = 'diff <(echo \''+wdl1+'\') <(echo \''+wdl2+'\')'
-    d = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE)
-    print(d.stdout.decode())
+    _print_wdl_diff(wdl2, wdl1, wdl_path, '{}:{}.v{}'.format(mnamespace, mname, v))
+    return diff_wdls(wdl2, wdl1)
+
+
+def compare_wdl_pairs(pairs, num_threads=10):
+    """
+    Structured comparison of many pairs of methods
+
+    pairs: list of (method1, method2), where each method is
+           (namespace, name) or (namespace, name, snapshot_id)
+
+    All WDLs are fetched concurrently (once per snapshot); returns the
+    concatenated output of diff_wdls with columns 'method1' and 'method2'
+    """
+    methods = list(set([m for p in pairs for m in p]))
+    wdl_dict = {m:w for m,w in zip(methods, get_wdls(methods, num_threads=num_threads))}
+    dfs = []
+    for m1,m2 in pairs:
+        (v1, wdl1), (v2, wdl2) = wdl_dict[m1], wdl_dict[m2]
+        df = diff_wdls(wdl1, wdl2)
+        df.insert(0, 'method2', '{}:{}.v{}'.format(m2[0], m2[1], v2))
+        df.insert(0, 'method1', '{}:{}.v{}'.format(m1[0], m1[1], v1))
+        dfs.append(df)
+    return pd.concat(dfs, axis=0, ignore_index=True)
 
 
 def redact_outdated_method_versions(method_namespace, method_name):
     """
 
     """
+    global _method_versions
+    _method_versions = None
     r = firecloud.api.list_repository_methods()
     assert r.status_code==200
     r = r.json()
@@ -339,6 +722,9 @@ def update_method(namespace, method, synopsis, wdl_file, public=False, delete_ol
     """
     push new version, then redact previous version(s)
     """
+    global _method_versions
+    _method_versions = None
+
     # check whether prior version exists
     r = get_method(namespace, method)
     old_version = None
@@ -428,19 +814,9 @@ def get_vm_cost(machine_type, preemptible=True):
 
 
 def main(argv=None):
-    if not argv:
-        argv = sys.argv
-
-    # Initialize core parser
-    descrip  = 'dalmatian [OPTIONS] CMD [arg ...]\n'
-    descrip += '       dalmatian [ --help | -v | --version ]'
-    parser = argparse.ArgumentParser(description='dalmatian: the loyal companion to FISS. Only currently useful in a REPL.')
-
-    parser.add_argument("-v", "--version", action='version', version=__version__)
-
-    args = parser.parse_args()
-
-    sys.exit()
+    """Command line interface (see cli.py)"""
+    from .cli import main
+    return main(argv)
 
 if __name__ == '__main__':
     sys.exit(main())
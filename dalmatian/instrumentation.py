@@ -0,0 +1,209 @@
+import time
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from ._lazy import LazyModule
+
+pd = LazyModule('pandas')
+
+# Instrumentation of FireCloud/rawls API calls and storage (gsutil) operations.
+# Every call produces an Event that is passed to all registered callbacks; by
+# default, events are aggregated per endpoint in the in-memory 'stats' object.
+
+Event = namedtuple('Event', ['endpoint', 'elapsed', 'status', 'bytes_sent', 'bytes_received', 'error', 'retry'])
+
+# latency histogram buckets (seconds)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Stats(object):
+    """
+    In-memory statistics per endpoint: call, error and retry counts,
+    bytes transferred, and latency histograms
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def __call__(self, event):
+        with self._lock:
+            s = self.endpoints.get(event.endpoint)
+            if s is None:
+                s = {'calls':0, 'errors':0, 'retries':0, 'bytes_sent':0, 'bytes_received':0,
+                     'time_s':0.0, 'max_time_s':0.0, 'histogram':[0]*(len(self.buckets)+1)}
+                self.endpoints[event.endpoint] = s
+            if event.retry:
+                s['retries'] += 1
+                return
+            s['calls'] += 1
+            if event.error is not None:
+                s['errors'] += 1
+            s['bytes_sent'] += event.bytes_sent
+            s['bytes_received'] += event.bytes_received
+            s['time_s'] += event.elapsed
+            s['max_time_s'] = max(s['max_time_s'], event.elapsed)
+            s['histogram'][bisect_left(self.buckets, event.elapsed)] += 1
+
+    def _quantile(self, histogram, q):
+        """Estimate quantile from histogram (upper bound of bucket)"""
+        n = sum(histogram)
+        if n==0:
+            return float('nan')
+        c = 0
+        for b,h in zip(self.buckets+(float('inf'),), histogram):
+            c += h
+            if c>=q*n:
+                return b
+
+    def to_dataframe(self):
+        """Summary table (one row per endpoint)"""
+        with self._lock:
+            rows = []
+            for e,s in sorted(self.endpoints.items()):
+                rows.append([e, s['calls'], s['errors'], s['retries'], s['bytes_sent'], s['bytes_received'],
+                    s['time_s'], s['time_s']/s['calls'] if s['calls']>0 else float('nan'),
+                    self._quantile(s['histogram'], 0.5), self._quantile(s['histogram'], 0.95), s['max_time_s']])
+        df = pd.DataFrame(rows, columns=['endpoint', 'calls', 'errors', 'retries', 'bytes_sent', 'bytes_received',
+            'time_s', 'mean_s', 'p50_s', 'p95_s', 'max_s'])
+        return df.set_index('endpoint').sort_values('time_s', ascending=False)
+
+    def to_prometheus(self, prefix='dalmatian'):
+        """Statistics in Prometheus text exposition format"""
+        metrics = [
+            ('calls', 'requests_total', 'counter', 'Number of calls'),
+            ('errors', 'request_errors_total', 'counter', 'Number of failed calls'),
+            ('retries', 'retries_total', 'counter', 'Number of retried calls'),
+            ('bytes_sent', 'sent_bytes_total', 'counter', 'Bytes sent'),
+            ('bytes_received', 'received_bytes_total', 'counter', 'Bytes received'),
+        ]
+        lines = []
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            for k,name,mtype,desc in metrics:
+                lines.append('# HELP {}_{} {}'.format(prefix, name, desc))
+                lines.append('# TYPE {}_{} {}'.format(prefix, name, mtype))
+                for e,s in endpoints:
+                    lines.append('{}_{}{{endpoint="{}"}} {}'.format(prefix, name, e, s[k]))
+            name = prefix+'_request_duration_seconds'
+            lines.append('# HELP {} Call latency'.format(name))
+            lines.append('# TYPE {} histogram'.format(name))
+            for e,s in endpoints:
+                c = 0
+                for b,h in zip(self.buckets, s['histogram']):
+                    c += h
+                    lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(name, e, b, c))
+                lines.append('{}_bucket{{endpoint="{}",le="+Inf"}} {}'.format(name, e, s['calls']))
+                lines.append('{}_sum{{endpoint="{}"}} {}'.format(name, e, s['time_s']))
+                lines.append('{}_count{{endpoint="{}"}} {}'.format(name, e, s['calls']))
+        return '\n'.join(lines)+'\n'
+
+
+# default in-memory statistics
+stats = Stats()
+_callbacks = [stats]
+
+
+def add_callback(callback):
+    """Register a function that is called with each Event"""
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    _callbacks.remove(callback)
+
+
+def record(endpoint, elapsed, status=None, bytes_sent=0, bytes_received=0, error=None):
+    """Record a completed call"""
+    event = Event(endpoint, elapsed, status, bytes_sent, bytes_received, error, False)
+    for c in list(_callbacks):
+        c(event)
+
+
+def record_retry(endpoint):
+    """Record that a call is retried"""
+    event = Event(endpoint, None, None, 0, 0, None, True)
+    for c in list(_callbacks):
+        c(event)
+
+
+class timed(object):
+    """
+    Context manager recording the duration of a call, e.g.
+
+    with timed('gsutil.cat') as t:
+        s = subprocess.check_output(...)
+        t.bytes_received = len(s)
+
+    Exceptions are recorded as errors; 'status' and 'error' can also be set
+    explicitly (e.g., from a return code).
+    """
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.status = None
+        self.error = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        if etype is not None:
+            self.error = etype.__name__
+        record(self.endpoint, time.perf_counter()-self.start, status=self.status,
+            bytes_sent=self.bytes_sent, bytes_received=self.bytes_received, error=self.error)
+        return False
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    elif isinstance(body, (bytes, str)):
+        return len(body)
+    return 0  # streamed/multipart bodies
+
+
+class InstrumentedModule(object):
+    """
+    Proxy for an API module (firecloud.api): calls to public functions are
+    recorded as '<prefix>.<function>', with status code and response sizes
+    """
+    def __init__(self, module, prefix):
+        self.__module = module
+        self.__prefix = prefix
+        self.__wrapped = {}
+
+    def __wrap(self, name, func):
+        endpoint = '{}.{}'.format(self.__prefix, name)
+        def wrapper(*args, **kwargs):
+            with timed(endpoint) as t:
+                r = func(*args, **kwargs)
+                if hasattr(r, 'status_code'):
+                    t.status = r.status_code
+                    if r.status_code>=400:
+                        t.error = 'HTTP {}'.format(r.status_code)
+                    t.bytes_received = len(r.content)
+                    if getattr(r, 'request', None) is not None:
+                        t.bytes_sent = _body_size(r.request.body)
+            return r
+        wrapper.__name__ = name
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def __getattr__(self, name):
+        attr = getattr(self.__module, name)
+        if name.startswith('_') or not callable(attr) or isinstance(attr, type):
+            return attr
+        if name not in self.__wrapped:
+            self.__wrapped[name] = self.__wrap(name, attr)
+        return self.__wrapped[name]
+
+    def __dir__(self):
+        return dir(self.__module)
@@ -0,0 +1,144 @@
+import sys
+import time
+import logging
+import threading
+from collections import namedtuple
+
+# Progress reporting for bulk operations. Operations create a Tracker (or use
+# track() for loops); updates are passed to the current reporter at most once
+# per 'interval' seconds, plus once when the operation completes.
+
+Status = namedtuple('Status', ['desc', 'n', 'total', 'unit', 'elapsed', 'rate', 'eta', 'done'])
+
+
+def _format_time(seconds):
+    seconds = int(round(seconds))
+    return '{}:{:02d}:{:02d}'.format(seconds//3600, seconds//60%60, seconds%60)
+
+
+def format_status(status):
+    """Format progress, e.g. 'Fetching metadata: 120/500 workflows (35.2/s, ETA 0:00:10)'"""
+    if status.total is None:
+        s = '{}: {} {}'.format(status.desc, status.n, status.unit)
+    else:
+        s = '{}: {}/{} {}'.format(status.desc, status.n, status.total, status.unit)
+    if status.done:
+        return s+' ({} elapsed)'.format(_format_time(status.elapsed))
+    elif status.rate is not None:
+        s += ' ({:.1f}/s'.format(status.rate)
+        if status.eta is not None:
+            s += ', ETA {}'.format(_format_time(status.eta))
+        s += ')'
+    return s
+
+
+class NullReporter(object):
+    """Discard progress updates"""
+    interval = float('inf')
+
+    def report(self, status):
+        pass
+
+
+class TerminalReporter(object):
+    """Single-line progress display ('\r'), updated at most every 'interval' seconds"""
+    def __init__(self, interval=0.5, stream=None):
+        self.interval = interval
+        self.stream = stream
+        self._length = 0
+
+    def report(self, status):
+        stream = sys.stdout if self.stream is None else self.stream
+        s = format_status(status)
+        stream.write('\r'+s.ljust(self._length)+('\n' if status.done else ''))
+        stream.flush()
+        self._length = 0 if status.done else len(s)
+
+
+class LoggingReporter(object):
+    """Log progress, at most every 'interval' seconds"""
+    def __init__(self, logger=None, level=logging.INFO, interval=30):
+        self.logger = logging.getLogger('dalmatian') if logger is None else logger
+        self.level = level
+        self.interval = interval
+
+    def report(self, status):
+        self.logger.log(self.level, format_status(status))
+
+
+class CallbackReporter(object):
+    """Pass progress (Status) to a function, at most every 'interval' seconds"""
+    def __init__(self, callback, interval=1):
+        self.callback = callback
+        self.interval = interval
+
+    def report(self, status):
+        self.callback(status)
+
+
+_reporter = TerminalReporter()
+
+
+def get_reporter():
+    return _reporter
+
+
+def set_reporter(reporter):
+    """Set reporter used by all operations (returns the previous reporter)"""
+    global _reporter
+    previous = _reporter
+    _reporter = NullReporter() if reporter is None else reporter
+    return previous
+
+
+class Tracker(object):
+    """Track progress of an operation (thread-safe)"""
+    def __init__(self, desc, total=None, unit='items', reporter=None):
+        self.desc = desc
+        self.total = total
+        self.unit = unit
+        self.reporter = _reporter if reporter is None else reporter
+        self.n = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def status(self, done=False):
+        elapsed = time.perf_counter()-self.start
+        rate = self.n/elapsed if elapsed>0 and self.n>0 else None
+        eta = None
+        if rate is not None and self.total is not None:
+            eta = max(self.total-self.n, 0)/rate
+        return Status(self.desc, self.n, self.total, self.unit, elapsed, rate, eta, done)
+
+    def update(self, n=1):
+        with self._lock:
+            self.n += n
+            now = time.perf_counter()
+            if now-self._last>=self.reporter.interval:
+                self._last = now
+                self.reporter.report(self.status())
+
+    def close(self):
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self.reporter.report(self.status(done=True))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        self.close()
+        return False
+
+
+def track(iterable, desc, total=None, unit='items'):
+    """Iterate and report progress, e.g. for i in track(ids, 'Updating participants')"""
+    if total is None and hasattr(iterable, '__len__'):
+        total = len(iterable)
+    with Tracker(desc, total=total, unit=unit) as t:
+        for i in iterable:
+            yield i
+            t.update()
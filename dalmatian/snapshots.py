@@ -0,0 +1,100 @@
+import os
+import json
+import time
+
+from ._lazy import LazyModule
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
+# Entity snapshots: a snapshot stores a 64-bit hash of each attribute value
+# (entities x attributes; 0: missing), so that changes between snapshots can be
+# found by comparing hash matrices, without keeping or re-reading the values.
+
+
+def _encode(x):
+    """Attribute value as a string (None for missing values)"""
+    if isinstance(x, str):
+        return x
+    elif x is None or isinstance(x, float) and x!=x:
+        return None
+    return json.dumps(x, sort_keys=True)
+
+
+def hash_entities(df):
+    """
+    Hash attribute values of an entity table (e.g., from get_entities or a
+    page from iter_entities)
+
+    Returns pd.DataFrame of uint64 hashes with the same index and columns (0: missing)
+    """
+    hashes = {}
+    for c in df.columns:
+        values = np.array([_encode(x) for x in df[c]], dtype=object)
+        missing = pd.isnull(values)
+        values[missing] = ''
+        hashes[c] = np.where(missing, np.uint64(0), pd.util.hash_array(values, categorize=False))
+    return pd.DataFrame(hashes, index=df.index, columns=df.columns, dtype=np.uint64)
+
+
+def concat_hashes(hash_dfs):
+    """Combine hashed pages (e.g., of iter_entities) into one snapshot"""
+    hash_dfs = list(hash_dfs)
+    columns = pd.Index(list(dict.fromkeys(c for df in hash_dfs for c in df.columns)))
+    if len(hash_dfs)==0:
+        return pd.DataFrame(columns=columns, dtype=np.uint64)
+    # align columns first: concatenating with missing columns would convert hashes to float
+    return pd.concat([df.reindex(columns=columns, fill_value=np.uint64(0)).astype(np.uint64) for df in hash_dfs])
+
+
+def save_snapshot(hash_df, path, etype=None):
+    """Save snapshot (from hash_entities) as JSON"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path+'.tmp', 'w') as f:
+        json.dump({
+            'entity_type': etype,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'index': hash_df.index.tolist(),
+            'columns': hash_df.columns.tolist(),
+            'hashes': hash_df.values.tolist(),
+        }, f)
+    os.replace(path+'.tmp', path)
+
+
+def load_snapshot(path):
+    """Load snapshot saved with save_snapshot"""
+    with open(path) as f:
+        s = json.load(f)
+    return pd.DataFrame(np.array(s['hashes'], dtype=np.uint64).reshape(len(s['index']), len(s['columns'])),
+        index=pd.Index(s['index'], name=None if s['entity_type'] is None else s['entity_type']+'_id'),
+        columns=s['columns'])
+
+
+def diff_snapshots(old_df, new_df):
+    """
+    Changes between two snapshots (from hash_entities)
+
+    Returns pd.DataFrame with columns 'entity_id', 'attribute' and 'change':
+      'entity_added', 'entity_removed' (attribute: None), or
+      'added' (attribute was missing), 'removed' (attribute is now missing), 'modified'
+    """
+    columns = old_df.columns.union(new_df.columns, sort=False)
+    common = new_df.index.intersection(old_df.index, sort=False)
+    old = old_df.reindex(index=common, columns=columns, fill_value=np.uint64(0)).values.astype(np.uint64)
+    new = new_df.reindex(index=common, columns=columns, fill_value=np.uint64(0)).values.astype(np.uint64)
+    i, j = np.nonzero(old!=new)
+    change = np.where(old[i,j]==0, 'added', np.where(new[i,j]==0, 'removed', 'modified'))
+
+    added = new_df.index.difference(old_df.index, sort=False)
+    removed = old_df.index.difference(new_df.index, sort=False)
+    df = pd.DataFrame({
+        'entity_id': np.concatenate([np.asarray(added, dtype=object), np.asarray(removed, dtype=object),
+            np.asarray(common, dtype=object)[i]]),
+        'attribute': np.concatenate([np.full(len(added)+len(removed), None, dtype=object),
+            np.asarray(columns, dtype=object)[j]]),
+        'change': np.concatenate([np.full(len(added), 'entity_added', dtype=object),
+            np.full(len(removed), 'entity_removed', dtype=object), change.astype(object)]),
+    })
+    df['change'] = pd.Categorical(df['change'],
+        categories=['entity_added', 'entity_removed', 'added', 'removed', 'modified'])
+    return df
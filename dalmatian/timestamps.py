@@ -0,0 +1,59 @@
+from functools import lru_cache
+
+from ._lazy import LazyModule
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+pytz = LazyModule('pytz')
+
+# Timestamp handling: API timestamps (ISO 8601) are parsed in bulk to
+# datetime64 (UTC); conversion to a local timezone is only done for display.
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """Timezone object (cached)"""
+    return pytz.timezone(name)
+
+
+def parse(x):
+    """
+    Parse ISO 8601 timestamp(s) to UTC
+
+    x: str (returns pd.Timestamp), list/array of str (returns pd.DatetimeIndex),
+       or pd.Series of str; missing values are NaT
+    """
+    if x is None:
+        return pd.NaT
+    # format='ISO8601': precision may vary between values (e.g., '...:00.123Z' and '...:00Z')
+    return pd.to_datetime(x, utc=True, format='ISO8601')
+
+
+def to_seconds(x):
+    """Parse timestamp(s) to seconds since the epoch (float; NaN for missing values)"""
+    s = (parse(x) - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)
+    if isinstance(s, pd.Index):
+        return s.values
+    return s
+
+
+def elapsed(start, end):
+    """Time between timestamp(s) in seconds (NaN for missing values)"""
+    return to_seconds(end) - to_seconds(start)
+
+
+def to_local(t, timezone):
+    """Convert UTC timestamp(s) (parsed) to a timezone, for display"""
+    tz = get_timezone(timezone)
+    if isinstance(t, pd.Series):
+        return t.dt.tz_convert(tz)
+    return t.tz_convert(tz)
+
+
+def format(t, fmt='%H:%M:%S %m/%d/%Y', timezone=None):
+    """Format parsed timestamp(s) for display, optionally in a local timezone"""
+    if timezone is not None:
+        t = to_local(t, timezone)
+    if isinstance(t, pd.Series):
+        return t.dt.strftime(fmt)
+    return t.strftime(fmt)
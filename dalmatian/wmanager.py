@@ -1,18 +1,33 @@
-import pandas as pd
-import numpy as np
 import subprocess
 import os
 import io
-from collections import defaultdict
-import firecloud.api
-from firecloud import fiss
-import iso8601
-import pytz
+import copy
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from collections import defaultdict, deque
 from datetime import datetime
 
+from ._lazy import LazyModule
+from .instrumentation import timed, record_retry
+from .progress import Tracker, track
+from .timestamps import parse, elapsed, to_local, format as format_timestamps
+from .analytics import call_report
+from .snapshots import hash_entities, concat_hashes, load_snapshot, save_snapshot, diff_snapshots
+from .core import (firecloud, _thread_map, gs_delete, gs_cat, gs_list_objects, gs_copy_paths, gs_md5hashes,
+    grep_logs, parse_output_paths,
+    get_vm_cost, get_config, get_method_versions)
+
+# heavy dependencies are imported on first use
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+
 #------------------------------------------------------------------------------
 #  Extension of firecloud.api functionality using the rawls (internal) API
 #------------------------------------------------------------------------------
+RAWLS_API_URL = 'https://rawls.dsde-prod.broadinstitute.org/api/'
+
 def _batch_update_entities(namespace, workspace, json_body):
     """ Batch update entity attributes in a workspace.
 
@@ -60,9 +75,307 @@ def _batch_update_entities(namespace, workspace, json_body):
     """
     headers = firecloud.api._fiss_agent_header({"Content-type":  "application/json"})
     uri = "{0}workspaces/{1}/{2}/entities/batchUpdate".format(
-        'https://rawls.dsde-prod.broadinstitute.org/api/', namespace, workspace)
+        RAWLS_API_URL, namespace, workspace)
+
+    with timed('rawls.batchUpdate') as t:
+        r = firecloud.api.__post(uri, headers=headers, json=json_body)
+        t.status = r.status_code
+        if r.status_code>=400:
+            t.error = 'HTTP {}'.format(r.status_code)
+        t.bytes_sent = len(r.request.body) if r.request.body is not None else 0
+        t.bytes_received = len(r.content)
+    return r
+
+
+def _config_versions(configs, method_versions):
+    """
+    Tabulate method versions of configurations (list_configs() output) against
+    the latest repository versions (get_method_versions() output)
+    """
+    df = pd.DataFrame([{
+        'namespace': c['namespace'],
+        'name': c['name'],
+        'methodNamespace': c['methodRepoMethod']['methodNamespace'],
+        'methodName': c['methodRepoMethod']['methodName'],
+        'methodVersion': c['methodRepoMethod']['methodVersion'],
+    } for c in configs if 'methodName' in c['methodRepoMethod']],
+        columns=['namespace', 'name', 'methodNamespace', 'methodName', 'methodVersion'])
+    ix = pd.MultiIndex.from_arrays([df['methodNamespace'], df['methodName']])
+    df['latest_version'] = method_versions.reindex(ix).values
+    df['outdated'] = df['methodVersion'] < df['latest_version']
+    return df
+
+
+def _attribute_value(x):
+    """
+    Convert value to FireCloud attribute value (numbers, lists, entity references)
+    """
+    if isinstance(x, np.generic):
+        x = x.item()
+    if isinstance(x, (str, bool, int, float, dict)):
+        return x
+    elif isinstance(x, (list, tuple, np.ndarray, pd.Series)):
+        items = [_attribute_value(i) for i in x]
+        if len(items)>0 and np.all([isinstance(i, dict) for i in items]):
+            return {'itemsType': 'EntityReference', 'items': items}
+        else:
+            return {'itemsType': 'AttributeValue', 'items': items}
+    elif isinstance(x, datetime):
+        return x.isoformat()
+    else:
+        return str(x)
+
+
+def _flatten_calls(metadata):
+    """
+    Flatten call attempts from workflow metadata
+
+    metadata: dict of workflow metadata (e.g., keyed by entity ID)
+
+    Returns pd.DataFrame with one row per attempt (in metadata order) and columns
+    'key', 'workflow_name', 'task', 'shard', 'attempt', 'execution_status',
+    'backend_status', 'start', 'end' (UTC), 'time_h', 'quota_h' (time spent
+    waiting for quota), 'hit' (call cache), 'preemptible', 'machine_type',
+    'job_id', 'pos'
+    """
+    rows = []
+    quota = []  # 'waiting for quota' events: (row, start, end)
+    for k,m in metadata.items():
+        for t,calls in m['calls'].items():
+            for c in calls:
+                quota.extend([(len(rows), e['startTime'], e.get('endTime')) for e in c.get('executionEvents', [])
+                    if e['description']=='waiting for quota'])
+                machine_type = c['jes']['machineType'].rsplit('/')[-1] if 'machineType' in c.get('jes', {}) else None
+                rows.append((k, m['workflowName'], t, c.get('shardIndex', -1), c.get('attempt'),
+                    c.get('executionStatus'), c.get('backendStatus'), c.get('start'), c.get('end'),
+                    bool(c.get('callCaching', {}).get('hit', False)), bool(c.get('preemptible', False)),
+                    machine_type, c.get('jobId')))
+    df = pd.DataFrame(rows, columns=['key', 'workflow_name', 'task', 'shard', 'attempt', 'execution_status',
+        'backend_status', 'start', 'end', 'hit', 'preemptible', 'machine_type', 'job_id'])
+    for c in ['workflow_name', 'task', 'execution_status', 'backend_status', 'machine_type']:
+        df[c] = df[c].astype('category')
+    df['shard'] = df['shard'].astype(np.int64)
+    df['start'] = parse(df['start'])
+    df['end'] = parse(df['end'])
+    df['time_h'] = (df['end']-df['start']).dt.total_seconds()/3600
+    quota_df = pd.DataFrame(quota, columns=['row', 'start', 'end'])
+    quota_h = elapsed(quota_df['start'], quota_df['end'])/3600
+    df['quota_h'] = quota_h.groupby(quota_df['row'].values).sum().reindex(df.index, fill_value=0)
+    df['pos'] = np.arange(df.shape[0])
+    return df
+
+
+def _group_agg(df, column, by, how):
+    """Grouped sum/max that returns NaN for groups with missing values (as np.sum/np.max)"""
+    g = df.groupby(by, sort=False, observed=True)[column]
+    return g.agg(how).where(g.count()==g.size())
+
+
+def _machine_cpus(machine_types):
+    """Number of CPUs from machine type (e.g., n1-standard-4); 1 for shared-core and missing types"""
+    return pd.to_numeric(machine_types.astype(object).str.rsplit('-', n=1).str[-1], errors='coerce').fillna(1)
+
+
+def _entity_page(etype, entities):
+    """Convert a page of entities (from entityQuery) to a DataFrame"""
+    df = pd.DataFrame({i['name']:i['attributes'] for i in entities}).T
+    df.index.name = etype+'_id'
+    return df
+
+
+def _export_value(x, as_string=False):
+    """
+    Convert attribute value for export: entity references to IDs,
+    lists to Python lists (JSON-encoded if as_string)
+    """
+    if isinstance(x, dict):
+        if 'entityName' in x:
+            x = x['entityName']
+        elif 'items' in x:
+            x = [_export_value(i) for i in x['items']]
+    elif isinstance(x, float) and x!=x:
+        return None
+    elif isinstance(x, np.generic):
+        x = x.item()
+    if as_string and x is not None and not isinstance(x, str):
+        return json.dumps(x)
+    return x
+
+
+def _entity_references(etype, df):
+    """
+    List entity references in an entity table (from get_entities)
+
+    Returns pd.DataFrame with columns 'entity_type', 'entity_id', 'attribute',
+    'ref_type', 'ref_id', 'is_list'
+    """
+    rows = []
+    for c in df.columns:
+        for i,v in df[c][df[c].apply(lambda x: isinstance(x, dict))].items():
+            if 'entityName' in v:
+                rows.append((etype, i, c, v['entityType'], v['entityName'], False))
+            elif v.get('itemsType')=='EntityReference':
+                rows.extend([(etype, i, c, m['entityType'], m['entityName'], True) for m in v['items']])
+    df = pd.DataFrame(rows, columns=['entity_type', 'entity_id', 'attribute', 'ref_type', 'ref_id', 'is_list'])
+    df['is_list'] = df['is_list'].astype(bool)
+    return df
+
+
+def _entity_paths(etype, df):
+    """
+    List file paths (gs://) in an entity table (from get_entities)
+
+    Returns pd.DataFrame with columns 'entity_type', 'entity_id', 'attribute', 'path'
+    """
+    rows = []
+    for c in df.columns:
+        for i,v in df[c].items():
+            if isinstance(v, str):
+                if v.startswith('gs://'):
+                    rows.append((etype, i, c, v))
+            elif isinstance(v, dict) and v.get('itemsType')=='AttributeValue':
+                rows.extend([(etype, i, c, p) for p in v['items'] if isinstance(p, str) and p.startswith('gs://')])
+    return pd.DataFrame(rows, columns=['entity_type', 'entity_id', 'attribute', 'path'])
+
+
+# references imported as TSV columns (required by the FireCloud data model)
+_tsv_references = {
+    'sample': {'participant': 'participant_id'},
+    'pair': {'participant': 'participant', 'case_sample': 'case_sample', 'control_sample': 'control_sample'},
+}
+
+
+def _required_references(ref_df):
+    """
+    References that must exist when an entity is imported: references in TSV
+    imports (_tsv_references) and set memberships. Other references (e.g.,
+    participant.samples_) are written separately and may be circular.
+
+    ref_df: output of _entity_references
+
+    Returns (is_required, is_membership) boolean arrays
+    """
+    is_membership = (ref_df['is_list'].astype(bool) & ref_df['entity_type'].astype(str).str.endswith('_set')
+        & (ref_df['attribute']==ref_df['entity_type'].astype(str).str.rsplit('_set', n=1).str[0]+'s')).values
+    tsv = [(t,c) for t,d in _tsv_references.items() for c in d]
+    is_tsv = ~ref_df['is_list'].astype(bool).values & pd.MultiIndex.from_arrays(
+        [ref_df['entity_type'], ref_df['attribute']]).isin(tsv)
+    return is_tsv | is_membership, is_membership
 
-    return firecloud.api.__post(uri, headers=headers, json=json_body)
+
+def _sort_entity_types(types, references):
+    """
+    Sort entity types such that referencing types come first
+
+    references: (entity_type, referenced_type) pairs
+    """
+    edges = set(references)
+    types = list(types)
+    type_order = []
+    while types:
+        free = [t for t in types if not any(e[1]==t and e[0]!=t and e[0] in types for e in edges)]
+        if not free:
+            raise ValueError('Circular references between entity types: {}'.format(types))
+        type_order.extend(free)
+        types = [t for t in types if t not in free]
+    return type_order
+
+
+# precedence of call statuses when summarizing the shards of a task
+# (statuses not listed are treated as active)
+_status_priority = ['Failed', 'Aborted', 'Running', 'Starting', 'QueuedInCromwell', 'RetryableFailure',
+                    'NotStarted', 'Unstartable', 'Bypassed', 'Done']
+
+
+class TaskStatus(object):
+    """
+    (workflow x task x shard) status table, updated incrementally
+
+    ts = TaskStatus(wm)
+    ts.refresh(status_df)  # e.g., from get_entity_status; call again to update
+    ts.state_df            # one row per workflow, task and shard (last attempt)
+    ts.task_states()       # entity x task status matrix
+    ts.summary()           # call status counts per task (shards counted individually)
+    ts.shard_summary()     # status counts per task and shard
+
+    On refresh, only metadata of workflows that have not completed is fetched;
+    rows of completed workflows are kept from the previous refresh.
+    """
+    columns = ['workflow_id', 'submission_id', 'entity', 'task', 'shard', 'attempts',
+               'execution_status', 'backend_status', 'start', 'end', 'time_h']
+
+    def __init__(self, wm, num_threads=10):
+        self.wm = wm
+        self.num_threads = num_threads
+        self.status_df = None
+        self.state_df = pd.DataFrame(columns=self.columns)
+        self._workflow_status = {}  # workflow_id: status (from metadata)
+        self.tasks = []  # in order of appearance
+
+    def refresh(self, status_df=None):
+        """Update table (status_df: workflow_id, submission_id, indexed by entity)"""
+        if status_df is not None:
+            self.status_df = status_df
+        status_df = self.status_df[self.status_df['workflow_id']!='NA']
+        stale = [(s,w) for s,w in zip(status_df['submission_id'], status_df['workflow_id'])
+            if self._workflow_status.get(w) not in ['Succeeded', 'Failed', 'Aborted']]
+        metadata = self.wm.get_workflows_metadata([i[0] for i in stale], [i[1] for i in stale],
+            num_threads=self.num_threads)
+        metadata = {w:m for (s,w),m in zip(stale, metadata)}
+        self._workflow_status.update({w:m['status'] for w,m in metadata.items()})
+
+        df = _flatten_calls(metadata)
+        df['task'] = df['task'].astype(object).str.rsplit('.', n=1).str[-1]
+        g = df.groupby(['key', 'task', 'shard'], sort=False)
+        df = df.loc[g['pos'].idxmax().values].reset_index(drop=True)  # last attempt
+        df['attempts'] = g.size().values
+        df['workflow_id'] = df['key'].astype(object)
+        entities = pd.Series(status_df.index, index=status_df['workflow_id'].values)
+        submissions = pd.Series(status_df['submission_id'].values, index=status_df['workflow_id'].values)
+        df['entity'] = entities.reindex(df['workflow_id']).values
+        df['submission_id'] = submissions.reindex(df['workflow_id']).values
+
+        # keep completed workflows; drop workflows no longer in status_df (e.g., re-run entities)
+        state_df = self.state_df[self.state_df['workflow_id'].isin(status_df['workflow_id'])
+            & ~self.state_df['workflow_id'].isin(list(metadata))]
+        state_df = pd.concat([state_df, df[self.columns]], ignore_index=True)
+        for c in ['workflow_id', 'submission_id', 'entity', 'task', 'execution_status', 'backend_status']:
+            state_df[c] = state_df[c].astype('category')
+        for c in ['shard', 'attempts']:
+            state_df[c] = state_df[c].astype(np.int64)
+        for c in ['start', 'end']:
+            state_df[c] = pd.to_datetime(state_df[c], utc=True)
+        state_df['time_h'] = state_df['time_h'].astype(float)
+        self.state_df = state_df
+        self.tasks.extend([t for t in pd.unique(df['task']) if t not in self.tasks])
+        return self
+
+    def task_states(self):
+        """
+        Task status for each entity, indexed as status_df (tasks of scattered
+        calls are summarized: e.g., 'Failed' if any shard failed; 'Waiting' if not started)
+        """
+        rank = {s:i for i,s in enumerate(_status_priority)}
+        r = self.state_df['execution_status'].astype(object).map(rank).fillna(rank['Running'])
+        r = r.groupby([self.state_df['workflow_id'].astype(object), self.state_df['task'].astype(object)]).min()
+        if r.shape[0]>0:
+            df = pd.Series(np.array(_status_priority, dtype=object)[r.values.astype(int)], index=r.index).unstack('task')
+        else:
+            df = pd.DataFrame()
+        df = df.reindex(index=self.status_df['workflow_id'].values, columns=self.tasks).fillna('Waiting')
+        df.index = self.status_df.index
+        df.columns.name = None
+        return df
+
+    def summary(self):
+        """Call status counts (rows) for each task (columns), counting shards individually"""
+        df = self.state_df.groupby(['execution_status', 'task'], observed=True).size().unstack('task', fill_value=0)
+        return df.reindex(columns=[t for t in self.tasks if t in df.columns])
+
+    def shard_summary(self, backend=False):
+        """Status counts (columns) for each task and shard, across workflows (backend: use backend status)"""
+        c = 'backend_status' if backend else 'execution_status'
+        return self.state_df.groupby(['task', 'shard', c], observed=True).size().unstack(c, fill_value=0)
 
 
 #------------------------------------------------------------------------------
@@ -94,18 +407,83 @@ class WorkspaceCollection(object):
             else:
                 df['workspace'] = i.workspace
             dfs.append(df)
-        return pd.concat(dfs, axis=0)
+        df = pd.concat(dfs, axis=0)
+        for c in ['configuration', 'status', 'workspace']:  # categories differ between workspaces
+            df[c] = df[c].astype('category')
+        return df
+
+    def get_attributes(self, num_threads=10):
+        """Get workspace attributes of all workspaces (fetched concurrently), as pd.DataFrame indexed by workspace"""
+        attrs = _thread_map(lambda wm: wm.get_attributes(), self.workspace_list, num_threads=num_threads)
+        return pd.DataFrame(attrs, index=['{}/{}'.format(wm.namespace, wm.workspace) for wm in self.workspace_list])
+
+    def update_attributes(self, attr_dict, per_workspace=False, num_threads=10):
+        """
+        Set or update attributes in all workspaces, concurrently (only changed attributes are sent)
+
+        attr_dict: attributes to set in all workspaces, or, if per_workspace=True,
+                   dict of attribute dicts keyed by workspace ('namespace/workspace')
+
+        Returns dict of updated attributes for each workspace
+        """
+        names = ['{}/{}'.format(wm.namespace, wm.workspace) for wm in self.workspace_list]
+        if per_workspace:
+            unknown = [k for k in attr_dict if k not in names]
+            if unknown:
+                raise ValueError('Workspaces not in collection: {}'.format(', '.join(unknown)))
+            items = [(wm, attr_dict[n]) for wm,n in zip(self.workspace_list, names) if n in attr_dict]
+        else:
+            items = [(wm, attr_dict) for wm in self.workspace_list]
+        updated = _thread_map(lambda x: x[0].update_attributes(x[1]), items, num_threads=num_threads,
+            desc='Updating attributes', unit='workspaces')
+        return {'{}/{}'.format(wm.namespace, wm.workspace):u for (wm,_),u in zip(items, updated)}
+
+    def check_configurations(self, update=False, num_threads=10, refresh=False):
+        """
+        Compare method versions of all configurations across workspaces to the
+        latest versions available in the repository (config drift report)
+
+        Configurations are fetched concurrently for all workspaces and resolved
+        against a single (cached) repository index.
+        If update=True, outdated configurations are updated to the latest version
+        (the repository index is reloaded first; refresh=True reloads it in any case).
+        """
+        method_versions = get_method_versions(refresh=refresh or update)
+        configs = _thread_map(lambda wm: wm.list_configs(), self.workspace_list, num_threads=num_threads)
+        dfs = []
+        for wm,c in zip(self.workspace_list, configs):
+            df = _config_versions(c, method_versions)
+            df.insert(0, 'workspace', '{}/{}'.format(wm.namespace, wm.workspace))
+            dfs.append(df)
+        df = pd.concat(dfs, axis=0, ignore_index=True)
+
+        if update:
+            wm_dict = {'{}/{}'.format(wm.namespace, wm.workspace):wm for wm in self.workspace_list}
+            outdated_df = df[df['outdated']]
+            print('Updating {} outdated configurations.'.format(outdated_df.shape[0]))
+            _thread_map(lambda r: wm_dict[r.workspace].update_configuration_version(
+                r.namespace, r.name, r.latest_version), outdated_df.itertuples(), num_threads=num_threads)
+        return df
 
 
 class WorkspaceManager(object):
-    def __init__(self, namespace, workspace, timezone='America/New_York'):
+    def __init__(self, namespace, workspace, timezone='America/New_York', cache_dir=None):
         self.namespace = namespace
         self.workspace = workspace
         self.timezone  = timezone
+        # metadata of completed submissions and workflows doesn't change;
+        # if cache_dir is set, workflow metadata is also cached on disk
+        self.cache_dir = cache_dir
+        self._submission_cache = {}
+        self._metadata_cache = {}
+        self._task_status = {}  # TaskStatus tables for display_status
+        self._workspace = None  # workspace descriptor (bucket, attributes); reset by writes
+        self._workspace_lock = threading.Lock()
 
 
     def create_workspace(self, wm=None):
         """Create the workspace, or clone from another"""
+        self._workspace = None
         if wm is None:
             r = firecloud.api.create_workspace(self.namespace, self.workspace)
             if r.status_code==201:
@@ -123,8 +501,139 @@ class WorkspaceManager(object):
                 print(r.text)
 
 
+    def copy_workspace(self, wm, entity_types=None, sample_set_id=None, configs=True, attributes=True,
+                       chunk_size=1000, num_threads=10):
+        """
+        Copy configurations, workspace attributes and entities from workspace
+        wm (WorkspaceManager) into this (existing) workspace
+
+        entity_types:  entity types to copy (default: all)
+        sample_set_id: only copy this sample set, its samples, and their
+                       participants and pairs
+
+        Entities are read with concurrent paginated queries and written with
+        chunked TSV imports (IDs and scalar attributes) and set membership
+        imports; references and lists are then written with batchUpdate calls.
+        """
+        start = time.time()
+        if configs:
+            c = wm.list_configs()
+            print('Copying {} configurations'.format(len(c)))
+            def copy_config(x):
+                r = firecloud.api.get_workspace_config(wm.namespace, wm.workspace, x['namespace'], x['name'])
+                assert r.status_code==200
+                self.update_configuration(r.json())
+            _thread_map(copy_config, c, num_threads=num_threads)
+        if attributes:
+            self.update_attributes(wm.get_attributes())
+
+        # read entities
+        if entity_types is None:
+            entity_types = list(wm.get_entity_types())
+        t = time.time()
+        dfs = dict(zip(entity_types, _thread_map(wm.get_entities, entity_types, num_threads=num_threads)))
+        n = np.sum([df.shape[0] for df in dfs.values()])
+        print('Read {} entities from {}/{} in {:.1f}s ({:.0f} entities/s)'.format(
+            n, wm.namespace, wm.workspace, time.time()-t, n/max(time.time()-t, 1e-3)))
+
+        if sample_set_id is not None:
+            dfs['sample_set'] = dfs['sample_set'].loc[[sample_set_id]]
+            samples = [i['entityName'] for i in dfs['sample_set'].at[sample_set_id, 'samples']['items']]
+            dfs['sample'] = dfs['sample'].loc[samples]
+            if 'participant' in dfs:
+                participants = np.unique([i['entityName'] for i in dfs['sample']['participant']])
+                dfs['participant'] = dfs['participant'].loc[participants]
+            if 'pair' in dfs:
+                dfs['pair'] = dfs['pair'][
+                    dfs['pair']['case_sample'].apply(lambda x: x['entityName']).isin(samples)
+                    & dfs['pair']['control_sample'].apply(lambda x: x['entityName']).isin(samples)]
+            dfs = {i:j for i,j in dfs.items() if i in ['sample_set', 'sample', 'participant', 'pair']}
+        dfs = {i:j for i,j in dfs.items() if j.shape[0]>0}
+
+        # references to entities that are not copied are dropped
+        ref_df = pd.concat([_entity_references(i, df) for i,df in dfs.items()]
+            +[_entity_references(None, pd.DataFrame())], ignore_index=True)  # (non-empty list)
+        ref_df['is_list'] = ref_df['is_list'].astype(bool)
+        copied = set([(i,j) for i,df in dfs.items() for j in df.index])
+        ref_df = ref_df[[i in copied for i in zip(ref_df['ref_type'], ref_df['ref_id'])]]
+
+        # sets are created from their memberships: sets without (copied) members are skipped
+        is_membership = _required_references(ref_df)[1]
+        empty = set([(i,j) for i,df in dfs.items() if i.endswith('_set') for j in df.index]).difference(
+            zip(ref_df['entity_type'][is_membership], ref_df['entity_id'][is_membership]))
+        if empty:
+            print('Skipping {} sets without members.'.format(len(empty)))
+            dfs = {i:df.loc[[(i,j) not in empty for j in df.index]] for i,df in dfs.items()}
+            dfs = {i:j for i,j in dfs.items() if j.shape[0]>0}
+            copied.difference_update(empty)
+            ref_df = ref_df[np.array([i not in empty and j not in empty for i,j in zip(
+                zip(ref_df['entity_type'], ref_df['entity_id']), zip(ref_df['ref_type'], ref_df['ref_id']))], dtype=bool)]
+        def convert(x):
+            if not isinstance(x, dict):  # null
+                return x
+            elif 'entityName' in x:
+                return x if (x['entityType'], x['entityName']) in copied else np.nan
+            elif x.get('itemsType')=='EntityReference':
+                return {'itemsType': 'EntityReference',
+                        'items': [i for i in x['items'] if (i['entityType'], i['entityName']) in copied]}
+            else:
+                return x['items']
+
+        # import entities, referenced types first (only references written with the
+        # import determine the order; all other references are written afterwards)
+        required_df = ref_df[_required_references(ref_df)[0]]
+        for etype in _sort_entity_types(dfs, zip(required_df['entity_type'], required_df['ref_type']))[::-1]:
+            t = time.time()
+            df = dfs[etype]
+            is_scalar = ~df.apply(lambda x: x.map(lambda y: isinstance(y, dict)).any()).astype(bool)
+            if etype.endswith('_set'):  # sets are created from their memberships
+                members = etype.rsplit('_set', 1)[0]+'s'
+                g = ref_df[(ref_df['entity_type']==etype) & (ref_df['attribute']==members)]
+                self.update_sets(etype, {i:j['ref_id'].tolist() for i,j in g.groupby('entity_id')})
+                if is_scalar.any():
+                    self.update_entity_attributes(etype, df.loc[:, is_scalar], num_threads=num_threads)
+            else:
+                # required references are imported with the entities
+                tsv_df = df.loc[:, is_scalar].copy()
+                for c,h in _tsv_references.get(etype, {}).items():
+                    if c in df:
+                        tsv_df[h] = df[c].apply(lambda x: x['entityName'] if isinstance(x, dict) else np.nan)
+                tsv_df.index.name = 'entity:{}_id'.format(etype)
+                def upload(x):
+                    buf = io.StringIO()
+                    x.to_csv(buf, sep='\t')
+                    r = firecloud.api.upload_entities(self.namespace, self.workspace, buf.getvalue())
+                    buf.close()
+                    return r
+                r = _thread_map(upload, [tsv_df.iloc[i:i+chunk_size] for i in range(0, tsv_df.shape[0], chunk_size)],
+                    num_threads=num_threads, desc='Uploading {}s'.format(etype), unit='chunks')
+                failed = [i for i in r if i.status_code!=200]
+                if failed:
+                    print(failed[0].text)
+                    raise ValueError('Import of {}s failed for {} of {} chunks.'.format(etype, len(failed), len(r)))
+            print('  * {}: {} entities in {:.1f}s ({:.0f} entities/s)'.format(
+                etype, df.shape[0], time.time()-t, df.shape[0]/max(time.time()-t, 1e-3)))
+
+        # write references and lists
+        for etype,df in dfs.items():
+            is_scalar = ~df.apply(lambda x: x.map(lambda y: isinstance(y, dict)).any()).astype(bool)
+            imported = list(_tsv_references.get(etype, {}))
+            if etype.endswith('_set'):
+                imported.append(etype.rsplit('_set', 1)[0]+'s')
+            attr_df = df.loc[:, ~is_scalar].drop(imported, axis=1, errors='ignore')
+            for c in attr_df.columns:
+                attr_df[c] = attr_df[c].map(convert)
+            if attr_df.notnull().any().any():
+                self.update_entity_attributes(etype, attr_df, num_threads=num_threads)
+
+        print('Copied {} entities from {}/{} to {}/{} in {:.1f}s'.format(
+            np.sum([df.shape[0] for df in dfs.values()]), wm.namespace, wm.workspace,
+            self.namespace, self.workspace, time.time()-start))
+
+
     def delete_workspace(self):
         """Delete the workspace"""
+        self._workspace = None
         r = firecloud.api.delete_workspace(self.namespace, self.workspace)
         if r.status_code==202:
             print('Workspace {}/{} successfully deleted.'.format(self.namespace, self.workspace))
@@ -133,13 +642,24 @@ class WorkspaceManager(object):
             print(r.text)
 
 
+    def get_workspace(self, refresh=False):
+        """
+        Get the workspace descriptor (bucket, attributes, creation date, ...),
+        cached until the workspace attributes are updated (or refresh=True)
+
+        Returns a copy; changes are not reflected in the cache.
+        """
+        with self._workspace_lock:
+            if self._workspace is None or refresh:
+                r = firecloud.api.get_workspace(self.namespace, self.workspace)
+                assert r.status_code==200
+                self._workspace = r.json()['workspace']
+            return copy.deepcopy(self._workspace)
+
+
     def get_bucket_id(self):
         """Get the GCS bucket ID associated with the workspace"""
-        r = firecloud.api.get_workspace(self.namespace, self.workspace)
-        assert r.status_code==200
-        r = r.json()
-        bucket_id = r['workspace']['bucketName']
-        return bucket_id
+        return self.get_workspace()['bucketName']
 
 
     def upload_samples(self, df, participant_df=None, add_participant_samples=False):
@@ -218,8 +738,7 @@ class WorkspaceManager(object):
         samples_dict = {k:g.index.values for k,g in df.groupby('participant')}
 
         participant_ids = np.unique(df['participant'])
-        for j,k in enumerate(participant_ids):
-            print('\r    Updating samples for participant {}/{}'.format(j+1,len(participant_ids)), end='')
+        for k in track(participant_ids, 'Updating samples of participants', unit='participants'):
             attr_dict = {
                 "samples_": {
                     "itemsType": "EntityReference",
@@ -229,7 +748,7 @@ class WorkspaceManager(object):
             attrs = [firecloud.api._attr_set(i,j) for i,j in attr_dict.items()]
             r = firecloud.api.update_entity(self.namespace, self.workspace, 'participant', k, attrs)
             assert r.status_code==200
-        print('\n    Finished updating participants in {}/{}'.format(self.namespace, self.workspace))
+        print('    Finished updating participants in {}/{}'.format(self.namespace, self.workspace))
 
 
     def update_participant_samples_and_pairs(self):
@@ -238,8 +757,7 @@ class WorkspaceManager(object):
         samples_dict = {k:g.index.values for k,g in df.groupby('participant')}
 
         participant_ids = np.unique(df['participant'])
-        for j,k in enumerate(participant_ids):
-            print('\r    Updating samples for participant {}/{}'.format(j+1,len(participant_ids)), end='')
+        for k in track(participant_ids, 'Updating samples of participants', unit='participants'):
             attr_dict = {
                 "samples_": {
                     "itemsType": "EntityReference",
@@ -249,14 +767,13 @@ class WorkspaceManager(object):
             attrs = [firecloud.api._attr_set(i,j) for i,j in attr_dict.items()]
             r = firecloud.api.update_entity(self.namespace, self.workspace, 'participant', k, attrs)
             assert r.status_code==200
-        print('\n    Finished attaching samples to participants in {}/{}'.format(self.namespace, self.workspace))
+        print('    Finished attaching samples to participants in {}/{}'.format(self.namespace, self.workspace))
 
         df = self.get_pairs()[['participant']]
         pairs_dict = {k: g.index.values for k, g in df.groupby('participant')}
 
         participant_ids = np.unique(df['participant'])
-        for j, k in enumerate(participant_ids):
-            print('\r    Updating pairs for participant {}/{}'.format(j + 1, len(participant_ids)), end='')
+        for k in track(participant_ids, 'Updating pairs of participants', unit='participants'):
             attr_dict = {
                 "pairs_": {
                     "itemsType": "EntityReference",
@@ -266,7 +783,7 @@ class WorkspaceManager(object):
             attrs = [firecloud.api._attr_set(i, j) for i, j in attr_dict.items()]
             r = firecloud.api.update_entity(self.namespace, self.workspace, 'participant', k, attrs)
             assert r.status_code == 200
-        print('\n    Finished attaching pairs to participants in {}/{}'.format(self.namespace, self.workspace))
+        print('    Finished attaching pairs to participants in {}/{}'.format(self.namespace, self.workspace))
 
 
     def make_pairs(self, sample_set_id=None):
@@ -315,15 +832,15 @@ class WorkspaceManager(object):
 
 
     def update_sample_attributes(self, sample_id, attrs):
-        """Set or update attributes in attrs (pd.Series or pd.DataFrame)"""
-        self.update_entity_attributes('sample', attrs)
+        """Set or update attributes in attrs (dict or pd.Series)"""
+        self.update_entity_attributes('sample', pd.DataFrame([attrs], index=[sample_id]))
 
 
     def update_sample_set_attributes(self, sample_set_id, attrs):
         """
-        Set or update attributes in attrs (pd.Series or pd.DataFrame)
+        Set or update attributes in attrs (dict or pd.Series)
         """
-        self.update_entity_attributes('sample_set', attrs)
+        self.update_entity_attributes('sample_set', pd.DataFrame([attrs], index=[sample_set_id]))
 
 
     def delete_sample_set_attributes(self, sample_set_id, attrs):
@@ -331,24 +848,32 @@ class WorkspaceManager(object):
         self.delete_entity_attributes(self, 'sample_set', sample_set_id, attrs)
 
 
-    def update_attributes(self, attr_dict):
+    def update_attributes(self, attr_dict, force=False):
         """
         Set or update workspace attributes. Wrapper for API 'set' call
+
+        Only attributes that differ from the current values are sent (all if force=True).
+        Returns dict of updated attributes.
         """
+        if not force:
+            current = self.get_workspace()['attributes']
+            attr_dict = {k:v for k,v in attr_dict.items() if k not in current or current[k]!=_attribute_value(v)}
+        if len(attr_dict)==0:
+            print('Workspace attributes in {}/{} are up to date.'.format(self.namespace, self.workspace))
+            return attr_dict
         attrs = [firecloud.api._attr_set(i,j) for i,j in attr_dict.items()]
-        r = firecloud.api.update_workspace_attributes(self.namespace, self.workspace, attrs)  # attrs must be list
+        try:
+            r = firecloud.api.update_workspace_attributes(self.namespace, self.workspace, attrs)  # attrs must be list
+        finally:
+            self._workspace = None
         assert r.status_code==200
-        print('Successfully updated workspace attributes in {}/{}'.format(self.namespace, self.workspace))
+        print('Successfully updated {} workspace attributes in {}/{}'.format(len(attr_dict), self.namespace, self.workspace))
+        return attr_dict
 
 
-    def get_attributes(self):
-        """Get workspace attributes"""
-        r = firecloud.api.get_workspace(self.namespace, self.workspace)
-        assert r.status_code==200
-        attr = r.json()['workspace']['attributes']
-        for k in [k for k in attr if 'library:' in k]:
-            attr.pop(k)
-        return attr
+    def get_attributes(self, refresh=False):
+        """Get workspace attributes (excluding library attributes)"""
+        return {k:v for k,v in self.get_workspace(refresh=refresh)['attributes'].items() if 'library:' not in k}
 
 
     def get_sample_attributes_in_set(self, set):
@@ -369,42 +894,64 @@ class WorkspaceManager(object):
         submissions = self.list_submissions(config=config)
 
         statuses = ['Succeeded', 'Running', 'Failed', 'Aborted', 'Submitted', 'Queued']
-        df = []
-        for s in submissions:
-            d = {
-                'entity_id':s['submissionEntity']['entityName'],
-                'status':s['status'],
-                'submission_id':s['submissionId'],
-                'date':iso8601.parse_date(s['submissionDate']).strftime('%H:%M:%S %m/%d/%Y'),
-            }
-            d.update({i:s['workflowStatuses'].get(i,0) for i in statuses})
-            if show_namespaces:
-                d['configuration'] = s['methodConfigurationNamespace']+'/'+s['methodConfigurationName']
-            else:
-                d['configuration'] = s['methodConfigurationName']
-            df.append(d)
-        df = pd.DataFrame(df)
-        df.set_index('entity_id', inplace=True)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df[['configuration', 'status']+statuses+['date', 'submission_id']]
+        if show_namespaces:
+            configs = [s['methodConfigurationNamespace']+'/'+s['methodConfigurationName'] for s in submissions]
+        else:
+            configs = [s['methodConfigurationName'] for s in submissions]
+        df = pd.DataFrame({
+            'configuration': pd.Categorical(configs),
+            'status': pd.Categorical([s['status'] for s in submissions]),
+        }, index=pd.Index([s['submissionEntity']['entityName'] for s in submissions], name='entity_id'))
+        for i in statuses:
+            df[i] = np.array([s['workflowStatuses'].get(i,0) for s in submissions], dtype=np.int32)
+        df['date'] = parse([s['submissionDate'] for s in submissions])
+        df['submission_id'] = [s['submissionId'] for s in submissions]
         if filter_active:
             df = df[(df['Running']!=0) | (df['Submitted']!=0)]
-        return df.sort_values('date')[::-1]
+        return df.sort_values('date', ascending=False, kind='mergesort')
 
 
     def get_workflow_metadata(self, submission_id, workflow_id):
-        """Get metadata JSON for a specific workflow"""
+        """Get metadata JSON for a specific workflow (cached once the workflow has completed)"""
+        if workflow_id in self._metadata_cache:
+            return self._metadata_cache[workflow_id]
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = os.path.join(os.path.expanduser(self.cache_dir), 'metadata', workflow_id+'.json')
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    self._metadata_cache[workflow_id] = json.load(f)
+                return self._metadata_cache[workflow_id]
         metadata = firecloud.api.get_workflow_metadata(self.namespace, self.workspace,
             submission_id, workflow_id)
         assert metadata.status_code==200
-        return metadata.json()
+        metadata = metadata.json()
+        if metadata['status'] in ['Succeeded', 'Failed', 'Aborted']:
+            self._metadata_cache[workflow_id] = metadata
+            if cache_path is not None:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path, 'w') as f:
+                    json.dump(metadata, f)
+        return metadata
+
+
+    def get_workflows_metadata(self, submission_ids, workflow_ids, num_threads=10):
+        """Get metadata JSON for a list of workflows (fetched concurrently)"""
+        return _thread_map(lambda x: self.get_workflow_metadata(*x),
+            list(zip(submission_ids, workflow_ids)), num_threads=num_threads,
+            desc='Fetching metadata', unit='workflows')
 
 
     def get_submission(self, submission_id):
-        """Get submission metadata"""
+        """Get submission metadata (cached once the submission has completed)"""
+        if submission_id in self._submission_cache:
+            return self._submission_cache[submission_id]
         r = firecloud.api.get_submission(self.namespace, self.workspace, submission_id)
         assert r.status_code==200
-        return r.json()
+        r = r.json()
+        if r['status']=='Done':
+            self._submission_cache[submission_id] = r
+        return r
 
 
     def list_submissions(self, config=None):
@@ -426,18 +973,30 @@ class WorkspaceManager(object):
         return r.json()
 
 
-    def print_scatter_status(self, submission_id, workflow_id=None):
-        """Print status for a specific scatter job"""
+    def print_scatter_status(self, submission_id, workflow_id=None, num_threads=10):
+        """
+        Print shard status (backend status counts) of scattered tasks, for all
+        workflows of a submission or for a specific workflow
+
+        Returns TaskStatus (see TaskStatus.shard_summary for per-shard counts)
+        """
         if workflow_id is None:
-            s = self.get_submission(submission_id)
-            assert len(s['workflows'])==1
-            workflow_id = s['workflows'][0]['workflowId']
-        metadata = self.get_workflow_metadata(submission_id, workflow_id)
-        for task_name in metadata['calls']:
-            if np.all(['shardIndex' in i for i in metadata['calls'][task_name]]):
-                print('Submission status ({}): {}'.format(task_name.split('.')[-1], metadata['status']))
-                s = pd.Series([s['backendStatus'] for s in metadata['calls'][task_name]])
-                print(s.value_counts().to_string())
+            workflows = [w for w in self.get_submission(submission_id)['workflows'] if 'workflowId' in w]
+            status_df = pd.DataFrame({'workflow_id': [w['workflowId'] for w in workflows]},
+                index=[w['workflowEntity']['entityName'] for w in workflows])
+        else:
+            status_df = pd.DataFrame({'workflow_id': [workflow_id]}, index=[workflow_id])
+        status_df['submission_id'] = submission_id
+        ts = TaskStatus(self, num_threads=num_threads).refresh(status_df)
+
+        df = ts.state_df[ts.state_df['shard']>=0]
+        counts = df.groupby(['task', 'backend_status'], observed=True).size()
+        workflows = df.groupby('task', observed=True)['workflow_id'].nunique()
+        for task in [t for t in ts.tasks if t in workflows.index]:
+            c = counts.loc[task]
+            print('Scatter status ({}): {} shards in {} workflow(s)'.format(task, c.sum(), workflows[task]))
+            print(c.sort_values(ascending=False).to_string())
+        return ts
 
 
     def get_entity_status(self, etype, config):
@@ -446,33 +1005,34 @@ class WorkspaceManager(object):
         # filter submissions by configuration
         submissions = self.list_submissions(config=config)
 
-        # get status of last run submission
-        entity_dict = {}
-        for k,s in enumerate(submissions):
-            print('\rFetching submission {}/{}'.format(k+1, len(submissions)), end='')
+        # workflows of all submissions
+        rows = []
+        skipped = []
+        for s in track(submissions, 'Fetching submissions', unit='submissions'):
             if s['submissionEntity']['entityType']!=etype:
-                print('\rIncompatible submission entity type: {}'.format(
-                    s['submissionEntity']['entityType']))
-                print('\rSkipping : '+ s['submissionId'])
+                skipped.append(s)
                 continue
             r = self.get_submission(s['submissionId'])
-            ts = datetime.timestamp(iso8601.parse_date(s['submissionDate']))
-            for w in r['workflows']:
-                entity_id = w['workflowEntity']['entityName']
-                if entity_id not in entity_dict or entity_dict[entity_id]['timestamp']<ts:
-                    entity_dict[entity_id] = {
-                        'status':w['status'],
-                        'timestamp':ts,
-                        'submission_id':s['submissionId'],
-                        'configuration':s['methodConfigurationName']
-                    }
-                    if 'workflowId' in w:
-                        entity_dict[entity_id]['workflow_id'] = w['workflowId']
-                    else:
-                        entity_dict[entity_id]['workflow_id'] = 'NA'
-        print()
-        status_df = pd.DataFrame(entity_dict).T
+            rows.extend([(w['workflowEntity']['entityName'], w['status'], s['submissionDate'],
+                w.get('workflowId', 'NA'), s['submissionId'], s['methodConfigurationName']) for w in r['workflows']])
+        for s in skipped:
+            print('Skipping {} (incompatible submission entity type: {})'.format(
+                s['submissionId'], s['submissionEntity']['entityType']))
+
+        # keep latest run of each entity (in order of first appearance)
+        values = list(zip(*rows)) if rows else [[]]*6
+        status_df = pd.DataFrame({
+            'status': pd.Categorical(values[1]),
+            'timestamp': parse(list(values[2])),
+            'workflow_id': np.array(values[3], dtype=object),
+            'submission_id': pd.Categorical(values[4]),
+            'configuration': pd.Categorical(values[5]),
+        }, index=pd.Index(values[0], name=etype+'_id'))
+        status_df = status_df.sort_values('timestamp', ascending=False, kind='mergesort')
+        status_df = status_df[~status_df.index.duplicated(keep='first')].reindex(list(dict.fromkeys(values[0])))
         status_df.index.name = etype+'_id'
+        for c in ['status', 'submission_id', 'configuration']:
+            status_df[c] = status_df[c].cat.remove_unused_categories()
 
         return status_df[['status', 'timestamp', 'workflow_id', 'submission_id', 'configuration']]
 
@@ -494,10 +1054,13 @@ class WorkspaceManager(object):
         return self.get_entity_status('sample_set', configuration)
 
 
-    def patch_attributes(self, cnamespace, configuration, dry_run=False, entity='sample'):
+    def patch_attributes(self, cnamespace, configuration, dry_run=False, entity='sample', num_threads=10):
         """
-        Patch attributes for all samples/tasks that run successfully but were not written to database.
+        Patch attributes for all entities/tasks that ran successfully but were not written to database.
         This includes outputs from successful tasks in workflows that failed.
+
+        Only empty attributes are patched. Returns pd.DataFrame listing the
+        attributes that were (or, if dry_run=True, would be) written.
         """
 
         # get list of expected outputs
@@ -507,186 +1070,327 @@ class WorkspaceManager(object):
         output_map = {i.split('.')[-1]:j.split('this.')[-1] for i,j in r['outputs'].items()}
         columns = list(output_map.values())
 
-        if entity=='sample':
-            # get list of all samples in workspace
-            print('Fetching sample status ...')
-            samples_df = self.get_samples()
-            if len(np.intersect1d(columns, samples_df.columns))>0:
-                incomplete_df = samples_df[samples_df[columns].isnull().any(axis=1)]
+        print('Fetching {} status ...'.format(entity))
+        entity_df = self.get_entities(entity).reindex(columns=columns)
+        status_df = self.get_entity_status(entity, configuration)
+
+        # entities with empty attributes that were run with this configuration
+        incomplete_df = entity_df[entity_df.isnull().any(axis=1)]
+        incomplete_df = incomplete_df.loc[incomplete_df.index.intersection(status_df.index[status_df['workflow_id']!='NA'])]
+
+        # make sure successful workflows were all written to database
+        n = (status_df.loc[incomplete_df.index, 'status']=='Succeeded').sum()
+        if n>0:
+            print('Attributes from {} successful jobs were not written to database.'.format(n))
+
+        # for incomplete entities, collect outputs of the workflow or of its completed tasks
+        def fetch(i):
+            try:
+                return self.get_workflow_metadata(status_df.at[i, 'submission_id'], status_df.at[i, 'workflow_id'])
+            except AssertionError:
+                return None
+        metadata = _thread_map(fetch, incomplete_df.index, num_threads=num_threads,
+            desc='Fetching metadata', unit='workflows')
+
+        rows = []
+        for i,m in zip(incomplete_df.index, metadata):
+            if m is None:
+                print('Metadata call failed for {} {}'.format(entity, i))
+            elif 'outputs' in m and len(m['outputs'])!=0:
+                rows.extend([(i, output_map[k.split('.')[-1]], 'workflow', v)
+                    for k,v in m['outputs'].items() if k.split('.')[-1] in output_map])
             else:
-                incomplete_df = pd.DataFrame(index=samples_df.index, columns=columns)
-
-            # get workflow status for all submissions
-            sample_status_df = self.get_sample_status(configuration)
-
-            # make sure successful workflows were all written to database
-            error_ix = incomplete_df.loc[sample_status_df.loc[incomplete_df.index, 'status']=='Succeeded'].index
-            if np.any(error_ix):
-                print('Attributes from {} successful jobs were not written to database.'.format(len(error_ix)))
-
-            # for remainder, assume that if attributes exists, status is successful.
-            # this doesn't work when multiple successful runs of the same task exist --> need to add this
-
-            # for incomplete samples, go through submissions and assign outputs of completed tasks
-            task_counts = defaultdict(int)
-            for n,sample_id in enumerate(incomplete_df.index):
-                print('\rPatching attributes for sample {}/{}'.format(n+1, incomplete_df.shape[0]), end='')
-
-                try:
-                    metadata = self.get_workflow_metadata(sample_status_df.loc[sample_id, 'submission_id'], sample_status_df.loc[sample_id, 'workflow_id'])
-                    if 'outputs' in metadata and len(metadata['outputs'])!=0 and not dry_run:
-                        attr = {output_map[k.split('.')[-1]]:t for k,t in metadata['outputs'].items()}
-                        self.update_sample_attributes(sample_id, attr)
-                    else:
-                        for task in metadata['calls']:
-                            if 'outputs' in metadata['calls'][task][-1]:
-                                if np.all([k in output_map for k in metadata['calls'][task][-1]['outputs'].keys()]):
-                                    # only update if attributes are empty
-                                    if incomplete_df.loc[sample_id, [output_map[k] for k in metadata['calls'][task][-1]['outputs']]].isnull().any():
-                                        # write to attributes
-                                        if not dry_run:
-                                            attr = {output_map[i]:j for i,j in metadata['calls'][task][-1]['outputs'].items()}
-                                            self.update_sample_attributes(sample_id, attr)
-                                        task_counts[task.split('.')[-1]] += 1
-                except:
-                    print('Metadata call failed for sample {}'.format(sample_id))
-                    print(metadata.json())
-            print()
-            for i,j in task_counts.items():
-                print('Samples patched for "{}": {}'.format(i,j))
-
-        elif entity=='sample_set':
-            print('Fetching sample set status ...')
-            sample_set_df = self.get_sample_sets()
-            # get workflow status for all submissions
-            sample_set_status_df = self.get_sample_set_status(configuration)
-
-            # any sample sets with empty attributes for configuration
-            incomplete_df = sample_set_df.loc[sample_set_status_df.index, columns]
-            incomplete_df = incomplete_df[incomplete_df.isnull().any(axis=1)]
-
-            # sample sets with successful jobs
-            error_ix = incomplete_df[sample_set_status_df.loc[incomplete_df.index, 'status']=='Succeeded'].index
-            if np.any(error_ix):
-                print('Attributes from {} successful jobs were not written to database.'.format(len(error_ix)))
-                print('Patching attributes with outputs from latest successful run.')
-                for n,sample_set_id in enumerate(incomplete_df.index):
-                    print('\r  * Patching sample set {}/{}'.format(n+1, incomplete_df.shape[0]), end='')
-                    metadata = self.get_workflow_metadata(sample_set_status_df.loc[sample_set_id, 'submission_id'], sample_set_status_df.loc[sample_set_id, 'workflow_id'])
-                    if 'outputs' in metadata and len(metadata['outputs'])!=0 and not dry_run:
-                        attr = {output_map[k.split('.')[-1]]:t for k,t in metadata['outputs'].items()}
-                        self.update_sample_set_attributes(sample_set_id, attr)
-                print()
-        print('Completed patching {} attributes in {}/{}'.format(entity, self.namespace, self.workspace))
-
-
-    def display_status(self, configuration, entity='sample', filter_active=True):
+                for task,calls in m['calls'].items():
+                    c = calls[-1]
+                    if ('outputs' in c and c.get('shardIndex', -1)==-1
+                            and np.all([k in output_map for k in c['outputs']])):
+                        rows.extend([(i, output_map[k], task.split('.')[-1], v) for k,v in c['outputs'].items()])
+        patch_df = pd.DataFrame(rows, columns=[entity+'_id', 'attribute', 'task', 'value'])
+        patch_df.drop_duplicates([entity+'_id', 'attribute'], keep='last', inplace=True)
+
+        # only patch attributes that are empty
+        isnull_s = incomplete_df.isnull().stack()
+        ix = pd.MultiIndex.from_arrays([patch_df[entity+'_id'], patch_df['attribute']])
+        patch_df = patch_df[isnull_s.reindex(ix).fillna(False).values].reset_index(drop=True)
+
+        for i,j in patch_df.groupby('task')[entity+'_id'].nunique().items():
+            print('{}s {}patched for "{}": {}'.format(entity.capitalize(), 'to be ' if dry_run else '', i, j))
+
+        if not dry_run and patch_df.shape[0]>0:
+            # write entities with the same set of attributes together
+            attr_df = patch_df.pivot(index=entity+'_id', columns='attribute', values='value')
+            attr_sets = attr_df.notnull().dot(attr_df.columns+',')
+            for k,g in attr_df.groupby(attr_sets):
+                self.update_entity_attributes(entity, g[k.rstrip(',').split(',')], num_threads=num_threads)
+            print('Completed patching {} attributes in {}/{}'.format(entity, self.namespace, self.workspace))
+        return patch_df
+
+
+    def display_status(self, configuration, entity='sample', filter_active=True, num_threads=10):
         """
         Display summary of task statuses
-        """
-        # workflow status for each sample (from latest/current run)
-        status_df = self.get_sample_status(configuration)
-
-        # get workflow details from 1st submission
-        metadata = self.get_workflow_metadata(status_df['submission_id'][0], status_df['workflow_id'][0])
 
-        workflow_tasks = list(metadata['calls'].keys())
+        The task status table (see TaskStatus) is kept between calls, so that
+        only metadata of workflows that have not completed is fetched again.
 
+        Returns (state_df, summary_df): status of each task for each entity
+        (scattered tasks summarized across shards), and status counts for each task
+        """
+        # workflow status for each entity (from latest/current run)
+        status_df = self.get_entity_status(entity, configuration)
         print(status_df['status'].value_counts())
         if filter_active:
-            ix = status_df[status_df['status']!='Succeeded'].index
-        else:
-            ix = status_df.index
-
-        state_df = pd.DataFrame(0, index=ix, columns=workflow_tasks)
-        for k,i in enumerate(ix):
-            print('\rFetching metadata for sample {}/{}'.format(k+1, len(ix)), end='')
-            metadata = self.get_workflow_metadata(status_df.loc[i, 'submission_id'], status_df.loc[i, 'workflow_id'])
-            state_df.loc[i] = [metadata['calls'][t][-1]['executionStatus'] if t in metadata['calls'] else 'Waiting' for t in workflow_tasks]
-        print()
-        state_df.rename(columns={i:i.split('.')[1] for i in state_df.columns}, inplace=True)
-        summary_df = pd.concat([state_df[c].value_counts() for c in state_df], axis=1).fillna(0).astype(int)
+            status_df = status_df[status_df['status']!='Succeeded']
+
+        if (entity, configuration) not in self._task_status:
+            self._task_status[(entity, configuration)] = TaskStatus(self, num_threads=num_threads)
+        ts = self._task_status[(entity, configuration)].refresh(status_df[['workflow_id', 'submission_id']])
+
+        state_df = ts.task_states()
+        summary_df = state_df.apply(lambda x: x.value_counts()).fillna(0).astype(int)
         print(summary_df)
-        state_df[['workflow_id', 'submission_id']] = status_df.loc[ix, ['workflow_id', 'submission_id']]
+        state_df[['workflow_id', 'submission_id']] = status_df[['workflow_id', 'submission_id']]
 
         return state_df, summary_df
 
 
-    def get_stderr(self, state_df, task_name):
+    def get_log_paths(self, status_df, tasks=None, log='stderr', failed_only=True,
+                      all_attempts=False, num_threads=10):
         """
-        Fetch stderrs from bucket (returns list of str)
+        Resolve log paths for all tasks and shards of the workflows in status_df
+
+        status_df: pd.DataFrame with columns 'submission_id' and 'workflow_id',
+                   indexed by entity (e.g., from get_entity_status or display_status)
+        tasks: list of task names (default: all tasks)
+        log: 'stderr', 'stdout', or 'log' (backend log)
+        failed_only: only return logs of failed calls
+        all_attempts: return logs for all attempts instead of the last attempt of each shard
+
+        Returns pd.DataFrame indexed by entity, with columns 'workflow_id', 'task',
+        'shard', 'attempt', 'execution_status', 'path'
         """
-        df = state_df[state_df[task_name]==-1]
-        fail_idx = df.index
-        stderrs = []
-        for n,i in enumerate(fail_idx):
-            print('\rFetching stderr for task {}/{}'.format(n+1, len(fail_idx)), end='\r')
-            metadata = self.get_workflow_metadata(state_df.loc[i, 'submission_id'], state_df.loc[i, 'workflow_id'])
-            stderr_path = metadata['calls'][[i for i in metadata['calls'].keys() if i.split('.')[1]==task_name][0]][-1]['stderr']
-            s = subprocess.check_output('gsutil cat '+stderr_path, shell=True).decode()
-            stderrs.append(s)
-        return stderrs
+        status_df = status_df[status_df['workflow_id']!='NA']
+        metadata = self.get_workflows_metadata(status_df['submission_id'], status_df['workflow_id'], num_threads=num_threads)
+        if tasks is not None:
+            tasks = set(tasks)
+
+        ix = []
+        rows = []
+        for i,w,m in zip(status_df.index, status_df['workflow_id'], metadata):
+            for t,calls in m['calls'].items():
+                if tasks is not None and t not in tasks and t.split('.')[-1] not in tasks:
+                    continue
+                if not all_attempts:  # last attempt of each shard
+                    calls = list({c.get('shardIndex', -1):c for c in calls}.values())
+                for c in calls:
+                    if failed_only and c['executionStatus']!='Failed':
+                        continue
+                    path = c.get('backendLogs', {}).get('log') if log=='log' else c.get(log)
+                    if path is not None:
+                        ix.append(i)
+                        rows.append((w, t.split('.')[-1], c.get('shardIndex', -1), c.get('attempt', 1), c['executionStatus'], path))
+        return pd.DataFrame(rows, index=pd.Index(ix, name=status_df.index.name),
+            columns=['workflow_id', 'task', 'shard', 'attempt', 'execution_status', 'path'])
+
+
+    def get_logs(self, status_df, tasks=None, log='stderr', failed_only=True, all_attempts=False,
+                 max_bytes=65536, pattern=None, cache_dir=None, num_threads=10):
+        """
+        Fetch logs (stderr, stdout or backend logs) for all tasks and shards of the
+        workflows in status_df (see get_log_paths), concurrently
 
+        max_bytes: only fetch the last max_bytes of each log (None: entire log)
+        pattern: if set, return lines matching this regular expression (see grep_logs)
+        cache_dir: logs of completed calls are cached in this directory
+                   (default: <cache_dir of the WorkspaceManager>/logs; no caching if neither is set)
 
-    def get_submission_history(self, sample_id, config=None):
+        Returns the output of get_log_paths with the log contents in column 'text'
         """
-        Currently only supports samples
+        log_df = self.get_log_paths(status_df, tasks=tasks, log=log, failed_only=failed_only,
+            all_attempts=all_attempts, num_threads=num_threads)
+
+        if cache_dir is None and self.cache_dir is not None:
+            cache_dir = os.path.join(self.cache_dir, 'logs')
+        if cache_dir is not None:
+            cache_dir = os.path.expanduser(cache_dir)
+        completed = ['Done', 'Failed', 'Aborted', 'RetryableFailure', 'Preempted']
+
+        def fetch(x):
+            path, status = x
+            cache_path = None
+            if cache_dir is not None and status in completed:
+                cache_path = os.path.join(cache_dir, path.replace('gs://', '', 1)+'.{}'.format(max_bytes or 'all'))
+                if os.path.exists(cache_path):
+                    with open(cache_path) as f:
+                        return f.read()
+            try:
+                text = gs_cat(path, max_bytes=max_bytes)
+            except subprocess.CalledProcessError:
+                return None
+            if cache_path is not None:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                with open(cache_path, 'w') as f:
+                    f.write(text)
+            return text
+
+        log_df['text'] = _thread_map(fetch, zip(log_df['path'], log_df['execution_status']), num_threads=num_threads,
+            desc='Fetching logs', unit='logs')
+        n_missing = log_df['text'].isnull().sum()
+        if n_missing>0:
+            print('{} of {} logs could not be fetched.'.format(n_missing, log_df.shape[0]))
+        if pattern is not None:
+            return grep_logs(log_df, pattern)
+        return log_df
+
+
+    def get_stderr(self, state_df, task_name, max_bytes=None):
         """
+        Fetch stderrs of failed tasks from bucket (returns list of str)
+        """
+        df = state_df[state_df[task_name]=='Failed']
+        log_df = self.get_logs(df, tasks=[task_name], log='stderr', max_bytes=max_bytes)
+        return log_df['text'].tolist()
 
-        # filter submissions by configuration
-        submissions = self.list_submissions(config=config)
 
-        # filter by sample
-        submissions = [s for s in submissions if s['submissionEntity']['entityName']==sample_id and 'Succeeded' in list(s['workflowStatuses'].keys())]
+    def get_entity_history(self, etype, entity_ids=None, config=None, num_threads=10):
+        """
+        Get outputs from all successful runs for entities of type etype
+
+        entity_ids: list of entities (default: all entities)
 
-        outputs_df = []
-        for s in submissions:
-            r = self.get_submission(s['submissionId'])
+        Submissions and workflow metadata are fetched concurrently (metadata
+        of completed workflows is cached).
 
-            metadata = self.get_workflow_metadata(s['submissionId'], r['workflows'][0]['workflowId'])
+        Returns long-format pd.DataFrame indexed by (entity_id, run), with
+        columns 'submission_date', 'submission_id', 'workflow_id', 'output', 'value'.
+        Runs are numbered chronologically for each entity (1: oldest run).
+        """
+        submissions = self.list_submissions(config=config)
+        submissions = [s for s in submissions if s['workflowStatuses'].get('Succeeded', 0)>0]
+        submissions = _thread_map(lambda s: (s, self.get_submission(s['submissionId'])), submissions,
+            num_threads=num_threads, desc='Fetching submissions', unit='submissions')
+
+        if entity_ids is not None:
+            entity_ids = set(entity_ids)
+        workflows = [(s['submissionId'], s['submissionDate'], w['workflowEntity']['entityName'], w['workflowId'])
+            for s,r in submissions for w in r['workflows']
+            if w['status']=='Succeeded' and w['workflowEntity']['entityType']==etype
+                and (entity_ids is None or w['workflowEntity']['entityName'] in entity_ids)]
+        metadata = self.get_workflows_metadata([w[0] for w in workflows], [w[3] for w in workflows], num_threads=num_threads)
+
+        # one row per output (workflows without outputs: one row with output/value None)
+        rows = []
+        for (s,d,e,w),m in zip(workflows, metadata):
+            outputs = [(k.split('.',1)[1].replace('.','_'),v) for k,v in m.get('outputs', {}).items()]
+            rows.extend([(e,d,s,w,k,v) for k,v in outputs or [(None, None)]])
+        df = pd.DataFrame(rows, columns=['entity_id', 'submission_date', 'submission_id', 'workflow_id', 'output', 'value'])
+        df['submission_date'] = parse(df['submission_date'])
+        df.sort_values(['entity_id', 'submission_date', 'workflow_id'], inplace=True, kind='mergesort')
+
+        # number runs chronologically (a run is a workflow)
+        new_run = (df['workflow_id']!=df['workflow_id'].shift()).values
+        new_entity = (df['entity_id']!=df['entity_id'].shift()).values
+        run = np.cumsum(new_run)
+        df['run'] = run - np.maximum.accumulate(np.where(new_entity, run-1, 0))
+        df.set_index(['entity_id', 'run'], inplace=True)
+        return df
 
-            outputs_s = pd.Series(metadata['outputs'])
-            outputs_s.index = [i.split('.',1)[1].replace('.','_') for i in outputs_s.index]
-            outputs_s['submission_date'] = iso8601.parse_date(s['submissionDate']).strftime('%H:%M:%S %m/%d/%Y')
-            outputs_df.append(outputs_s)
 
-        outputs_df = pd.concat(outputs_df, axis=1).T
-        # sort by most recent first
-        outputs_df = outputs_df.iloc[np.argsort([datetime.timestamp(iso8601.parse_date(s['submissionDate'])) for s in submissions])[::-1]]
-        outputs_df.index = ['run_{}'.format(str(i)) for i in np.arange(outputs_df.shape[0],0,-1)]
+    def get_submission_history(self, sample_id, config=None):
+        """
+        Get outputs from all successful runs for a sample (most recent first)
 
+        Returns an empty DataFrame if the sample has no successful runs.
+        """
+        df = self.get_entity_history('sample', [sample_id], config=config)
+        if sample_id not in df.index.get_level_values(0):
+            print('No successful runs found for sample {}.'.format(sample_id))
+            return pd.DataFrame(columns=['submission_date'])
+        df = df.loc[sample_id]
+        outputs_df = df[df['output'].notnull()].pivot(columns='output', values='value').reindex(df.index.unique())
+        outputs_df.columns.name = None
+        outputs_df['submission_date'] = format_timestamps(df.groupby(level=0)['submission_date'].first())
+        outputs_df = outputs_df.iloc[::-1]
+        outputs_df.index = ['run_{}'.format(i) for i in outputs_df.index]
         return outputs_df
 
 
-    def get_storage(self):
+    def get_bucket_objects(self, num_threads=10):
+        """List all objects in the workspace bucket, with sizes (see gs_list_objects)"""
+        return gs_list_objects('gs://{}/'.format(self.get_bucket_id()), num_threads=num_threads)
+
+
+    def get_storage(self, num_threads=10):
         """
         Get total amount of storage used, in TB
 
         Pricing: $0.026/GB/month (multi-regional)
                  $0.02/GB/month (regional)
         """
-        bucket_id = self.get_bucket_id()
-        s = subprocess.check_output('gsutil du -s gs://'+bucket_id, shell=True)
-        return np.float64(s.decode().split()[0])/1024**4
+        return self.get_bucket_objects(num_threads=num_threads)['size_bytes'].sum()/1024**4
 
 
-    def get_stats(self, status_df, workflow_name=None):
+    def get_storage_report(self, bucket_df=None, entity_types=None, price_per_gb=0.026, num_threads=10):
+        """
+        Break down storage used in the workspace bucket by entity, attribute,
+        submission and workflow, with monthly cost (price_per_gb: $/GB/month)
+
+        bucket_df: bucket listing (from get_bucket_objects); listed if not provided
+        entity_types: entity types to include (default: all)
+
+        Returns dict of pd.DataFrames: 'entity', 'attribute', 'submission',
+        'workflow', and 'objects' (the bucket listing annotated with
+        submission/workflow IDs and referencing entities)
+        """
+        if bucket_df is None:
+            bucket_df = self.get_bucket_objects(num_threads=num_threads)
+        if entity_types is None:
+            entity_types = list(self.get_entity_types())
+        entity_dfs = _thread_map(self.get_entities, entity_types, num_threads=num_threads)
+        path_df = pd.concat([_entity_paths(t, df) for t,df in zip(entity_types, entity_dfs)]
+            +[_entity_paths(None, pd.DataFrame())], ignore_index=True)  # (non-empty list)
+
+        objects_df = pd.concat([bucket_df.reset_index(drop=True), parse_output_paths(bucket_df['path'])], axis=1)
+        ref_df = path_df.merge(objects_df[['path', 'size_bytes']], on='path', how='inner')
+        objects_df['referenced'] = objects_df['path'].isin(ref_df['path'])
+
+        def summarize(df, by):
+            df = df.groupby(by)['size_bytes'].agg(['count', 'sum'])
+            df.columns = ['files', 'size_bytes']
+            df['size_gb'] = df['size_bytes']/1024**3
+            df['cost_per_month'] = df['size_gb']*price_per_gb
+            return df.sort_values('size_bytes', ascending=False)
+
+        report = {
+            'entity': summarize(ref_df, ['entity_type', 'entity_id']),
+            'attribute': summarize(ref_df, ['entity_type', 'attribute']),
+            'submission': summarize(objects_df, 'submission_id'),
+            'workflow': summarize(objects_df, ['submission_id', 'workflow_name', 'workflow_id']),
+            'objects': objects_df,
+        }
+        total_gb = objects_df['size_bytes'].sum()/1024**3
+        print('Total storage: {:.2f} TB (${:.2f}/month); {:.2f} TB referenced by entity attributes.'.format(
+            total_gb/1024, total_gb*price_per_gb, objects_df.loc[objects_df['referenced'], 'size_bytes'].sum()/1024**4))
+        return report
+
+
+    def get_stats(self, status_df, workflow_name=None, num_threads=10, max_retries=5):
         """
         For a list of submissions, calculate time, preemptions, etc
         """
-        # for successful jobs, get metadata and count attempts
+        # for successful jobs, get metadata (concurrently) and count attempts
         status_df = status_df[status_df['status']=='Succeeded'].copy()
-        metadata_dict = {}
-        for k,(i,row) in enumerate(status_df.iterrows()):
-            print('\rFetching metadata {}/{}'.format(k+1,status_df.shape[0]), end='')
-            fetch = True
-            while fetch:  # improperly dealing with 500s here...
+        def fetch(x):
+            for k in range(max_retries):
                 try:
-                    metadata = self.get_workflow_metadata(row['submission_id'], row['workflow_id'])
-                    metadata_dict[i] = metadata.json()
-                    fetch = False
-                except:
-                    pass
+                    return self.get_workflow_metadata(*x)
+                except AssertionError:  # retry on server errors
+                    if k==max_retries-1:
+                        raise
+                    record_retry('firecloud.get_workflow_metadata')
+        metadata_dict = dict(zip(status_df.index, _thread_map(fetch,
+            zip(status_df['submission_id'], status_df['workflow_id']), num_threads=num_threads,
+            desc='Fetching metadata', unit='workflows')))
 
         # if workflow_name is None:
             # split output by workflow
@@ -694,76 +1398,76 @@ class WorkspaceManager(object):
         # else:
             # workflows = np.array([workflow_name])
 
+        # all call attempts (timestamps are parsed in bulk)
+        attempts_df = _flatten_calls(metadata_dict)
+        attempts_df['task'] = attempts_df['task'].astype(object)
+        keys = ['key', 'task']
+        g = attempts_df.groupby(keys+['shard'], sort=False, observed=True)
+        attempts_df['first_pos'] = g['pos'].transform('first')
+        is_success = (g.cumcount(ascending=False)==0).values  # last attempt of each shard (assume success follows preemptions)
+        g = attempts_df.groupby(keys, sort=False, observed=True)
+        is_first = (g.cumcount()==0).values
+        is_last = (g.cumcount(ascending=False)==0).values
+
+        machine_types = attempts_df['machine_type'].astype(object)
+        ix = machine_types.notnull().values
+        attempts_df['cost'] = np.nan
+        attempts_df.loc[ix, 'cost'] = [get_vm_cost(m,p)*h for m,p,h in zip(machine_types[ix],
+            attempts_df.loc[ix, 'preemptible'], attempts_df.loc[ix, 'time_h'])]
+
+        # statistics for each task of each workflow
+        success_df = attempts_df[is_success]
+        quota_h = success_df.groupby(keys, sort=False, observed=True)['quota_h'].sum()  # time spent waiting for quota
+        stats_df = pd.DataFrame({
+            'time_h': _group_agg(success_df, 'time_h', keys, 'sum') - quota_h,
+            'total_time_h': _group_agg(attempts_df, 'time_h', keys, 'sum') - quota_h,
+            'max_preempt_time_h': _group_agg(attempts_df[~is_success], 'time_h', keys, 'max'),
+            'machine_type': attempts_df[is_last].set_index(keys)['machine_type'],
+            'attempts': g.size().astype(np.float64),
+            'start_time': attempts_df[is_first].set_index(keys)['start'],
+            'est_cost': _group_agg(attempts_df, 'cost', keys, 'sum'),
+            'job_ids': success_df.sort_values('first_pos', kind='mergesort').groupby(keys, sort=False,
+                observed=True)['job_id'].agg(lambda x: ','.join(x) if x.notnull().all() else None),
+        })
+        # call cache hits: only report time
+        hit_s = g['hit'].any().reindex(stats_df.index)
+        stats_df.loc[hit_s.values, ['max_preempt_time_h', 'attempts', 'est_cost']] = np.nan
+        stats_df.loc[hit_s.values, ['machine_type', 'start_time', 'job_ids']] = None
+        stats_df['start_time'] = to_local(pd.to_datetime(stats_df['start_time'], utc=True), self.timezone)
+        stats_df['machine_type'] = stats_df['machine_type'].astype('category')
+
         # get tasks for each workflow
+        columns = ['time_h', 'total_time_h', 'max_preempt_time_h', 'machine_type', 'attempts', 'start_time', 'est_cost', 'job_ids']
         for w in np.unique(workflows):
-            workflow_status_df = status_df[workflows==w]
+            workflow_status_df = status_df[workflows==w].copy()
             tasks = np.sort(list(metadata_dict[workflow_status_df.index[0]]['calls'].keys()))
-            task_names = [t.rsplit('.')[-1] for t in tasks]
-
-            task_dfs = {}
-            for t in tasks:
-                task_name = t.rsplit('.')[-1]
-                task_dfs[task_name] = pd.DataFrame(index=workflow_status_df.index,
-                    columns=[
-                        'time_h',
-                        'total_time_h',
-                        'max_preempt_time_h',
-                        'machine_type',
-                        'attempts',
-                        'start_time',
-                        'est_cost',
-                        'job_ids'])
-                for i in workflow_status_df.index:
-                    successes = {}
-                    preemptions = []
-
-                    if 'shardIndex' in metadata_dict[i]['calls'][t][0]:
-                        scatter = True
-                        for j in metadata_dict[i]['calls'][t]:
-                            if j['shardIndex'] in successes:
-                                preemptions.append(j)
-                            # last shard (assume success follows preemptions)
-                            successes[j['shardIndex']] = j
-                    else:
-                        scatter = False
-                        successes[0] = metadata_dict[i]['calls'][t][-1]
-                        preemptions = metadata_dict[i]['calls'][t][:-1]
-
-                    task_dfs[task_name].loc[i, 'time_h'] = np.sum([workflow_time(j)/3600 for j in successes.values()])
-
-                    # subtract time spent waiting for quota
-                    quota_time = [e for m in successes.values() for e in m['executionEvents'] if e['description']=='waiting for quota']
-                    quota_time = [(convert_time(q['endTime']) - convert_time(q['startTime']))/3600 for q in quota_time]
-                    task_dfs[task_name].loc[i, 'time_h'] -= np.sum(quota_time)
-
-                    total_time_h = [workflow_time(t_attempt)/3600 for t_attempt in metadata_dict[i]['calls'][t]]
-                    task_dfs[task_name].loc[i, 'total_time_h'] = np.sum(total_time_h) - np.sum(quota_time)
-
-                    if not np.any(['hit' in j['callCaching'] and j['callCaching']['hit'] for j in metadata_dict[i]['calls'][t]]):
-                        was_preemptible = [j['preemptible'] for j in metadata_dict[i]['calls'][t]]
-                        if len(preemptions)>0:
-                            assert was_preemptible[0]
-                            task_dfs[task_name].loc[i, 'max_preempt_time_h'] = np.max([workflow_time(t_attempt) for t_attempt in preemptions])/3600
-                        task_dfs[task_name].loc[i, 'attempts'] = len(metadata_dict[i]['calls'][t])
-
-                        task_dfs[task_name].loc[i, 'start_time'] = iso8601.parse_date(metadata_dict[i]['calls'][t][0]['start']).astimezone(pytz.timezone(self.timezone)).strftime('%H:%M')
-
-                        machine_types = [j['jes']['machineType'].rsplit('/')[-1] for j in metadata_dict[i]['calls'][t]]
-                        task_dfs[task_name].loc[i, 'machine_type'] = machine_types[-1]  # use last instance
-
-                        task_dfs[task_name].loc[i, 'est_cost'] = np.sum([get_vm_cost(m,p)*h for h,m,p in zip(total_time_h, machine_types, was_preemptible)])
-
-                        task_dfs[task_name].loc[i, 'job_ids'] = ','.join([j['jobId'] for j in successes.values()])
+            task_dfs = {t.rsplit('.')[-1]:stats_df.xs(t, level='task').reindex(workflow_status_df.index)[columns] for t in tasks}
 
             # add overall cost
             workflow_status_df['est_cost'] = pd.concat([task_dfs[t.rsplit('.')[-1]]['est_cost'] for t in tasks], axis=1).sum(axis=1)
-            workflow_status_df['time_h'] = [workflow_time(metadata_dict[i])/3600 for i in workflow_status_df.index]
-            workflow_status_df['cpu_hours'] = pd.concat([task_dfs[t.rsplit('.')[-1]]['total_time_h'] * task_dfs[t.rsplit('.')[-1]]['machine_type'].apply(lambda i: int(i.rsplit('-',1)[-1]) if (pd.notnull(i) and '-small' not in i and '-micro' not in i) else 1) for t in tasks], axis=1).sum(axis=1)
-            workflow_status_df['start_time'] = [iso8601.parse_date(metadata_dict[i]['start']).astimezone(pytz.timezone(self.timezone)).strftime('%H:%M') for i in workflow_status_df.index]
+            metadata = [metadata_dict[i] for i in workflow_status_df.index]
+            workflow_status_df['time_h'] = elapsed([m['start'] for m in metadata], [m.get('end') for m in metadata])/3600
+            workflow_status_df['cpu_hours'] = pd.concat([task_dfs[t.rsplit('.')[-1]]['total_time_h']
+                * _machine_cpus(task_dfs[t.rsplit('.')[-1]]['machine_type']) for t in tasks], axis=1).sum(axis=1)
+            workflow_status_df['start_time'] = to_local(parse([m['start'] for m in metadata]), self.timezone)
 
         return workflow_status_df, task_dfs
 
 
+    def get_call_analytics(self, status_df, num_threads=10, max_preemptible=5, max_retries=3):
+        """
+        Call-caching, preemption and retry analytics for the workflows in status_df
+        (e.g., from get_entity_status), with suggested 'preemptible' and 'maxRetries'
+        runtime attributes for each task (see analytics.py)
+
+        Returns dict of pd.DataFrames: 'attempts', 'cache', 'preemption', 'retries', 'suggestions'
+        """
+        status_df = status_df[status_df['workflow_id']!='NA']
+        metadata = self.get_workflows_metadata(status_df['submission_id'], status_df['workflow_id'], num_threads=num_threads)
+        return call_report(_flatten_calls(dict(zip(status_df.index, metadata))),
+            max_preemptible=max_preemptible, max_retries=max_retries)
+
+
     def publish_config(self, from_cnamespace, from_config, to_cnamespace, to_config, public=False):
         """Copy configuration to repository"""
         # check whether prior version exists
@@ -818,24 +1522,108 @@ class WorkspaceManager(object):
         return r.json()
 
 
-    def get_entities(self, etype, page_size=1000):
-        """Paginated query replacing get_entities_tsv()"""
-        # get first page
-        r = self._get_entities_query(etype, 1, page_size=page_size)
+    def iter_entities(self, etype, page_size=1000, num_threads=4, prefetch=8):
+        """
+        Iterate over entities page by page
 
-        # get additional pages
+        Yields one DataFrame per page (same format as get_entities). Pages are
+        fetched concurrently, but at most 'prefetch' pages are read ahead of
+        the consumer, so memory use does not grow with the number of entities.
+        """
+        r = self._get_entities_query(etype, 1, page_size=page_size)
         total_pages = r['resultMetadata']['filteredPageCount']
-        all_entities = r['results']
-        for page in range(2,total_pages+1):
-            r = self._get_entities_query(etype, page, page_size=page_size)
-            all_entities.extend(r['results'])
+        futures = deque([Future()])
+        futures[0].set_result(r)
+        del r
+        with ThreadPoolExecutor(max_workers=max(num_threads, 1)) as executor:
+            try:
+                for page in range(2, total_pages+1):
+                    futures.append(executor.submit(self._get_entities_query, etype, page, page_size=page_size))
+                    if len(futures)>=prefetch:  # read-ahead queue is full
+                        yield _entity_page(etype, futures.popleft().result()['results'])
+                while futures:
+                    yield _entity_page(etype, futures.popleft().result()['results'])
+            finally:  # cancel pending requests if the consumer stops early
+                for f in futures:
+                    f.cancel()
+
+
+    def get_entity_changes(self, etype, path=None, update=True, page_size=1000, num_threads=4):
+        """
+        Changes to entities since the last snapshot (see snapshots.py)
+
+        Entity attributes are hashed page by page, compared with the previous
+        snapshot, and (if update=True) saved as the new snapshot. All entities
+        are reported as added if there is no previous snapshot.
+
+        path: snapshot file (default: <cache_dir or ~/.dalmatian>/snapshots/<namespace>/<workspace>/<etype>.json)
+
+        Returns pd.DataFrame with columns 'entity_id', 'attribute', 'change'
+        (see snapshots.diff_snapshots)
+        """
+        if path is None:
+            path = os.path.join(os.path.expanduser(self.cache_dir or '~/.dalmatian'), 'snapshots',
+                self.namespace, self.workspace, etype+'.json')
+        hash_df = concat_hashes(hash_entities(df) for df in
+            self.iter_entities(etype, page_size=page_size, num_threads=num_threads))
+        if os.path.exists(path):
+            previous_df = load_snapshot(path)
+        else:
+            previous_df = pd.DataFrame(index=pd.Index([], name=etype+'_id'), dtype=np.uint64)
+        changes_df = diff_snapshots(previous_df, hash_df)
+        if update:
+            save_snapshot(hash_df, path, etype=etype)
+        return changes_df
+
 
-        # convert to DataFrame
-        df = pd.DataFrame({i['name']:i['attributes'] for i in all_entities}).T
+    def get_entities(self, etype, page_size=1000, num_threads=10):
+        """Paginated query replacing get_entities_tsv()"""
+        df = pd.concat(list(self.iter_entities(etype, page_size=page_size,
+            num_threads=num_threads, prefetch=2*num_threads)), sort=False)
         df.index.name = etype+'_id'
         return df
 
 
+    def export_entities(self, etype, path, fmt=None, page_size=1000, num_threads=4, prefetch=8):
+        """
+        Export entities to Parquet or JSON lines, writing one page at a time
+
+        fmt: 'parquet' or 'jsonl' (default: inferred from the file extension)
+
+        Each page is written as a Parquet row group (requires pyarrow) or as
+        JSON lines. Entity references are exported as entity IDs; in Parquet,
+        all attributes are strings (lists are JSON-encoded), since attribute
+        types are not fixed across entities.
+        Returns the number of exported entities.
+        """
+        if fmt is None:
+            fmt = 'parquet' if path.endswith('.parquet') else 'jsonl'
+        assert fmt in ['parquet', 'jsonl']
+        columns = [etype+'_id']+self.get_entity_types()[etype]['attributeNames']
+        n = 0
+        if fmt=='parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(c, pa.string()) for c in columns])
+            with pq.ParquetWriter(path, schema) as writer:
+                for df in self.iter_entities(etype, page_size=page_size, num_threads=num_threads, prefetch=prefetch):
+                    arrays = [pa.array(df.index.tolist(), type=pa.string())]
+                    for c in columns[1:]:
+                        values = df[c].tolist() if c in df else [None]*df.shape[0]
+                        arrays.append(pa.array([_export_value(v, as_string=True) for v in values], type=pa.string()))
+                    writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                    n += df.shape[0]
+        else:
+            with open(path, 'w') as f:
+                for df in self.iter_entities(etype, page_size=page_size, num_threads=num_threads, prefetch=prefetch):
+                    df = df.reindex(columns=columns[1:])
+                    for i,row in zip(df.index, df.itertuples(index=False, name=None)):
+                        f.write(json.dumps(dict(zip(columns, [i]+[_export_value(v) for v in row])))+'\n')
+                    n += df.shape[0]
+        print('{} {}s exported to {}'.format(n, etype, path))
+        return n
+
+
     def get_samples(self):
         """Get DataFrame with samples and their attributes"""
         df = self.get_entities('sample')
@@ -881,65 +1669,76 @@ class WorkspaceManager(object):
     #-------------------------------------------------------------------------
     #  Methods for updating entities
     #-------------------------------------------------------------------------
-    def update_sample_set(self, sample_set_id, sample_ids):
-        """Update (or create) a sample set"""
-        r = firecloud.api.get_entity(self.namespace, self.workspace, 'sample_set', sample_set_id)
-        if r.status_code==200:  # exists -> update
-            r = r.json()
-            items_dict = r['attributes']['samples']
-            items_dict['items'] = [{'entityName': i, 'entityType': 'sample'} for i in sample_ids]
-            attrs = [{'addUpdateAttribute': items_dict, 'attributeName': 'samples', 'op': 'AddUpdateAttribute'}]
-            r = firecloud.api.update_entity(self.namespace, self.workspace, 'sample_set', sample_set_id, attrs)
-            if r.status_code==200:
-                print('Sample set "{}" ({} samples) successfully updated.'.format(sample_set_id, len(sample_ids)))
-            else:
-                print(r.text)
-        else:  # create
-            set_df = pd.DataFrame(data=np.c_[[sample_set_id]*len(sample_ids), sample_ids], columns=['membership:sample_set_id', 'sample_id'])
+    def update_sets(self, set_type, sets):
+        """
+        Create or update sets in bulk
+
+        set_type: 'sample_set', 'pair_set' or 'participant_set'
+        sets: dict {set_id: member_ids}
+
+        Existing memberships are retrieved with a single paginated query and
+        only changes are applied: new sets are created with one membership
+        TSV import, and sets with changed membership are updated with
+        (chunked) batchUpdate calls.
+
+        Returns pd.DataFrame with the action taken for each set.
+        """
+        etype = set_type.rsplit('_set', 1)[0]
+        attr = etype+'s'
+        set_df = self.get_entities(set_type)
+        existing = {}
+        if attr in set_df:
+            existing = {i:[m['entityName'] for m in v['items']] for i,v in set_df[attr].items() if isinstance(v, dict)}
+
+        sets = {i:list(j) for i,j in sets.items()}
+        new_sets = [i for i in sets if i not in existing]
+        changed_sets = [i for i in sets if i in existing and set(sets[i])!=set(existing[i])]
+        report_df = pd.DataFrame(index=pd.Index(list(sets), name=set_type+'_id'))
+        report_df['members'] = [len(j) for j in sets.values()]
+        report_df['action'] = 'unchanged'
+
+        # create new sets
+        empty_sets = [i for i in new_sets if len(sets[i])==0]
+        if empty_sets:
+            print('Skipping {} new sets without members.'.format(len(empty_sets)))
+            report_df.loc[empty_sets, 'action'] = 'skipped'
+            new_sets = [i for i in new_sets if len(sets[i])>0]
+        if new_sets:
+            set_df = pd.DataFrame([(i,m) for i in new_sets for m in sets[i]],
+                columns=['membership:{}_id'.format(set_type), '{}_id'.format(etype)])
             buf = io.StringIO()
             set_df.to_csv(buf, sep='\t', index=False)
             r = firecloud.api.upload_entities(self.namespace, self.workspace, buf.getvalue())
             buf.close()
             assert r.status_code==200
-            print('Sample set "{}" ({} samples) successfully created.'.format(sample_set_id, len(sample_ids)))
+            report_df.loc[new_sets, 'action'] = 'created'
+            print('Successfully created {} {}s.'.format(len(new_sets), set_type))
+
+        # update sets with changed membership
+        if changed_sets:
+            attr_s = pd.Series({i:{
+                'itemsType': 'EntityReference',
+                'items': [{'entityType': etype, 'entityName': m} for m in sets[i]]
+            } for i in changed_sets}, name=attr)
+            self.update_entity_attributes(set_type, attr_s)
+            report_df.loc[changed_sets, 'action'] = 'updated'
+            print('Successfully updated {} {}s.'.format(len(changed_sets), set_type))
+        return report_df
+
+
+    def update_sample_set(self, sample_set_id, sample_ids):
+        """Update (or create) a sample set"""
+        self.update_sets('sample_set', {sample_set_id: sample_ids})
 
 
     def update_pair_set(self, pair_set_id, pair_ids):
         """Update (or create) a pair set"""
-        r = firecloud.api.get_entity(self.namespace, self.workspace, 'pair_set_id', pair_set_id)
-        if r.status_code==200:  # exists -> update
-            r = r.json()
-            items_dict = r['attributes']['pairs']
-            items_dict['items'] = [{'entityName': i, 'entityType': 'pair'} for i in pair_ids]
-            attrs = [{'addUpdateAttribute': items_dict, 'attributeName': 'pairs', 'op': 'AddUpdateAttribute'}]
-            r = firecloud.api.update_entity(self.namespace, self.workspace, 'pair_set', pair_set_id, attrs)
-            if r.status_code==200:
-                print('Pair set "{}" ({} pairs) successfully updated.'.format(pair_set_id, len(pair_ids)))
-            else:
-                print(r.text)
-        else:  # create
-            set_df = pd.DataFrame(data=np.c_[[pair_set_id]*len(pair_ids), pair_ids], columns=['membership:pair_set_id', 'pair_id'])
-            buf = io.StringIO()
-            set_df.to_csv(buf, sep='\t', index=False)
-            r = firecloud.api.upload_entities(self.namespace, self.workspace, buf.getvalue())
-            buf.close()
-            assert r.status_code==200
-            print('Pair set "{}" ({} pairs) successfully created.'.format(pair_set_id, len(pair_ids)))
+        self.update_sets('pair_set', {pair_set_id: pair_ids})
 
 
     def update_participant_set(self, participant_set_id, participant_ids):
         """Update (or create) a participant set"""
-        r = firecloud.api.get_entity(self.namespace, self.workspace, 'participant_set', participant_set_id)
-        if r.status_code==200:  # exists -> update
-            raise ValueError('not implemented')
-        else:  # create
-            set_df = pd.DataFrame(data=np.c_[[participant_set_id]*len(participant_ids), participant_ids], columns=['membership:participant_set_id', 'participant_id'])
-            buf = io.StringIO()
-            set_df.to_csv(buf, sep='\t', index=False)
-            r = firecloud.api.upload_entities(self.namespace, self.workspace, buf.getvalue())
-            buf.close()
-            assert r.status_code==200
-            print('Participant set "{}" ({} participants) successfully created.'.format(participant_set_id, len(participant_ids)))
+        self.update_sets('participant_set', {participant_set_id: participant_ids})
 
 
     def update_super_set(self, super_set_id, sample_set_ids, sample_ids):
@@ -1033,6 +1832,144 @@ class WorkspaceManager(object):
         print('Pair set "{}" successfully deleted.'.format(pair_set_id))
 
 
+    def get_entity_types(self):
+        """Get entity types in the workspace, with counts and attribute names"""
+        r = firecloud.api.list_entity_types(self.namespace, self.workspace)
+        assert r.status_code==200
+        return r.json()
+
+
+    def plan_deletion(self, etype, entity_ids, delete_files=False, num_threads=10):
+        """
+        Work out all changes required to delete entities:
+          - entities referencing a deleted entity (e.g., samples of a deleted
+            participant) are deleted
+          - sets whose members are all deleted are deleted
+          - deleted entities are removed from other lists of references
+            (e.g., set memberships)
+          - if delete_files=True, files in the workspace bucket that are only
+            referenced by deleted entities are deleted
+
+        Deletions are ordered in stages such that referencing entities are
+        deleted first (e.g., sets, then pairs, then samples, then participants).
+
+        Returns pd.DataFrame with columns 'entity_type', 'entity_id', 'action'
+        ('update', 'delete', 'delete_file'), 'attribute', 'value', 'stage'
+        """
+        entity_types = list(self.get_entity_types())
+        entity_dfs = dict(zip(entity_types, _thread_map(self.get_entities, entity_types, num_threads=num_threads)))
+        ref_df = pd.concat([_entity_references(t, entity_dfs[t]) for t in entity_types]
+            +[_entity_references(etype, pd.DataFrame())], ignore_index=True)  # (non-empty list)
+        ref_df['is_list'] = ref_df['is_list'].astype(bool)
+        src_ix = pd.MultiIndex.from_arrays([ref_df['entity_type'], ref_df['entity_id']])
+        ref_ix = pd.MultiIndex.from_arrays([ref_df['ref_type'], ref_df['ref_id']])
+        is_required, is_membership = _required_references(ref_df)
+
+        # add dependent entities until no more are found
+        delete_ix = pd.MultiIndex.from_arrays([[etype]*len(entity_ids), list(entity_ids)])
+        while True:
+            ref_deleted = ref_ix.isin(delete_ix)
+            # entities with a (non-list) reference to a deleted entity
+            dependent_ix = src_ix[ref_deleted & ~ref_df['is_list'].values]
+            # sets with all members deleted
+            s = pd.Series(ref_deleted, index=src_ix)[is_membership]
+            s = s.groupby(level=[0,1]).all()
+            dependent_ix = dependent_ix.append(s.index[s.values])
+            n = len(delete_ix)
+            delete_ix = delete_ix.append(dependent_ix).unique()
+            if len(delete_ix)==n:
+                break
+        src_deleted = src_ix.isin(delete_ix)
+
+        # remove deleted entities from lists of references; this includes lists of
+        # deleted entities that do not determine the order of deletion (e.g., participant.samples_)
+        update_df = ref_df[ref_df['is_list'].values & ~(src_deleted & is_required)]
+        rows = []
+        for (t,i,a),g in update_df.groupby(['entity_type', 'entity_id', 'attribute']):
+            keep = ~ref_ix[g.index].isin(delete_ix)
+            if keep.all():
+                continue
+            rows.append((t, i, 'update', a, {
+                'itemsType': 'EntityReference',
+                'items': [{'entityType':u, 'entityName':v} for u,v in zip(g['ref_type'][keep], g['ref_id'][keep])]
+            }, 0))
+
+        # order entity types: referencing types first (TSV references and set memberships)
+        deleted_refs = ref_df[src_deleted & ref_ix.isin(delete_ix) & is_required]
+        type_order = _sort_entity_types(delete_ix.get_level_values(0).unique(),
+            zip(deleted_refs['entity_type'], deleted_refs['ref_type']))
+
+        # within an entity type, entities referencing entities of the same type go first
+        self_ref_ix = src_ix[src_deleted & ref_ix.isin(delete_ix) & (ref_df['entity_type']==ref_df['ref_type']).values].unique()
+        stage = 1
+        for t in type_order:
+            ids = delete_ix[delete_ix.get_level_values(0)==t]
+            for ix in [ids[ids.isin(self_ref_ix)], ids[~ids.isin(self_ref_ix)]]:
+                if len(ix)>0:
+                    rows.extend([(t, i, 'delete', None, None, stage) for i in ix.get_level_values(1)])
+                    stage += 1
+
+        # files only referenced by deleted entities
+        if delete_files:
+            prefix = 'gs://{}/'.format(self.get_bucket_id())
+            path_df = pd.concat([_entity_paths(t, entity_dfs[t]) for t in entity_types], ignore_index=True)
+            path_df = path_df[path_df['path'].str.startswith(prefix)]
+            path_deleted = pd.MultiIndex.from_arrays([path_df['entity_type'], path_df['entity_id']]).isin(delete_ix)
+            path_df = path_df[path_deleted & ~path_df['path'].isin(path_df['path'][~path_deleted])]
+            path_df = path_df.drop_duplicates('path')
+            rows.extend([(t, i, 'delete_file', a, p, stage)
+                for t,i,a,p in zip(path_df['entity_type'], path_df['entity_id'], path_df['attribute'], path_df['path'])])
+
+        return pd.DataFrame(rows, columns=['entity_type', 'entity_id', 'action', 'attribute', 'value', 'stage'])
+
+
+    def delete_entities(self, etype, entity_ids, delete_files=False, dry_run=False, chunk_size=500, num_threads=10):
+        """
+        Delete entities together with their dependent entities (see plan_deletion)
+
+        Deletions are sent in chunks of chunk_size entities, concurrently within
+        each stage. If dry_run=True, only the plan is computed.
+
+        Returns the deletion plan (pd.DataFrame)
+        """
+        plan_df = self.plan_deletion(etype, entity_ids, delete_files=delete_files, num_threads=num_threads)
+        counts = plan_df.groupby(['action', 'entity_type']).size()
+        print('{}:'.format('Deletion plan' if dry_run else 'Deleting'))
+        for (a,t),n in counts.items():
+            print('  * {}: {} {}{}'.format(a, n, t, ' files' if a=='delete_file' else 's'))
+        if dry_run:
+            return plan_df
+
+        # 1) remove deleted entities from lists of references
+        update_df = plan_df[plan_df['action']=='update']
+        for (t,a),g in update_df.groupby(['entity_type', 'attribute']):
+            self.update_entity_attributes(t, pd.Series(g['value'].values, index=g['entity_id'].values, name=a), num_threads=num_threads)
+
+        # 2) delete entities, stage by stage
+        def send(chunk):
+            r = firecloud.api.delete_entities(self.namespace, self.workspace, chunk)
+            return r.status_code, r.text
+        delete_df = plan_df[plan_df['action']=='delete']
+        for k,g in delete_df.groupby('stage'):
+            entities = [{'entityType':t, 'entityName':i} for t,i in zip(g['entity_type'], g['entity_id'])]
+            chunks = [entities[i:i+chunk_size] for i in range(0, len(entities), chunk_size)]
+            status = _thread_map(send, chunks, num_threads=num_threads, desc='Deleting entities', unit='chunks')
+            failed = [i for i in status if i[0]!=204]
+            if failed:
+                for i in failed:
+                    print(i[1])
+                raise ValueError('Deletion failed for {} of {} chunks in stage {}.'.format(len(failed), len(chunks), k))
+            print('  * deleted {} {}s'.format(g.shape[0], '/'.join(g['entity_type'].unique())))
+
+        # 3) delete files
+        file_df = plan_df[plan_df['action']=='delete_file']
+        if file_df.shape[0]>0:
+            print('Deleting {} files'.format(file_df.shape[0]))
+            gs_delete(file_df['value'].tolist())
+        print('Successfully deleted {} entities from {}/{}'.format(delete_df.shape[0], self.namespace, self.workspace))
+        return plan_df
+
+
     #-------------------------------------------------------------------------
     #  
     #-------------------------------------------------------------------------
@@ -1048,7 +1985,7 @@ class WorkspaceManager(object):
         Delete outdated files matching attribute (e.g., from prior/outdated runs)
         """
         if bucket_files is None:
-            bucket_files = gs_list_bucket_files(self.get_bucket_id())
+            bucket_files = self.get_bucket_objects()['path'].tolist()
 
         if samples_df is None:
             samples_df = self.get_samples()
@@ -1066,7 +2003,8 @@ class WorkspaceManager(object):
             assert len(ext)==1
             ext = ext[0]
 
-        purge_paths = [i for i in bucket_files if i.endswith(ext) and i not in set(samples_df[attribute])]
+        current_paths = set(samples_df[attribute])
+        purge_paths = [i for i in bucket_files if i.endswith(ext) and i not in current_paths]
         if len(purge_paths)==0:
             print('No outdated files to purge.')
         else:
@@ -1083,7 +2021,176 @@ class WorkspaceManager(object):
                 gs_delete(purge_paths, chunk_size=500)
 
 
-    def update_entity_attributes(self, etype, attrs):
+    def _active_submission_ids(self):
+        """IDs of submissions that have not completed (outputs may still be written)"""
+        return set([s['submissionId'] for s in self.list_submissions() if s['status'] not in ['Done', 'Aborted']])
+
+
+    def find_orphaned_outputs(self, bucket_df=None, entity_types=None, exclude_logs=False, num_threads=10):
+        """
+        Find workflow outputs in the bucket that are not referenced by any
+        entity attribute (of any type) or workspace attribute
+
+        bucket_df: bucket listing (from get_bucket_objects); listed if not provided
+        entity_types: entity types to index (default: all)
+        exclude_logs: exclude Cromwell logs and scripts (stdout, stderr, *.log, ...)
+
+        Returns (orphan_df, summary_df):
+          orphan_df:  unreferenced files in directories of completed submissions,
+                      with submission ID, workflow ID, task and size
+          summary_df: number of files and size by submission and task
+                      (task 'other': files outside of task directories)
+        """
+        if bucket_df is None:
+            bucket_df = self.get_bucket_objects(num_threads=num_threads)
+        if entity_types is None:
+            entity_types = list(self.get_entity_types())
+
+        # index all files referenced by entities and the workspace
+        entity_dfs = _thread_map(self.get_entities, entity_types, num_threads=num_threads)
+        referenced = set()
+        for t,df in zip(entity_types, entity_dfs):
+            referenced.update(_entity_paths(t, df)['path'])
+        for v in self.get_attributes().values():
+            if isinstance(v, str):
+                referenced.add(v)
+            elif isinstance(v, dict) and 'items' in v:
+                referenced.update([i for i in v['items'] if isinstance(i, str)])
+
+        # outputs of submissions that have not completed are not referenced yet
+        active = self._active_submission_ids()
+        orphan_df = pd.concat([bucket_df.reset_index(drop=True), parse_output_paths(bucket_df['path'])], axis=1)
+        orphan_df = orphan_df[orphan_df['submission_id'].notnull() & ~orphan_df['submission_id'].isin(active)
+            & ~orphan_df['path'].isin(referenced)]
+        if exclude_logs:
+            filename = orphan_df['path'].str.rsplit('/', n=1).str[-1]
+            is_log = filename.isin(['stdout', 'stderr', 'rc', 'script', 'script.submit', 'exec.sh',
+                'gcs_localization.sh', 'gcs_delocalization.sh', 'gcs_transfer.sh']) | filename.str.endswith('.log')
+            orphan_df = orphan_df[~is_log]
+        orphan_df = orphan_df.reset_index(drop=True)
+
+        # files outside of task directories are counted as task 'other'
+        summary_df = orphan_df.assign(task=orphan_df['task'].fillna('other')).groupby(
+            ['submission_id', 'task'])['size_bytes'].agg(['count', 'sum'])
+        summary_df.columns = ['files', 'size_bytes']
+        summary_df['size_gb'] = summary_df['size_bytes']/1024**3
+        summary_df = summary_df.sort_values('size_bytes', ascending=False)
+        print('{} unreferenced outputs ({:.2f} GB) in {} submissions.'.format(
+            orphan_df.shape[0], orphan_df['size_bytes'].sum()/1024**3, orphan_df['submission_id'].nunique()))
+        return orphan_df, summary_df
+
+
+    def delete_orphaned_outputs(self, orphan_df, chunk_size=500, num_threads=10):
+        """
+        Delete unreferenced outputs (from find_orphaned_outputs), concurrently in chunks
+        """
+        # orphan_df may have been generated from an outdated listing or submission status
+        active = orphan_df['submission_id'].isin(self._active_submission_ids())
+        if active.any():
+            print('Skipping {} files of active submissions.'.format(active.sum()))
+            orphan_df = orphan_df[~active]
+        if orphan_df.shape[0]==0:
+            print('No outdated files to purge.')
+            return
+        bucket_id = self.get_bucket_id()
+        assert np.all(orphan_df['path'].str.startswith('gs://'+bucket_id+'/'))
+
+        while True:
+            s = input('{} unreferenced files ({:.2f} GB) found. Delete? [y/n] '.format(
+                orphan_df.shape[0], orphan_df['size_bytes'].sum()/1024**3)).lower()
+            if s=='n' or s=='y':
+                break
+
+        if s=='y':
+            print('Purging {} unreferenced files.'.format(orphan_df.shape[0]))
+            gs_delete(orphan_df['path'].tolist(), chunk_size=chunk_size, num_threads=num_threads)
+
+
+    def migrate_files(self, wm, entity_types=None, attributes=None, checkpoint=None,
+                      dry_run=False, num_threads=10):
+        """
+        Copy files referenced by entity attributes from the bucket of this
+        workspace to the bucket of workspace wm (WorkspaceManager), keeping
+        relative paths, then rewrite the attribute paths in wm
+
+        entity_types: entity types to migrate (default: all)
+        attributes:   attributes to migrate (default: all attributes with paths in the bucket)
+        checkpoint:   file recording copied paths; on resume, these are skipped
+
+        Files that already exist in the destination with a matching MD5 hash
+        are not copied. Attributes are only rewritten for entities whose files
+        were all copied successfully.
+
+        Returns pd.DataFrame with the status of each file
+        """
+        src_prefix = 'gs://{}/'.format(self.get_bucket_id())
+        dest_prefix = 'gs://{}/'.format(wm.get_bucket_id())
+        if entity_types is None:
+            entity_types = list(self.get_entity_types())
+        entity_dfs = dict(zip(entity_types, _thread_map(self.get_entities, entity_types, num_threads=num_threads)))
+        path_df = pd.concat([_entity_paths(t, entity_dfs[t]) for t in entity_types]
+            +[_entity_paths(None, pd.DataFrame())], ignore_index=True)  # (non-empty list)
+        path_df = path_df[path_df['path'].str.startswith(src_prefix)]
+        if attributes is not None:
+            path_df = path_df[path_df['attribute'].isin(attributes)]
+
+        file_df = pd.DataFrame({'src': path_df['path'].unique()})
+        file_df['dest'] = dest_prefix + file_df['src'].str[len(src_prefix):]
+        file_df['status'] = 'pending'
+        file_df['error'] = None
+
+        # skip files copied previously, or that already exist with matching hash
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                done = set(f.read().strip().split('\n'))
+            file_df.loc[file_df['src'].isin(done), 'status'] = 'checkpoint'
+        ix = file_df['status']=='pending'
+        print('Comparing hashes for {} files'.format(ix.sum()))
+        src_hashes, dest_hashes = _thread_map(lambda x: gs_md5hashes(x, num_threads=num_threads),
+            [file_df.loc[ix, 'src'], file_df.loc[ix, 'dest']], num_threads=2)
+        matching = src_hashes.reindex(file_df['src']).values==dest_hashes.reindex(file_df['dest']).values
+        file_df.loc[ix & matching, 'status'] = 'exists'
+
+        ix = file_df['status']=='pending'
+        print('Copying {} of {} files from {} to {}'.format(ix.sum(), file_df.shape[0], src_prefix, dest_prefix))
+        if dry_run:
+            return file_df
+
+        lock = threading.Lock()
+        def copy(x):
+            error = gs_copy_paths([x[0]], [x[1]], num_threads=1, desc=None)[0]
+            if error is None and checkpoint is not None:
+                with lock:
+                    with open(checkpoint, 'a') as f:
+                        f.write(x[0]+'\n')
+            return error
+        file_df.loc[ix, 'error'] = _thread_map(copy, zip(file_df.loc[ix, 'src'], file_df.loc[ix, 'dest']),
+            num_threads=num_threads, desc='Copying files', unit='files')
+        file_df.loc[ix, 'status'] = np.where(file_df.loc[ix, 'error'].isnull(), 'copied', 'failed')
+        failed = set(file_df.loc[file_df['status']=='failed', 'src'])
+        if failed:
+            print('Copy failed for {} files.'.format(len(failed)))
+
+        # rewrite attributes in destination workspace
+        def rewrite(v):
+            if isinstance(v, str):
+                return dest_prefix+v[len(src_prefix):] if v.startswith(src_prefix) else v
+            else:  # list of values (only paths are rewritten)
+                return [rewrite(i) if isinstance(i, str) else i for i in v['items']]
+        # skip entities with failed copies (entity IDs are only unique within a type)
+        failed_ix = pd.MultiIndex.from_frame(path_df.loc[path_df['path'].isin(failed), ['entity_type', 'entity_id']])
+        path_df = path_df[~pd.MultiIndex.from_frame(path_df[['entity_type', 'entity_id']]).isin(failed_ix)]
+        for t,g in path_df.groupby('entity_type'):
+            attr_df = entity_dfs[t].loc[g['entity_id'].unique(), g['attribute'].unique()].copy()
+            is_path = g.drop_duplicates(['entity_id', 'attribute']).assign(x=True).pivot(
+                index='entity_id', columns='attribute', values='x').reindex_like(attr_df).notnull()
+            for c in attr_df.columns:
+                attr_df[c] = attr_df[c][is_path[c]].map(rewrite).reindex(attr_df.index)
+            wm.update_entity_attributes(t, attr_df, num_threads=num_threads)
+        return file_df
+
+
+    def update_entity_attributes(self, etype, attrs, max_operations=5000, max_bytes=2*1024**2, num_threads=10):
         """
         Create or update entity attributes
 
@@ -1096,37 +2203,69 @@ class WorkspaceManager(object):
             pd.DataFrame(attr_dict, index=[entity_name]))
 
           To update a single attribute for a single entity, use:
-            pd.Series({attr_name:attr_value}, name=entity_name)
-        """
-        if isinstance(attrs, pd.DataFrame):
-            attr_list = []
-            for i,row in attrs.iterrows():
-                attr_list.extend([{
-                    'name':row.name,
-                    'entityType':etype,
-                    'operations': [{"op": "AddUpdateAttribute", "attributeName": i, "addUpdateAttribute":str(j)} for i,j in row.iteritems()]
-                }])
-        elif isinstance(attrs, pd.Series):
-            attr_list = [{
-                'name':i,
-                'entityType':etype,
-                'operations': [{"op": "AddUpdateAttribute", "attributeName":attrs.name, "addUpdateAttribute":str(j)}]
-            } for i,j in attrs.iteritems()]
-        else:
+            pd.Series({entity_name:attr_value}, name=attr_name)
+
+        Null values are skipped. Numbers and booleans are written as such,
+        lists as value lists, and {'entityType':..., 'entityName':...} dicts
+        (or lists thereof) as entity references.
+
+        Operations are sent in chunks of at most max_operations operations and
+        ~max_bytes, using num_threads concurrent requests.
+        Returns pd.DataFrame with the status of each chunk.
+        """
+        if isinstance(attrs, pd.Series):
+            attrs = attrs.to_frame()
+        elif not isinstance(attrs, pd.DataFrame):
             raise ValueError('Unsupported input format.')
 
-        # try rawls batch call if available
-        r = _batch_update_entities(self.namespace, self.workspace, attr_list)
-        # try:  # TODO
-        if r.status_code==204:
-            if isinstance(attrs, pd.DataFrame):
-                print("Successfully updated attributes '{}' for {} {}s.".format(attrs.columns.tolist(), attrs.shape[0], etype))
-            elif isinstance(attrs, pd.Series):
-                print("Successfully updated attribute '{}' for {} {}s.".format(attrs.name, len(attrs), etype))
-            else:
-                print("Successfully updated attribute '{}' for {} {}s.".format(attrs.name, len(attrs), etype))
+        # build operations column by column
+        operations = defaultdict(list)
+        for c in attrs.columns:
+            s = attrs[c][attrs[c].notnull()]
+            for i,j in zip(s.index, s.values):
+                operations[i].append({"op": "AddUpdateAttribute", "attributeName": c, "addUpdateAttribute": _attribute_value(j)})
+
+        # split into chunks bounded by number of operations and size
+        chunks = [[]]
+        n_ops = 0
+        n_bytes = 0
+        for i,ops in operations.items():
+            e = {'name':i, 'entityType':etype, 'operations':ops}
+            b = len(json.dumps(e))
+            if len(chunks[-1])>0 and (n_ops+len(ops)>max_operations or n_bytes+b>max_bytes):
+                chunks.append([])
+                n_ops = 0
+                n_bytes = 0
+            chunks[-1].append(e)
+            n_ops += len(ops)
+            n_bytes += b
+
+        def send(chunk):
+            try:
+                r = _batch_update_entities(self.namespace, self.workspace, chunk)
+                return r.status_code, None if r.status_code==204 else r.text
+            except Exception as e:
+                return None, str(e)
+        status = _thread_map(send, [c for c in chunks if len(c)>0], num_threads=num_threads,
+            desc='Updating {} attributes'.format(etype), unit='chunks')
+
+        report_df = pd.DataFrame({
+            'entities': [len(c) for c in chunks if len(c)>0],
+            'operations': [np.sum([len(e['operations']) for e in c]) for c in chunks if len(c)>0],
+            'status_code': [i[0] for i in status],
+            'error': [i[1] for i in status],
+        }, columns=['entities', 'operations', 'status_code', 'error'])
+        report_df.index.name = 'chunk'
+
+        failed_df = report_df[report_df['status_code']!=204]
+        if failed_df.shape[0]==0:
+            print("Successfully updated attributes '{}' for {} {}s.".format(attrs.columns.tolist(), attrs.shape[0], etype))
         else:
-            print(r.text)
+            print('Update failed for {} of {} chunks ({} {}s):'.format(
+                failed_df.shape[0], report_df.shape[0], failed_df['entities'].sum(), etype))
+            for i,r in failed_df.iterrows():
+                print('  * chunk {}: {}'.format(i, r['error']))
+        return report_df
 
         # # revert to public API:
         # def update_entity_attributes(self, etype, ename, attr_dict):
@@ -1175,18 +2314,45 @@ class WorkspaceManager(object):
                 print(r.text)
 
 
-    def check_configuration(self, config_name):
+    def check_configuration(self, config_name, refresh=False):
         """
         Get version of a configuration and compare to latest available in repository
+
+        refresh: reload the cached repository method versions
         """
         r = self.list_configs()
         r = [i for i in r if i['name']==config_name][0]
         # method repo version
-        mrversion = get_method_version(r['methodRepoMethod']['methodNamespace'], r['methodRepoMethod']['methodName'])
+        mrversion = get_method_versions(refresh=refresh)[(r['methodRepoMethod']['methodNamespace'], r['methodRepoMethod']['methodName'])]
         print('Method for config. {0}: {1} version {2} (latest: {3})'.format(config_name, r['methodRepoMethod']['methodName'], r['methodRepoMethod']['methodVersion'], mrversion))
         return r['methodRepoMethod']['methodVersion']
 
 
+    def check_configurations(self, update=False, refresh=False):
+        """
+        Compare method versions of all configurations in the workspace to the
+        latest versions available in the repository
+
+        Returns a DataFrame with current and latest versions; if update=True,
+        outdated configurations are updated to the latest version (the repository
+        index is reloaded first; refresh=True reloads it in any case).
+        """
+        df = _config_versions(self.list_configs(), get_method_versions(refresh=refresh or update))
+        if update:
+            for r in df[df['outdated']].itertuples():
+                self.update_configuration_version(r.namespace, r.name, r.latest_version)
+        return df
+
+
+    def update_configuration_version(self, cnamespace, config, version):
+        """Set the method version of a configuration"""
+        r = firecloud.api.get_workspace_config(self.namespace, self.workspace, cnamespace, config)
+        assert r.status_code==200
+        json_body = r.json()
+        json_body['methodRepoMethod']['methodVersion'] = int(version)
+        self.update_configuration(json_body)
+
+
     def get_configs(self, latest_only=False):
         """
         Get all configurations in the workspace
@@ -1204,11 +2370,81 @@ class WorkspaceManager(object):
 
     def create_submission(self, cnamespace, config, entity, etype, expression=None, use_callcache=True):
         """
-
+        Create submission; returns the submission ID
         """
         r = firecloud.api.create_submission(self.namespace, self.workspace,
             cnamespace, config, entity, etype, expression=expression, use_callcache=use_callcache)
         if r.status_code==201:
             print('Successfully created submission {}.'.format(r.json()['submissionId']))
+            return r.json()['submissionId']
         else:
             print(r.text)
+
+
+    def get_active_workflow_count(self):
+        """Get the number of active (queued, submitted, running, ...) workflows in the workspace"""
+        active = ['Queued', 'Submitted', 'Launching', 'Running', 'Aborting']
+        return int(np.sum([s['workflowStatuses'].get(i,0) for s in self.list_submissions() for i in active]))
+
+
+    def create_submissions(self, submissions, max_in_flight=10, max_active_workflows=None,
+                           use_callcache=True, poll_interval=60):
+        """
+        Launch submissions concurrently
+
+        submissions: list of (cnamespace, config, entity, etype[, expression]),
+                     or pd.DataFrame with these columns
+        max_in_flight: maximum number of concurrent submission requests
+        max_active_workflows: if set, new submissions are held back while the
+                     number of active workflows in the workspace (from the
+                     submission list) is at or above this quota; the count is
+                     refreshed every poll_interval seconds while throttled
+
+        Returns pd.DataFrame with submission IDs (or errors) for each submission
+        """
+        columns = ['cnamespace', 'config', 'entity', 'etype', 'expression']
+        if isinstance(submissions, pd.DataFrame):
+            df = submissions.reindex(columns=columns).reset_index(drop=True)
+        else:
+            df = pd.DataFrame([tuple(s)+(None,)*(5-len(s)) for s in submissions], columns=columns)
+        df = df.astype(object).where(df.notnull(), None)
+        df['submission_id'] = None
+        df['workflows'] = 0
+        df['error'] = None
+
+        def submit(k):
+            r = firecloud.api.create_submission(self.namespace, self.workspace,
+                df.at[k, 'cnamespace'], df.at[k, 'config'], df.at[k, 'entity'], df.at[k, 'etype'],
+                expression=df.at[k, 'expression'], use_callcache=use_callcache)
+            if r.status_code==201:
+                r = r.json()
+                return r['submissionId'], len(r.get('workflows', [])), None
+            else:
+                return None, 0, r.text
+
+        pending = list(df.index[::-1])
+        active = self.get_active_workflow_count() if max_active_workflows is not None else 0
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor, \
+                Tracker('Launching submissions', total=df.shape[0], unit='submissions') as tracker:
+            futures = {}
+            while pending or futures:
+                while pending and len(futures)<max_in_flight and (max_active_workflows is None or active<max_active_workflows):
+                    k = pending.pop()
+                    futures[executor.submit(submit, k)] = k
+                if futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        k = futures.pop(f)
+                        try:
+                            df.loc[k, ['submission_id', 'workflows', 'error']] = f.result()
+                        except Exception as e:
+                            df.at[k, 'error'] = str(e)
+                        active += df.at[k, 'workflows']
+                        tracker.update()
+                else:  # throttled
+                    print('  * {} active workflows (quota: {}), waiting'.format(active, max_active_workflows))
+                    time.sleep(poll_interval)
+                    active = self.get_active_workflow_count()
+        n_failed = df['submission_id'].isnull().sum()
+        print('Successfully created {} submissions ({} failed).'.format(df.shape[0]-n_failed, n_failed))
+        return df
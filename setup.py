@@ -20,18 +20,20 @@ setup(
     long_description = _LONG_DESCRIPTION,
     entry_points = {
         'console_scripts': [
-            'dalmatian = dalmatian.core:main'
+            'dalmatian = dalmatian.cli:main'
         ]
     },
     install_requires = [
     'numpy',
     'matplotlib',
-    'pandas',
+    'pandas>=2.0',
     'pytz',
     'firecloud',
     'ipython',
-    'iso8601'
     ],
+    extras_require = {
+        'parquet': ['pyarrow']
+    },
     classifiers = [
         "Programming Language :: Python :: 2",
         "Programming Language :: Python :: 3",
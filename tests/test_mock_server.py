@@ -0,0 +1,125 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('firecloud')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+import mock_server
+
+import dalmatian
+
+
+@pytest.fixture
+def server():
+    # 'source': 6 samples of 3 participants (with participant.samples_), in 3 sample sets;
+    # 'dest': empty workspace
+    s = mock_server.MockServer(mock_server.MockWorkspace(n_entities=6, n_attributes=2, n_submissions=2,
+        n_sample_sets=3, participant_samples=True), workspaces={'dest':mock_server.MockWorkspace(n_entities=0)}).start()
+    mock_server.connect(s.url)
+    yield s
+    s.stop()
+
+
+def test_import():
+    # submodules and exported names must be importable in any order (fresh process)
+    code = 'import dalmatian, dalmatian.core, dalmatian.wmanager; dalmatian.WorkspaceManager; dalmatian.get_vm_cost'
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+
+def test_entity_status_timestamps(server):
+    wm = dalmatian.WorkspaceManager('mock', 'source')
+    status_df = wm.get_entity_status('sample', 'mock_config')
+    assert str(status_df['timestamp'].dt.tz)=='UTC'
+    assert (status_df['timestamp']==[pd.Timestamp('2018-01-01', tz='UTC')]*3+[pd.Timestamp('2018-01-02', tz='UTC')]*3).all()
+    # Cromwell timestamps with and without fractional seconds
+    t = dalmatian.timestamps.parse([mock_server._timestamp(mock_server.START_TIME), '2018-01-01T00:00:01Z'])
+    assert (t[1]-t[0]).total_seconds()==1
+
+
+def test_plan_deletion(server):
+    wm = dalmatian.WorkspaceManager('mock', 'source')
+    plan_df = wm.plan_deletion('participant', ['participant_0000000', 'participant_0000001'])
+
+    update_df = plan_df[plan_df['action']=='update']
+    assert (update_df['stage']==0).all()
+    # participant.samples_ does not determine the order of deletion, but must be emptied first
+    assert set(zip(update_df['entity_type'], update_df['entity_id'])) == set([
+        ('participant', 'participant_0000000'), ('participant', 'participant_0000001'),
+        ('sample_set', 'sample_set_0000001'), ('sample_set', 'sample_set_0000002')])
+
+    delete_df = plan_df[plan_df['action']=='delete']
+    order = delete_df.groupby('entity_type')['stage'].max()
+    assert order['sample_set'] < delete_df.loc[delete_df['entity_type']=='sample', 'stage'].min()
+    assert order['sample'] < delete_df.loc[delete_df['entity_type']=='participant', 'stage'].min()
+    assert delete_df.loc[delete_df['entity_type']=='sample_set', 'entity_id'].tolist()==['sample_set_0000000']
+    assert sorted(delete_df.loc[delete_df['entity_type']=='sample', 'entity_id'])==[
+        'sample_{:07d}'.format(i) for i in range(4)]
+
+    # the mock server rejects deletions of referenced entities
+    wm.delete_entities('participant', ['participant_0000000', 'participant_0000001'])
+    ws = server.workspace
+    assert ws.names('participant')==['participant_0000002']
+    assert ws.names('sample')==['sample_0000004', 'sample_0000005']
+    assert ws.names('sample_set')==['sample_set_0000001', 'sample_set_0000002']
+
+
+def test_copy_workspace(server):
+    wm = dalmatian.WorkspaceManager('mock', 'dest')
+    wm.copy_workspace(dalmatian.WorkspaceManager('mock', 'source'), configs=False, attributes=False)
+
+    # referenced types are imported first; participant.samples_ is written afterwards
+    dest = server.workspaces['dest']
+    assert dest.imports==['participant', 'sample', 'sample_set']
+    assert dest.names('sample')==['sample_{:07d}'.format(i) for i in range(6)]
+    assert dest.entity('sample', 'sample_0000003')['attributes']['participant']=={
+        'entityType':'participant', 'entityName':'participant_0000001'}
+    assert [i['entityName'] for i in dest.entity('sample_set', 'sample_set_0000000')['attributes']['samples']['items']]==[
+        'sample_0000000', 'sample_0000003']
+    assert [i['entityName'] for i in dest.entity('participant', 'participant_0000002')['attributes']['samples_']['items']]==[
+        'sample_0000004', 'sample_0000005']
+
+
+def test_copy_workspace_empty_set(server):
+    # sets without members are not created (and their attributes are not written)
+    src = dalmatian.WorkspaceManager('mock', 'source')
+    src.update_entity_attributes('sample_set', pd.DataFrame({'samples':[{'itemsType':'EntityReference', 'items':[]}],
+        'description':['empty']}, index=['sample_set_0000001']))
+    wm = dalmatian.WorkspaceManager('mock', 'dest')
+    wm.copy_workspace(src, configs=False, attributes=False)
+    dest = server.workspaces['dest']
+    assert dest.names('sample_set')==['sample_set_0000000', 'sample_set_0000002']
+    assert ('sample_set', 'sample_set_0000001') not in dest.updates
+
+
+def test_history(server):
+    wm = dalmatian.WorkspaceManager('mock', 'source')
+    history_df = wm.get_entity_history('sample')
+    assert history_df.shape[0]==6*2  # one row per output
+    assert (history_df.index.get_level_values('run')==1).all()
+    outputs_df = wm.get_submission_history('sample_0000004')
+    assert outputs_df.index.tolist()==['run_1']
+    assert outputs_df.at['run_1', 'attribute_2']==server.workspace.outputs(4)['attribute_2']
+    assert outputs_df.at['run_1', 'submission_date']=='00:00:00 01/02/2018'
+    assert wm.get_submission_history('sample_9999999').shape[0]==0
+
+    # runs of workflows without outputs are kept
+    server.workspace.n_attributes = 0
+    wm = dalmatian.WorkspaceManager('mock', 'source')  # (metadata is cached)
+    history_df = wm.get_entity_history('sample')
+    assert history_df.shape[0]==6 and history_df['output'].isnull().all()
+    assert wm.get_submission_history('sample_0000004').index.tolist()==['run_1']
+
+
+def test_patch_attributes(server):
+    ws = server.workspace
+    ws.batch_update([{'name':'sample_0000002', 'entityType':'sample',
+        'operations':[{'op':'RemoveAttribute', 'attributeName':'attribute_1'}]}])
+    wm = dalmatian.WorkspaceManager('mock', 'source')
+    patch_df = wm.patch_attributes('mock', 'mock_config', dry_run=True)
+    assert patch_df.shape[0]==1
+    assert patch_df.iloc[0].tolist()[-1]==ws.outputs(2)['attribute_1']
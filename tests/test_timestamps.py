@@ -0,0 +1,27 @@
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from dalmatian import timestamps
+
+
+def test_parse_mixed_precision():
+    # Cromwell omits the fractional seconds when they are zero
+    t = timestamps.parse(['2018-01-01T00:00:00.123Z', '2018-01-01T00:00:00Z', None])
+    assert str(t.tz)=='UTC'
+    assert t[0]==pd.Timestamp('2018-01-01 00:00:00.123', tz='UTC')
+    assert t[1]==pd.Timestamp('2018-01-01 00:00:00', tz='UTC')
+    assert pd.isnull(t[2])
+
+
+def test_parse_series_and_scalar():
+    s = timestamps.parse(pd.Series(['2018-01-01T00:00:00Z', '2018-01-01T01:00:00.5Z']))
+    assert (s.diff().dt.total_seconds().iloc[1])==3600.5
+    assert timestamps.parse('2018-01-01T00:00:00Z')==pd.Timestamp('2018-01-01', tz='UTC')
+    assert pd.isnull(timestamps.parse(None))
+
+
+def test_elapsed_and_format():
+    assert timestamps.elapsed(['2018-01-01T00:00:00.5Z'], ['2018-01-01T00:00:01Z'])[0]==0.5
+    t = timestamps.parse('2018-01-01T12:00:00Z')
+    assert timestamps.format(t, timezone='America/New_York')=='07:00:00 01/01/2018'